@@ -2,9 +2,10 @@ from langchain_ollama import ChatOllama
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from helpers.tools import tools
+from helpers import ollama_pool
 
 # Define the LLM
-llm = ChatOllama(model="llama3.2", temperature=0.8, max_tokens=1000)
+llm = ChatOllama(model="llama3.2", temperature=0.8, max_tokens=1000, base_url=ollama_pool.get_base_url())
 
 # Define the prompt
 prompt = ChatPromptTemplate.from_messages(
@@ -1,5 +1,10 @@
 # from strands.tools.mcp.mcp_client import MCPClient
-from helpers.agent_handler import get_agent
+import uuid
+import threading
+from helpers.agent_handler import new_agent_pool
+from helpers import config_handler
+from helpers.agent_stream import iter_events, strands_events, AnswerView
+from helpers.cancellation import get_tracker, run_generation
 import streamlit as st
 
 
@@ -13,10 +18,22 @@ MAX_HISTORY = st.sidebar.number_input("Max History", 1, 10, 2)
 CONTEXT_SIZE = st.sidebar.number_input("Context Size", 1024, 16384, 8192, step=1024)
 MAX_ITERATIONS = 4
 
+# ---- Agent Pool ---- #
+# Shared by every session of this server; each session keeps its own warmed agent
+@st.cache_resource
+def get_agent_pool():
+    return new_agent_pool(**config_handler.get_agent_pool_settings())
+
+agent_pool = get_agent_pool()
+generations = get_tracker()
+
 # ---- Session State Setup ---- #
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
 # ---- Trim Chat Memory ---- #
 def trim_memory():
     while len(st.session_state.chat_history) > MAX_HISTORY * 4:
@@ -33,17 +50,34 @@ if query := st.chat_input("Say something"):
     st.session_state.chat_history.append({"role": "user", "content": query})
     with st.chat_message("user"):
         st.markdown(query)
-    # Use the MCP server in a context manager
-    # with streamable_http_mcp_client:
-    #     # Get the tools from the MCP server
-    #     tools = streamable_http_mcp_client.list_tools_sync()
-        # Create an agent with the MCP tools
-        agent = get_agent()
-        response = agent(query)
-        answer = response.__str__()
-        print(answer)
-        st.session_state.chat_history.append({"role": "assistant", "content": answer})
-        with st.chat_message("assistant"):
-            st.markdown(answer)
-        trim_memory()   
+    # Built on the first turn and reused afterwards; changed settings rebuild it with the conversation kept
+    agent = agent_pool.get(st.session_state.session_id, (MODEL, MAX_HISTORY, MAX_ITERATIONS, CONTEXT_SIZE))
+    with st.chat_message("assistant"):
+        # Stream tokens and tool calls as they happen instead of waiting for the whole agent loop
+        view = AnswerView(st.status("Thinking..."), st.empty())
+        history = list(agent.messages)
+        stopped = threading.Event()
+        events = iter_events(lambda: strands_events(agent.stream_async(query)), stopped=stopped)
+
+        def abandon_turn():
+            # drop the unfinished turn, a tool call without its result would break the next one
+            if stopped.is_set():
+                agent.messages[:] = history
+            else:
+                # the old turn is still unwinding and may append to its agent; continue on a new one
+                agent_pool.rebuild(st.session_state.session_id, history)
+
+        run_generation(events, view, generations, on_abandon=abandon_turn)
+        view.finish()
+        answer = view.answer
+    print(answer)
+    st.session_state.chat_history.append({"role": "assistant", "content": answer})
+    trim_memory()
 
+# ---- Agent Pool Stats ---- #
+with st.sidebar.expander("Agent Pool"):
+    stats = agent_pool.stats()
+    st.write(f"{stats['agents']}/{stats['max_agents']} agents, {stats['builds']} built, {stats['reuses']} reused, "
+             f"{stats['total_bytes'] / 1024:.1f} KB of conversation state")
+    st.dataframe(stats["per_agent"])
+    st.caption(generations.summary())
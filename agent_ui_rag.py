@@ -3,6 +3,8 @@ from helpers.indexer import setup_retriever
 from langchain_core.messages import AIMessage, HumanMessage
 from helpers.tools import tools 
 from helpers import config_handler
+from helpers.agent_stream import iter_events, langgraph_events, AnswerView
+from helpers.cancellation import get_tracker, run_generation
 import streamlit as st
 
 
@@ -25,6 +27,10 @@ PERSISTENT_DIRECTORY = config_handler.get_db_path()
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# ---- Cancelled Generations (shared across sessions and reruns) ---- #
+generations = get_tracker()
+st.sidebar.caption(generations.summary())
+
 # ---- LangChain Components ---- #
 retriever = setup_retriever(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
 agent = setup_agent(MODEL_PROVIDER, MODEL)
@@ -56,8 +62,7 @@ if query := st.chat_input("Say something"):
         print(query)
         retrieved_docs = retriever.invoke(query)
         print(retrieved_docs)
-        response = agent.invoke(
-            {"messages":[
+        inputs = {"messages":[
                     {
                     "role": "user",
                     "content": query, 
@@ -67,11 +72,13 @@ if query := st.chat_input("Say something"):
                     "agent_scratchpad": ""
                     }]
             }
-            )       
+        # Stream tokens and tool calls as they happen instead of waiting for the whole agent loop
+        view = AnswerView(st.status("Thinking..."), st.empty())
+        events = iter_events(lambda: langgraph_events(agent.astream(inputs, stream_mode=["messages", "updates"])))
+        run_generation(events, view, generations)
+        view.finish()
+        answer = view.answer
         print("Result from agent:")
-        print(response["messages"][-1].content) # Output the final answer
-
-        # Display the full response
-        st.write(response["messages"][-1].content)
-        st.session_state.chat_history.append(AIMessage(response["messages"][-1].content))
+        print(answer) # Output the final answer
+        st.session_state.chat_history.append(AIMessage(answer))
         trim_memory()
@@ -0,0 +1,48 @@
+import argparse
+from helpers import indexer, config_handler, llm_handler, batch_handler, warmup, ollama_pool
+
+
+EMBEDDING_MODEL = config_handler.get_embedding_model()
+PERSISTENT_DIRECTORY = config_handler.get_db_path()
+MODEL = config_handler.get_model()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the RAG chatbot chain.")
+    parser.add_argument("input", help="Text file with one question per line, or a JSONL file")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL file the results are appended to")
+    parser.add_argument("-c", "--concurrency", type=int, default=2,
+                        help="Number of questions sent to Ollama at the same time (match OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--field", help="JSONL field holding the question (default: question, input, query or title)")
+    parser.add_argument("--model", default=MODEL, help="Ollama chat model")
+    parser.add_argument("--restart", action="store_true", help="Ignore existing results instead of resuming")
+    parser.add_argument("--use-cache", action="store_true", help="Answer repeated questions from the semantic answer cache")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # batch questions yield to interactive chat on a shared Ollama
+    ollama_pool.set_default_priority("batch")
+    questions = batch_handler.read_questions(args.input, field=args.field)
+    print(f"Read {len(questions)} questions from {args.input}")
+
+    retriever = indexer.setup_retriever(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+    answer_cache = None
+    if args.use_cache:
+        answer_cache = indexer.setup_answer_cache(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+    rag_chain = llm_handler.setup_chain_chatbot(model=args.model, retriever=retriever, answer_cache=answer_cache)
+    warmup.setup_warmup([args.model], retriever).run()
+
+    def answer_question(question):
+        response = rag_chain.invoke({"input": question, "history": []})
+        sources = [doc.metadata.get("source") for doc in response.get("context", [])]
+        return response["answer"], sources
+
+    summary = batch_handler.run_batch(answer_question, questions, args.output,
+                                      concurrency=args.concurrency, resume=not args.restart)
+    batch_handler.print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import uuid
-from helpers import indexer, session_handler, config_handler, llm_handler
+from helpers import indexer, session_handler, config_handler, llm_handler, warmup
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
 
@@ -10,14 +10,17 @@ MODEL = "llama3.2"
 
 session_id = str(uuid.uuid4())
 retriever = indexer.setup_retriever(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+answer_cache = indexer.setup_answer_cache(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
 chat_history = session_handler.get_session_history(session_id)
+print("Warming up models...")
+warmup.setup_warmup([MODEL], retriever).run()
 
 while True:
     question = input("\n Enter your question (or type 'exit' to quit): ")
     if question.lower() == 'exit':
         break
     # ---- LangChain Components ---- #
-    rag_chain = llm_handler.setup_chain_chatbot(model=MODEL, retriever=retriever)
+    rag_chain = llm_handler.setup_chain_chatbot(model=MODEL, retriever=retriever, answer_cache=answer_cache)
     conversational_rag_chain = RunnableWithMessageHistory(
         rag_chain,
         lambda _: chat_history,
@@ -0,0 +1,153 @@
+import json
+import uuid
+import asyncio
+import contextlib
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from helpers import indexer, session_handler, config_handler, llm_handler, warmup
+from helpers.request_gate import RequestGate, ServiceBusy
+from helpers.cancellation import GenerationTracker, until_cancelled
+
+
+EMBEDDING_MODEL = config_handler.get_embedding_model()
+PERSISTENT_DIRECTORY = config_handler.get_db_path()
+MODEL = config_handler.get_model()
+MODELS = list(dict.fromkeys([MODEL, "llama3.2", "deepseek-r1:8b", "gemma3:4b"]))
+SERVER_SETTINGS = config_handler.get_server_settings()
+
+# ---- Shared by all sessions ---- #
+retriever = indexer.setup_retriever(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+answer_cache = indexer.setup_answer_cache(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+warm_up = warmup.setup_warmup([MODEL], retriever)
+gate = RequestGate(max_concurrency=SERVER_SETTINGS["max_concurrency"], max_queue=SERVER_SETTINGS["max_queue"])
+generations = GenerationTracker()
+chains = {}
+
+
+def get_chain(model):
+    if model not in chains:
+        chains[model] = llm_handler.setup_chain_chatbot(model=model, retriever=retriever, answer_cache=answer_cache)
+    return chains[model]
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def is_valid_session_id(session_id):
+    # session ids become file names in session_handler, so only accept uuids
+    try:
+        return str(uuid.UUID(session_id)) == session_id
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+async def stream_answer(session_id, question, model):
+    """
+    Streams the answer as server-sent events: "token" events, then "sources" and "done".
+
+    A new question of the same session cancels this answer, which then ends with a "cancelled"
+    event. If the client disconnects, the generator is cancelled. Either way the stream to
+    Ollama is closed, so it stops generating and the slot is free for the next request.
+    """
+    token = generations.start(session_id)
+    tokens = 0
+    try:
+        async with gate.slot(session_id):
+            history = await asyncio.to_thread(session_handler.get_session_history, session_id)
+            answer = ""
+            sources = []
+            stream = get_chain(model).astream({"input": question, "history": list(history.messages)})
+            async for chunk in until_cancelled(stream, token):
+                if "context" in chunk:
+                    sources = [doc.metadata.get("source") for doc in chunk["context"]]
+                if "answer" in chunk:
+                    answer += chunk["answer"]
+                    tokens += 1
+                    yield sse("token", chunk["answer"])
+            if token.cancelled:
+                # the abandoned answer is not kept in the history
+                yield sse("cancelled", {"reason": token.reason, "tokens": tokens})
+                return
+            history.add_user_message(question)
+            history.add_ai_message(answer)
+            await asyncio.to_thread(session_handler.save_session_history, session_id)
+            yield sse("sources", sources)
+            yield sse("done", {"session_id": session_id})
+    except ServiceBusy as e:
+        yield sse("error", str(e))
+    except (asyncio.CancelledError, GeneratorExit):
+        # the client went away
+        token.cancel("disconnected")
+        raise
+    finally:
+        generations.finish(session_id, token, tokens)
+
+
+async def create_session(request):
+    return JSONResponse({"session_id": str(uuid.uuid4())})
+
+
+async def chat(request):
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        body = None
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    question = str(body.get("question", "")).strip()
+    session_id = body.get("session_id") or str(uuid.uuid4())
+    model = body.get("model") or MODEL
+    if not question:
+        return JSONResponse({"error": "question is required"}, status_code=400)
+    if not is_valid_session_id(session_id):
+        return JSONResponse({"error": "session_id must be a uuid"}, status_code=400)
+    if model not in MODELS:
+        return JSONResponse({"error": f"model must be one of {MODELS}"}, status_code=400)
+    if gate.is_full():
+        # backpressure: tell the client to retry instead of queueing without bound
+        return JSONResponse({"error": "Server is busy, retry later"}, status_code=503, headers={"Retry-After": "1"})
+    return StreamingResponse(
+        stream_answer(session_id, question, model),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Session-Id": session_id},
+    )
+
+
+async def ready(request):
+    # readiness for load balancers: only route traffic here once the models are loaded
+    stats = warm_up.stats()
+    return JSONResponse(stats, status_code=200 if stats["state"] == "ready" else 503)
+
+
+async def health(request):
+    stats = {"status": "ok", **gate.stats(), "warmup": warm_up.stats(), "generations": generations.stats()}
+    if answer_cache is not None:
+        stats["answer_cache"] = answer_cache.stats()
+    stats["condense"] = llm_handler.condense_stats.stats()
+    stats["prompt_prefix_reuse"] = {model: tracker.stats() for model, tracker in llm_handler.prefix_trackers.items()}
+    query_embeddings = indexer.setup_embeddings(EMBEDDING_MODEL)
+    if isinstance(query_embeddings, indexer.QueryEmbeddingDispatcher):
+        stats["query_embeddings"] = query_embeddings.stats()
+    return JSONResponse(stats)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # warm up in the background so /health answers while the models load
+    warm_up.start()
+    yield
+
+
+app = Starlette(routes=[
+    Route("/sessions", create_session, methods=["POST"]),
+    Route("/chat", chat, methods=["POST"]),
+    Route("/health", health, methods=["GET"]),
+    Route("/ready", ready, methods=["GET"]),
+], lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=SERVER_SETTINGS["host"], port=SERVER_SETTINGS["port"])
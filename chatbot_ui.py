@@ -1,8 +1,10 @@
 import streamlit as st
 from langchain_ollama import ChatOllama
-from langchain.memory import ConversationBufferMemory
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
+from helpers import ollama_pool
+from helpers.rolling_memory import RollingSummaryMemory, llm_summarizer
+from helpers.cancellation import get_tracker, run_generation
 
 
 
@@ -19,12 +21,29 @@ MODEL = st.sidebar.selectbox("Choose a Model", model_options, index=0)
 # Inputs for max history and context size
 MAX_HISTORY = st.sidebar.number_input("Max History", min_value=1, max_value=10, value=2, step=1)
 CONTEXT_SIZE = st.sidebar.number_input("Context Size", min_value=1024, max_value=16384, value=8192, step=1024)
+# History gets half the context; the rest is for the question and the answer
+HISTORY_TOKENS = CONTEXT_SIZE // 2
+
+# ---- LangChain LLM Setup ---- #
+llm = ChatOllama(model=MODEL, streaming=True, num_ctx=CONTEXT_SIZE, base_url=ollama_pool.get_base_url())
+# Older turns are folded into a summary by a separate, non-streaming call in the background
+summary_llm = ChatOllama(model=MODEL, num_ctx=CONTEXT_SIZE, base_url=ollama_pool.get_base_url("batch"))
+
+
+# ---- Cancelled Generations (shared across sessions and reruns) ---- #
+generations = get_tracker()
+st.sidebar.caption(generations.summary())
 
 
 # ---- Function to Clear Memory When Settings Change ---- #
+def new_memory():
+    return RollingSummaryMemory(llm_summarizer(summary_llm), max_tokens=HISTORY_TOKENS, keep_turns=MAX_HISTORY)
+
 def clear_memory():
     st.session_state.chat_history = []
-    st.session_state.memory = ConversationBufferMemory(return_messages=True)  # Reset memory
+    if "memory" in st.session_state:
+        st.session_state.memory.close()
+    st.session_state.memory = new_memory()  # Reset memory
 
 # Clear memory if settings are changed
 if "prev_context_size" not in st.session_state or st.session_state.prev_context_size != CONTEXT_SIZE:
@@ -36,10 +55,11 @@ if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
 if "memory" not in st.session_state:
-    st.session_state.memory = ConversationBufferMemory(return_messages=True)
+    st.session_state.memory = new_memory()
 
-# ---- LangChain LLM Setup ---- #
-llm = ChatOllama(model=MODEL, streaming=True)
+# Follow the sidebar without losing the conversation
+st.session_state.memory.keep_turns = MAX_HISTORY
+st.session_state.memory.summarize = llm_summarizer(summary_llm)
 
 # ---- Prompt Template ---- #
 prompt_template = PromptTemplate(
@@ -47,7 +67,8 @@ prompt_template = PromptTemplate(
     template="{history}\nUser: {human_input}\nAssistant:"
 )
 
-chain = LLMChain(llm=llm, prompt=prompt_template, memory=st.session_state.memory)
+# History is passed in explicitly, so the prompt never grows past HISTORY_TOKENS
+chain = LLMChain(llm=llm, prompt=prompt_template)
 
 # ---- Display Chat History ---- #
 for msg in st.session_state.chat_history:
@@ -75,16 +96,25 @@ if prompt := st.chat_input("Say something"):
     # ---- Get AI Response (Streaming) ---- #
     with st.chat_message("assistant"):
         response_container = st.empty()
-        full_response = ""
+        reply = {"text": ""}
 
-        for chunk in chain.stream({"human_input": prompt}):
+        history = st.session_state.memory.history_text()
+
+        def show_chunk(chunk):
             if isinstance(chunk, dict) and "text" in chunk:
-                text_chunk = chunk["text"]
-                full_response += text_chunk
-                response_container.markdown(full_response)
+                reply["text"] += chunk["text"]
+                response_container.markdown(reply["text"])
+                return True
+            return False
+
+        # a new message stops the run; the stream is then closed so Ollama stops generating
+        run_generation(chain.stream({"history": history, "human_input": prompt}), show_chunk, generations)
+        full_response = reply["text"]
 
     # Store response in session_state
     st.session_state.chat_history.append({"role": "assistant", "content": full_response})
+    # Returns at once; any summary update runs in the background
+    st.session_state.memory.add_turn(prompt, full_response)
 
     # Trim history after storing the response
     trim_memory()
\ No newline at end of file
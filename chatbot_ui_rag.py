@@ -1,6 +1,8 @@
 import streamlit as st
 from helpers.llm_handler import setup_chain_chatbot
-from helpers.indexer import setup_retriever
+from helpers.indexer import setup_retriever, setup_answer_cache
+from helpers.warmup import setup_warmup
+from helpers.cancellation import get_tracker, run_generation
 from helpers.config_handler import get_embedding_model, get_db_path
 from langchain_core.messages import AIMessage, HumanMessage
 
@@ -21,9 +23,25 @@ PERSISTENT_DIRECTORY = get_db_path()
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# ---- Answer Cache (shared across sessions and reruns) ---- #
+@st.cache_resource
+def get_answer_cache():
+    return setup_answer_cache(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+
+# ---- Cancelled Generations (shared across sessions and reruns) ---- #
+generations = get_tracker()
+st.sidebar.caption(generations.summary())
+
 # ---- LangChain Components ---- #
 retriever = setup_retriever(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
-qa = setup_chain_chatbot(MODEL, retriever)
+qa = setup_chain_chatbot(MODEL, retriever, answer_cache=get_answer_cache())
+
+# ---- Warm-up (once per model, before the first question) ---- #
+@st.cache_resource(show_spinner="Warming up models...")
+def warm_up_model(model):
+    return setup_warmup([model], retriever).run()
+
+warm_up_model(MODEL)
 
 # ---- Display Chat History ---- #
 for message in st.session_state.chat_history:
@@ -49,14 +67,25 @@ if query := st.chat_input("Say something"):
 
     with st.chat_message("AI"):
         response_container = st.empty()
-        # Retrieve relevant documents & run QA
+        # Retrieve relevant documents & run QA (answered from the cache for repeated questions)
         print(query)
-        retrieved_docs = retriever.invoke(query)
-        print(retrieved_docs)
-        if not retrieved_docs:
+        # the current question is already the last message of chat_history
+        # Streamed, so a new message can stop the answer: Streamlit interrupts this run and the stream is closed
+        full_response = {"answer": ""}
+
+        def show_chunk(chunk):
+            if "context" in chunk:
+                full_response["context"] = chunk["context"]
+            if "answer" in chunk:
+                full_response["answer"] += chunk["answer"]
+                response_container.markdown(full_response["answer"] + "▌")
+                return True
+            return False
+
+        run_generation(qa.stream({"input": query, "history": st.session_state.chat_history[:-1]}), show_chunk, generations)
+        print(full_response.get('context'))
+        if not full_response.get('context'):
             full_response = {"answer": "No relevant documents found."}
-        else:
-            full_response = qa.invoke({"input": query, "history": st.session_state.chat_history, "context": retrieved_docs})
         print(full_response['answer'])
         # Display the full response
         response_container.markdown(full_response['answer'])
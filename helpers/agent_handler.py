@@ -1,31 +1,93 @@
-from strands import Agent
-from strands_tools import calculator, current_time, python_repl
+import threading
+from strands import Agent, tool
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+from strands_tools import current_time
 from strands.tools.mcp.mcp_client import MCPClient
 from strands.models.ollama import OllamaModel
 from mcp.client.streamable_http import streamablehttp_client
+from . import ollama_pool, sandbox
+from .agent_pool import AgentPool
+
+_mcp_client = None
+_mcp_tools = None
+_mcp_lock = threading.Lock()
 
 
 def create_streamable_http_transport():
     return streamablehttp_client("http://localhost:8000/mcp/")
 
+
+def get_mcp_tools():
+    """Starts one MCP client for the process and lists its tools once; every agent shares them."""
+    global _mcp_client, _mcp_tools
+    with _mcp_lock:
+        if _mcp_tools is None:
+            client = MCPClient(create_streamable_http_transport)
+            # kept open: MCP tools call the server through the client while an agent runs
+            client.start()
+            _mcp_client, _mcp_tools = client, client.list_tools_sync()
+        return _mcp_tools
+
+
+def close_mcp_client():
+    global _mcp_client, _mcp_tools
+    with _mcp_lock:
+        if _mcp_client is not None:
+            _mcp_client.stop(None, None, None)
+        _mcp_client, _mcp_tools = None, None
+
+
+def window_size(max_history, max_iterations):
+    """Messages kept for `max_history` turns: the question, up to `max_iterations` tool call/result pairs and the answer."""
+    return max_history * (2 + 2 * max_iterations)
+
+
+# both tools run in a sandbox worker with CPU, memory and time limits instead of the agent's process
+@tool
+def calculator(expression: str) -> str:
+    """Evaluate an arithmetic expression with numbers, + - * / and parentheses, and return its result.
+
+    Args:
+        expression: The expression to evaluate, for example "(2 + 3) * 4".
+    """
+    return sandbox.run_math(expression)
+
+
+@tool
+def python_repl(code: str) -> str:
+    """Run Python code and return what it prints. Use print() to show results. Each run starts with a fresh interpreter state.
+
+    Args:
+        code: The Python code to run.
+    """
+    return sandbox.run_python(code)
+
+
 # Create an agent with tools from the strands-tools example tools package
-def get_agent():
+def get_agent(model_id="llama3.2", max_history=2, max_iterations=4, context_size=None, messages=None):
     # Create an Ollama model instance
     ollama_model = OllamaModel(
-        host="http://localhost:11434",  # Ollama server address
-        model_id="llama3.2",  # Specify which model to use
+        host=ollama_pool.get_base_url(),  # Ollama server, or the local pool proxy
+        model_id=model_id,  # Specify which model to use
     )
+    if context_size:
+        ollama_model.update_config(options={"num_ctx": context_size})
     #collect tools 
     builtin_tools = [calculator, current_time, python_repl]
-    streamable_http_mcp_client = MCPClient(create_streamable_http_transport)
-    with streamable_http_mcp_client:
-        # Get the tools from the MCP server
-        mcp_tools = streamable_http_mcp_client.list_tools_sync()
-    tools = builtin_tools + mcp_tools
+    tools = builtin_tools + get_mcp_tools()
     #setup system prompt
     system_prompt = """
     You are a helpful assistant. You can use the tools available to you to help answer the user's question.
     """
+    # Older messages slide out of the window, so the prompt stays bounded however long the session runs
+    conversation_manager = SlidingWindowConversationManager(window_size=window_size(max_history, max_iterations))
     # Create an agent with the MCP tools
-    agent = Agent(model=ollama_model, tools=tools, system_prompt=system_prompt)
+    agent = Agent(model=ollama_model, tools=tools, system_prompt=system_prompt,
+                  conversation_manager=conversation_manager, messages=messages,
+                  callback_handler=None)  # the UI renders the stream; don't also print it
     return agent
+
+
+def new_agent_pool(max_agents=16, ttl=1800):
+    """Pool of per-session agents; settings are (model_id, max_history, max_iterations, context_size)."""
+    return AgentPool(lambda settings, messages: get_agent(*settings, messages=messages), max_agents=max_agents, ttl=ttl)
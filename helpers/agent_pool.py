@@ -0,0 +1,133 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+def message_bytes(agent):
+    """Size of an agent's conversation state: its messages serialized as JSON."""
+    return len(json.dumps(getattr(agent, "messages", []), default=str).encode("utf-8"))
+
+
+class AgentPool:
+    """
+    Keeps one agent per session so its conversation state and setup survive between turns.
+
+    `factory(settings, messages)` builds an agent; `messages` is the conversation of the agent it
+    replaces when the settings of a session change, else None. At most `max_agents` agents are
+    kept, least recently used first out, and an agent idle for `ttl` seconds is dropped.
+    `close_fn(agent)` is called on every agent that leaves the pool.
+    """
+
+    def __init__(self, factory, max_agents=16, ttl=1800, close_fn=None):
+        self.factory = factory
+        self.max_agents = max_agents
+        self.ttl = ttl
+        self.close_fn = close_fn
+        # session_id -> {"agent", "settings", "last_used", "created", "turns"}
+        self.entries = OrderedDict()
+        self.builds = 0
+        self.reuses = 0
+        self._lock = threading.Lock()
+        # one build at a time per session, so a double submit does not create two agents
+        self._session_locks = {}
+
+    def _session_lock(self, session_id):
+        with self._lock:
+            return self._session_locks.setdefault(session_id, threading.Lock())
+
+    def get(self, session_id, settings):
+        """Returns the session's agent, building it on the first turn or when its settings changed."""
+        with self._session_lock(session_id):
+            now = time.time()
+            with self._lock:
+                removed = self._expire(now)
+                entry = self.entries.get(session_id)
+                if entry is not None and entry["settings"] == settings:
+                    self.entries.move_to_end(session_id)
+                    entry["last_used"] = now
+                    entry["turns"] += 1
+                    self.reuses += 1
+                    agent = entry["agent"]
+                else:
+                    agent = None
+            self._close(removed)
+            if agent is not None:
+                return agent
+            messages = getattr(entry["agent"], "messages", None) if entry is not None else None
+            agent = self.factory(settings, messages)
+            with self._lock:
+                old = self.entries.pop(session_id, None)
+                self.entries[session_id] = {"agent": agent, "settings": settings, "last_used": now,
+                                            "created": now, "turns": 1}
+                self.builds += 1
+                while len(self.entries) > self.max_agents:
+                    evicted_id, evicted = self.entries.popitem(last=False)
+                    self._session_locks.pop(evicted_id, None)
+                    removed.append(evicted)
+            self._close(([old] if old is not None else []) + removed)
+            return agent
+
+    def _expire(self, now):
+        expired = [session_id for session_id, entry in self.entries.items() if now - entry["last_used"] > self.ttl]
+        removed = []
+        for session_id in expired:
+            removed.append(self.entries.pop(session_id))
+            self._session_locks.pop(session_id, None)
+        return removed
+
+    def _close(self, entries):
+        for entry in entries:
+            if self.close_fn is not None:
+                try:
+                    self.close_fn(entry["agent"])
+                except Exception as e:
+                    print(f"Error closing agent: {str(e)}")
+
+    def rebuild(self, session_id, messages):
+        """
+        Replaces a session's agent with a new one of the same settings holding `messages`, e.g.
+        when the old agent is still unwinding an abandoned turn and must not be reused.
+        """
+        with self._session_lock(session_id):
+            with self._lock:
+                entry = self.entries.get(session_id)
+            if entry is None:
+                return None
+            agent = self.factory(entry["settings"], messages)
+            with self._lock:
+                old = entry["agent"]
+                entry["agent"] = agent
+                self.builds += 1
+            self._close([{"agent": old}])
+            return agent
+
+    def discard(self, session_id):
+        """Drops a session's agent, e.g. when its user clears the conversation."""
+        with self._lock:
+            entry = self.entries.pop(session_id, None)
+            self._session_locks.pop(session_id, None)
+        self._close([entry] if entry is not None else [])
+
+    def clear(self):
+        with self._lock:
+            entries = list(self.entries.values())
+            self.entries.clear()
+            self._session_locks.clear()
+        self._close(entries)
+
+    def stats(self):
+        """Pool counters and, per agent, its turns, message count, conversation bytes and idle time."""
+        now = time.time()
+        with self._lock:
+            removed = self._expire(now)
+            agents = [{
+                "session_id": session_id,
+                "turns": entry["turns"],
+                "messages": len(getattr(entry["agent"], "messages", [])),
+                "bytes": message_bytes(entry["agent"]),
+                "idle_seconds": round(now - entry["last_used"], 1),
+            } for session_id, entry in self.entries.items()]
+        self._close(removed)
+        return {"agents": len(agents), "max_agents": self.max_agents, "builds": self.builds,
+                "reuses": self.reuses, "total_bytes": sum(agent["bytes"] for agent in agents), "per_agent": agents}
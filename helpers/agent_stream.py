@@ -0,0 +1,189 @@
+import time
+import queue
+import asyncio
+import threading
+
+# events yielded to the UIs:
+#   {"type": "token", "text": ...}                    a piece of the answer as the model writes it
+#   {"type": "tool_start", "id", "name", "input"}     the agent called a tool
+#   {"type": "tool_end", "id", "name", "output"}      the tool returned
+#   {"type": "final", "text": ...}                    the complete answer
+_DONE = object()
+
+
+def message_text(content):
+    """Text of a message content, which is a string or a list of content blocks."""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content or [])
+
+
+def shorten(text, limit=200):
+    text = str(text)
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+async def langgraph_events(stream):
+    """
+    Events of a LangGraph agent streamed with stream_mode=["messages", "updates"]: tokens come
+    from the message chunks, tool calls and results from the node updates.
+    """
+    tool_names = {}
+    async for mode, payload in stream:
+        if mode == "messages":
+            chunk, metadata = payload
+            # tool results are streamed as messages too; only the model's text is an answer token
+            if getattr(chunk, "type", None) in ("AIMessageChunk", "ai"):
+                text = message_text(chunk.content)
+                if text:
+                    yield {"type": "token", "text": text}
+        elif mode == "updates":
+            for update in payload.values():
+                for message in (update or {}).get("messages", []):
+                    if getattr(message, "type", None) == "tool":
+                        yield {"type": "tool_end", "id": message.tool_call_id,
+                               "name": tool_names.get(message.tool_call_id, getattr(message, "name", None)),
+                               "output": shorten(message_text(message.content))}
+                    elif getattr(message, "tool_calls", None):
+                        for call in message.tool_calls:
+                            tool_names[call["id"]] = call["name"]
+                            yield {"type": "tool_start", "id": call["id"], "name": call["name"],
+                                   "input": shorten(call["args"])}
+                    elif getattr(message, "type", None) == "ai":
+                        yield {"type": "final", "text": message_text(message.content)}
+
+
+async def strands_events(stream):
+    """Events of a Strands agent's stream_async: text deltas, tool uses, tool results and the result."""
+    tool_names = {}
+    async for event in stream:
+        if "data" in event:
+            if event["data"]:
+                yield {"type": "token", "text": event["data"]}
+        elif "message" in event:
+            # the model's message carries the complete tool uses, the next user message their results
+            for block in event["message"].get("content", []):
+                if "toolUse" in block:
+                    tool_use = block["toolUse"]
+                    tool_names[tool_use.get("toolUseId")] = tool_use.get("name")
+                    yield {"type": "tool_start", "id": tool_use.get("toolUseId"), "name": tool_use.get("name"),
+                           "input": shorten(tool_use.get("input"))}
+                elif "toolResult" in block:
+                    result = block["toolResult"]
+                    yield {"type": "tool_end", "id": result.get("toolUseId"), "name": tool_names.get(result.get("toolUseId")),
+                           "output": shorten(message_text(result.get("content", [])))}
+        elif "result" in event:
+            yield {"type": "final", "text": str(event["result"])}
+
+
+def iter_events(make_stream, join_timeout=5.0, stopped=None):
+    """
+    Runs the async generator returned by make_stream() on an event loop in a background thread
+    and yields its items as they arrive, so synchronous code such as a Streamlit script can
+    render them one by one. Errors of the stream are raised here.
+
+    If the consumer stops early (the iterator is closed, e.g. because Streamlit reruns the script
+    on a new message), the stream's task is cancelled, which closes the HTTP stream to Ollama and
+    stops further tool calls, and the thread gets up to `join_timeout` seconds to unwind. The
+    `stopped` event, if given, is set once the thread is done, so the caller can tell whether
+    the stream is still touching its agent.
+    """
+    items = queue.Queue()
+    running = {}
+    started = threading.Event()
+    stopped = stopped if stopped is not None else threading.Event()
+
+    async def pump():
+        running["loop"], running["task"] = asyncio.get_running_loop(), asyncio.current_task()
+        started.set()
+        try:
+            async for item in make_stream():
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+        finally:
+            items.put(_DONE)
+
+    def run():
+        try:
+            asyncio.run(pump())
+        finally:
+            stopped.set()
+
+    thread = threading.Thread(target=run, name="agent-stream", daemon=True)
+    thread.start()
+    started.wait()
+    finished = False
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                finished = True
+                return
+            if isinstance(item, BaseException):
+                finished = True
+                raise item
+            yield item
+    finally:
+        if not finished:
+            try:
+                running["loop"].call_soon_threadsafe(running["task"].cancel)
+            except RuntimeError:
+                pass  # the loop closed as the stream ended on its own
+        # a tool running in a worker thread finishes on its own; don't wait for it indefinitely
+        thread.join(join_timeout)
+
+
+class StreamTimer:
+    """Time to first token and total time of a streamed answer."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.end = None
+
+    def observe(self, event):
+        if event["type"] == "token" and self.first_token is None:
+            self.first_token = time.perf_counter() - self.start
+        elif event["type"] == "final":
+            self.end = time.perf_counter() - self.start
+
+    def summary(self):
+        first = f"first token {self.first_token:.1f}s" if self.first_token is not None else "no tokens"
+        total = self.end if self.end is not None else time.perf_counter() - self.start
+        return f"{first}, answer {total:.1f}s"
+
+
+class AnswerView:
+    """
+    Renders agent events: tool calls and results go to a status box, answer tokens to a
+    container. Call it with each event; it returns True for answer tokens.
+    """
+
+    def __init__(self, status, container):
+        self.status = status
+        self.container = container
+        self.answer = ""
+        self.timer = StreamTimer()
+
+    def __call__(self, event):
+        self.timer.observe(event)
+        if event["type"] == "token":
+            self.answer += event["text"]
+            self.container.markdown(self.answer + "▌")
+            return True
+        if event["type"] == "tool_start":
+            self.status.update(label=f"Calling {event['name']}...")
+            self.status.write(f"🔧 `{event['name']}` {event['input']}")
+            # text written before a tool call was the model thinking aloud, not the answer
+            self.answer = ""
+            self.container.empty()
+        elif event["type"] == "tool_end":
+            self.status.write(f"✅ `{event['name']}` {event['output']}")
+        elif event["type"] == "final":
+            self.answer = event["text"] or self.answer
+        return False
+
+    def finish(self):
+        self.container.markdown(self.answer)
+        self.status.update(label=self.timer.summary(), state="complete")
@@ -0,0 +1,178 @@
+import time
+import itertools
+import tempfile
+import numpy as np
+from . import config_handler, sharding
+from .faiss_index import recall_at_k, split_queries
+
+SPACES = ("l2", "cosine", "ip")
+# vectors per add() call while building a test collection
+ADD_BATCH_SIZE = 4096
+
+
+def load_vectors(persistent_directory, max_vectors=20000):
+    """
+    Reads the stored embeddings of the index (every shard when it is sharded), keeping a random
+    sample of at most `max_vectors` so a sweep stays quick on large corpora.
+    """
+    import chromadb
+    client = chromadb.PersistentClient(path=persistent_directory)
+    names = [collection if isinstance(collection, str) else collection.name for collection in client.list_collections()]
+    sharded = [name for name in names if name.startswith(sharding.SHARD_PREFIX)]
+    chunks = []
+    for name in sharded or names:
+        collection = client.get_collection(name)
+        for offset in range(0, collection.count(), ADD_BATCH_SIZE):
+            embeddings = collection.get(include=["embeddings"], limit=ADD_BATCH_SIZE, offset=offset)["embeddings"]
+            chunks.append(np.asarray(embeddings, dtype="float32"))
+    vectors = np.concatenate(chunks) if chunks else np.zeros((0, 0), dtype="float32")
+    if len(vectors) > max_vectors:
+        vectors = vectors[np.random.default_rng(0).choice(len(vectors), max_vectors, replace=False)]
+    return vectors
+
+
+def exact_top_k(vectors, queries, k, space="l2", batch_size=256):
+    """
+    Ground truth: the ids of the k nearest vectors of each query under Chroma's distance for the
+    space (squared L2, 1 - cosine similarity or 1 - inner product), by brute force in batches of
+    queries so the distance matrix stays small.
+    """
+    if space == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    squared_norms = (vectors ** 2).sum(axis=1)
+    k = min(k, len(vectors))
+    result = np.empty((len(queries), k), dtype="int64")
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        products = batch @ vectors.T
+        # the query's own norm does not change its ranking, so it is left out of the L2 distance
+        distances = squared_norms - 2 * products if space == "l2" else -products
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distances, nearest, axis=1).argsort(axis=1)
+        result[start:start + batch_size] = np.take_along_axis(nearest, order, axis=1)
+    return result
+
+
+def estimated_index_mb(count, dimension, m):
+    """Approximate HNSW size: float32 vectors plus 2*M level-0 links per vector (upper levels are small)."""
+    return count * (4 * dimension + 8 * m + 16) / 1e6
+
+
+def build_collection(client, name, vectors, space, m, construction_ef, search_ef):
+    collection = client.create_collection(name, metadata={"hnsw:space": space, "hnsw:M": m,
+                                                           "hnsw:construction_ef": construction_ef,
+                                                           "hnsw:search_ef": search_ef})
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), ADD_BATCH_SIZE):
+        batch = vectors[offset:offset + ADD_BATCH_SIZE]
+        collection.add(ids=[str(i) for i in range(offset, offset + len(batch))], embeddings=batch)
+    return collection, time.perf_counter() - start
+
+
+def measure(collection, queries, truth, k):
+    """Runs the queries one at a time, as the retriever does; returns recall@k and per-query latencies."""
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        ids = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0]
+        latencies.append(time.perf_counter() - start)
+        found.append([int(i) for i in ids] + [-1] * (k - len(ids)))
+    return recall_at_k(np.array(found), truth), np.array(latencies)
+
+
+def sweep(vectors, queries, k=10, spaces=("l2",), m_values=(8, 16, 32), construction_efs=(100, 200),
+          search_efs=(10, 50, 100, 200)):
+    """
+    Builds a throwaway Chroma collection for every combination of the parameters and queries it.
+    Returns one row per combination with recall@k against exact search, p50/p99 latency, build
+    time and estimated index size.
+    """
+    import chromadb
+    rows = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        client = chromadb.PersistentClient(path=temp_dir)
+        for space in spaces:
+            truth = exact_top_k(vectors, queries, k, space)
+            # Chroma applies ef_search when it loads a collection, so every combination gets its own build
+            for m, construction_ef, search_ef in itertools.product(m_values, construction_efs, search_efs):
+                collection, build_seconds = build_collection(client, "ann-tuning", vectors, space,
+                                                             m, construction_ef, search_ef)
+                recall, latencies = measure(collection, queries, truth, k)
+                client.delete_collection(collection.name)
+                rows.append({
+                    "space": space, "M": m, "construction_ef": construction_ef, "search_ef": search_ef,
+                    "recall": round(recall, 4),
+                    "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+                    "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+                    "build_seconds": round(build_seconds, 2),
+                    "index_mb": round(estimated_index_mb(len(vectors), vectors.shape[1], m), 2),
+                })
+                print(format_row(rows[-1]))
+    return rows
+
+
+def choose(rows, target_recall=0.95):
+    """Picks the fastest (p99) combination that reaches the target recall, else the one with the best recall."""
+    good = [row for row in rows if row["recall"] >= target_recall]
+    if not good:
+        return max(rows, key=lambda row: (row["recall"], -row["p99_ms"]))
+    return min(good, key=lambda row: (row["p99_ms"], row["index_mb"], -row["recall"]))
+
+
+def format_row(row):
+    return (f"{row['space']:<7} {row['M']:>4} {row['construction_ef']:>7} {row['search_ef']:>6} {row['recall']:>8.4f} "
+            f"{row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['build_seconds']:>8.2f} {row['index_mb']:>9.2f}")
+
+
+REPORT_HEADER = (f"{'space':<7} {'M':>4} {'ef_con':>7} {'ef_s':>6} {'recall':>8} {'p50 ms':>8} {'p99 ms':>8} "
+                 f"{'build s':>8} {'size MB':>9}")
+
+
+def write_choice(row, config_file=config_handler.CONFIG_FILE_PATH):
+    """Writes the chosen parameters to [Index], where setup_vector_store creates collections with them."""
+    for key, value in (("hnsw_space", row["space"]), ("hnsw_m", row["M"]),
+                       ("hnsw_construction_ef", row["construction_ef"]), ("hnsw_search_ef", row["search_ef"])):
+        config_handler.write_setting("Index", key, value, config_file)
+
+
+def parse_list(value, cast=int):
+    return tuple(cast(item.strip()) for item in value.split(",") if item.strip())
+
+
+if __name__ == "__main__":
+    import argparse
+    current = config_handler.get_hnsw_settings()
+    parser = argparse.ArgumentParser(description="Sweep Chroma HNSW parameters against exact nearest neighbours.")
+    parser.add_argument("--db-path", default=config_handler.get_db_path(), help="Chroma index to sample vectors from")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query for recall@k")
+    parser.add_argument("--queries", type=int, default=200, help="Stored vectors held out as queries")
+    parser.add_argument("--max-vectors", type=int, default=20000, help="Vectors sampled from the index")
+    parser.add_argument("--space", default=current["space"], help="Comma separated spaces among l2, cosine, ip")
+    parser.add_argument("--m", default="8,16,32", help="Comma separated M values")
+    parser.add_argument("--ef-construction", default="100,200", help="Comma separated ef_construction values")
+    parser.add_argument("--ef-search", default="10,50,100,200", help="Comma separated ef_search values")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="Recall the chosen parameters must reach")
+    parser.add_argument("--write", action="store_true", help="Write the chosen parameters to the configuration file")
+    args = parser.parse_args()
+
+    spaces = parse_list(args.space, str)
+    if any(space not in SPACES for space in spaces):
+        parser.error(f"--space must be among {', '.join(SPACES)}")
+    vectors, queries = split_queries(load_vectors(args.db_path, args.max_vectors), args.queries)
+    if len(vectors) <= args.k:
+        parser.error(f"The index at {args.db_path} has too few vectors to tune")
+    print(f"Tuning on {len(vectors)} vectors of dimension {vectors.shape[1]} with {len(queries)} held-out queries")
+    print(REPORT_HEADER)
+    rows = sweep(vectors, queries, k=args.k, spaces=spaces, m_values=parse_list(args.m),
+                 construction_efs=parse_list(args.ef_construction), search_efs=parse_list(args.ef_search))
+    defaults = [row for row in rows if (row["space"], row["M"], row["construction_ef"], row["search_ef"]) ==
+                (current["space"], current["M"], current["construction_ef"], current["search_ef"])]
+    if defaults:
+        print(f"Current settings:\n{format_row(defaults[0])}")
+    chosen = choose(rows, args.target_recall)
+    print(f"Chosen for recall >= {args.target_recall}:\n{format_row(chosen)}")
+    if args.write:
+        write_choice(chosen)
+        print(f"Wrote the parameters to [Index] in {config_handler.CONFIG_FILE_PATH}; "
+              f"re-index (or rebuild) so new collections are created with them")
@@ -0,0 +1,125 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+
+
+def normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return list(vector)
+    return [x / norm for x in vector]
+
+
+def cosine_similarity(a, b):
+    """Cosine similarity of two vectors that are already normalized."""
+    return sum(x * y for x, y in zip(a, b))
+
+
+class SemanticAnswerCache:
+    """
+    Caches answers by the embedding of the standalone question.
+
+    A lookup is a hit when a stored question for the same model is at least
+    `similarity_threshold` similar to the new one. Entries are evicted least
+    recently used first once `max_entries` is reached, expire after `ttl`
+    seconds, and are all dropped when the index version changes.
+    """
+
+    def __init__(self, embeddings, index_version_fn=None, similarity_threshold=0.92,
+                 max_entries=512, ttl=86400):
+        self.embeddings = embeddings
+        self.index_version_fn = index_version_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.index_version = None
+        self.hits = 0
+        self.misses = 0
+        self._next_key = 0
+        self._recent_vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, question):
+        # a miss is followed by a store of the same question, so keep the
+        # last few vectors around instead of embedding it twice
+        with self._lock:
+            vector = self._recent_vectors.get(question)
+        if vector is None:
+            vector = normalize(self.embeddings.embed_query(question))
+            with self._lock:
+                self._recent_vectors[question] = vector
+                while len(self._recent_vectors) > 64:
+                    self._recent_vectors.popitem(last=False)
+        return vector
+
+    def _check_index_version(self):
+        if self.index_version_fn is None:
+            return
+        version = self.index_version_fn()
+        if version != self.index_version:
+            self.entries.clear()
+            self.index_version = version
+
+    def _expire(self, now):
+        if not self.ttl:
+            return
+        expired = [key for key, entry in self.entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self.entries[key]
+
+    def lookup(self, question, model):
+        """Returns the cached {"question", "answer", "sources"} for a similar question, or None."""
+        vector = self._embed(question)
+        with self._lock:
+            self._check_index_version()
+            self._expire(time.time())
+            best_key, best_score = None, self.similarity_threshold
+            for key, entry in self.entries.items():
+                if entry["model"] != model:
+                    continue
+                score = cosine_similarity(vector, entry["vector"])
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self.entries[best_key]
+            return {"question": entry["question"], "answer": entry["answer"],
+                    "sources": list(entry["sources"]), "score": best_score}
+
+    def store(self, question, model, answer, sources):
+        """Stores the answer and its source documents for a standalone question."""
+        if not answer:
+            return
+        vector = self._embed(question)
+        with self._lock:
+            self._check_index_version()
+            self.entries[self._next_key] = {
+                "question": question,
+                "model": model,
+                "vector": vector,
+                "answer": answer,
+                "sources": list(sources or []),
+                "created": time.time(),
+            }
+            self._next_key += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
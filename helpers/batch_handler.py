@@ -0,0 +1,156 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+QUESTION_FIELDS = ("question", "input", "query", "title")
+
+
+def normalize_question(question):
+    return " ".join(question.split())
+
+
+def read_questions(input_path, field=None):
+    """
+    Reads questions from a text file (one per line) or a JSONL file (one object per line).
+
+    For JSONL the question is taken from `field`, or the first of QUESTION_FIELDS present.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"The specified input file does not exist: {input_path}")
+    is_jsonl = os.path.splitext(input_path)[1].lower() in (".jsonl", ".json")
+    questions = []
+    with open(input_path, "r") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if not is_jsonl:
+                questions.append(line)
+                continue
+            record = json.loads(line)
+            fields = [field] if field else QUESTION_FIELDS
+            question = next((record[name] for name in fields if record.get(name)), None)
+            if question is None:
+                raise ValueError(f"No question field found on line {line_number} of {input_path}")
+            questions.append(str(question))
+    return questions
+
+
+def deduplicate(questions):
+    """Returns the unique questions in input order and the number of duplicates dropped."""
+    seen = set()
+    unique = []
+    for question in questions:
+        key = normalize_question(question)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(key)
+    return unique, len(questions) - len(unique)
+
+
+def load_completed(output_path):
+    """Returns the questions already answered in an existing results file, so a run can resume."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # a partially written last line from an interrupted run
+                continue
+            if record.get("error") is None and "question" in record:
+                completed.add(normalize_question(record["question"]))
+    return completed
+
+
+def ends_with_newline(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_batch(answer_fn, questions, output_path, concurrency=2, resume=True):
+    """
+    Answers the questions with `answer_fn(question) -> (answer, sources)` using a bounded thread pool.
+
+    Each result is appended to `output_path` as a JSON line as soon as it completes; with
+    `resume` the questions already answered in that file are skipped. Returns a summary dict.
+    """
+    unique, duplicates = deduplicate(questions)
+    completed = load_completed(output_path) if resume else set()
+    pending = [question for question in unique if question not in completed]
+
+    latencies = []
+    failed = 0
+
+    def answer_one(question):
+        start = time.perf_counter()
+        try:
+            answer, sources = answer_fn(question)
+            error = None
+        except Exception as e:
+            answer, sources, error = None, [], str(e)
+        return {
+            "question": question,
+            "answer": answer,
+            "sources": sources,
+            "latency": round(time.perf_counter() - start, 4),
+            "error": error,
+        }
+
+    started = time.perf_counter()
+    with open(output_path, "a" if resume else "w") as out:
+        if resume and not ends_with_newline(output_path):
+            # start on a fresh line if the previous run was killed mid-write
+            out.write("\n")
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [executor.submit(answer_one, question) for question in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if record["error"] is None:
+                    latencies.append(record["latency"])
+                else:
+                    failed += 1
+                    print(f"Error answering {record['question']!r}: {record['error']}")
+    elapsed = time.perf_counter() - started
+
+    return {
+        "questions": len(questions),
+        "duplicates": duplicates,
+        "resumed": len(unique) - len(pending),
+        "answered": len(latencies),
+        "failed": failed,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+    }
+
+
+def print_summary(summary):
+    print("=" * 60)
+    print("Batch summary")
+    print("=" * 60)
+    print(f"Questions read:      {summary['questions']}")
+    print(f"Duplicates skipped:  {summary['duplicates']}")
+    print(f"Already answered:    {summary['resumed']}")
+    print(f"Answered:            {summary['answered']}")
+    print(f"Failed:              {summary['failed']}")
+    print(f"Elapsed:             {summary['elapsed']:.2f} s")
+    print(f"Throughput:          {summary['throughput']:.2f} questions/s")
+    print(f"Latency p50 / p95:   {summary['latency_p50']:.2f} s / {summary['latency_p95']:.2f} s")
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+
+CHECKPOINT_FILE = "build_checkpoint.json"
+
+
+def file_state(path):
+    """Returns [mtime_ns, size] of a file, which tells whether it changed since it was indexed."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class BuildCheckpoint:
+    """
+    Records the progress of a bulk index build, so an interrupted build can resume.
+
+    Finished files are kept with the state they had when they were indexed; the file being
+    indexed keeps the number of chunk batches already stored. The checkpoint is only valid
+    for the `fingerprint` it was written with (embedding model, split and shard settings):
+    a build with other settings has to start over. Every update is written to disk atomically.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.files = {}
+        self.partial = {}
+        self.completed = False
+        self.started_at = time.time()
+
+    def load(self):
+        """Loads the saved checkpoint; returns False (and keeps an empty one) if there is none or it does not match."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("fingerprint") != self.fingerprint:
+            return False
+        self.files = state.get("files", {})
+        self.partial = state.get("partial", {})
+        self.completed = state.get("completed", False)
+        self.started_at = state.get("started_at", self.started_at)
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_file = self.path + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "started_at": self.started_at, "completed": self.completed,
+                       "files": self.files, "partial": self.partial}, f)
+        os.replace(temp_file, self.path)
+
+    def reset(self):
+        self.files, self.partial, self.completed = {}, {}, False
+        self.started_at = time.time()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def is_done(self, path, state):
+        return path in self.files and self.files[path]["state"] == state
+
+    def batches_done(self, path, state):
+        """Returns how many chunk batches of the file are already stored, 0 if it changed since."""
+        partial = self.partial.get(path)
+        return partial["batches"] if partial and partial["state"] == state else 0
+
+    def record_batch(self, path, state, batches, chunks):
+        self.completed = False
+        self.partial[path] = {"state": state, "batches": batches, "chunks": chunks}
+        self.save()
+
+    def record_file(self, path, state, chunks):
+        self.completed = False
+        self.partial.pop(path, None)
+        self.files[path] = {"state": state, "chunks": chunks}
+        self.save()
+
+    def forget(self, path):
+        self.files.pop(path, None)
+        self.partial.pop(path, None)
+        self.save()
+
+    def sources(self):
+        """Returns the files with chunks stored by the checkpointed build."""
+        return list(dict.fromkeys(list(self.files) + list(self.partial)))
+
+    def complete(self):
+        self.completed = True
+        self.save()
+
+    def summary(self):
+        return {
+            "files_done": len(self.files),
+            "files_partial": len(self.partial),
+            "chunks": sum(entry["chunks"] for entry in self.files.values()),
+            "completed": self.completed,
+        }
+
+
+class BuildProgress:
+    """Tracks files and chunks indexed by this run and estimates the time left from the file rate."""
+
+    def __init__(self, total_files, done_files=0):
+        self.total_files = total_files
+        self.done_files = done_files
+        self.files = 0
+        self.chunks = 0
+        self.start = time.perf_counter()
+
+    def update(self, files=0, chunks=0):
+        self.files += files
+        self.chunks += chunks
+
+    def stats(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        files_per_second = self.files / elapsed
+        remaining = self.total_files - self.done_files - self.files
+        return {
+            "files": self.done_files + self.files,
+            "total_files": self.total_files,
+            "chunks": self.chunks,
+            "files_per_second": round(files_per_second, 2),
+            "chunks_per_second": round(self.chunks / elapsed, 2),
+            "eta_seconds": round(remaining / files_per_second) if files_per_second else None,
+        }
+
+    def line(self):
+        stats = self.stats()
+        eta = "unknown" if stats["eta_seconds"] is None else time.strftime("%H:%M:%S", time.gmtime(stats["eta_seconds"]))
+        return (f"{stats['files']}/{stats['total_files']} files, {stats['chunks']} chunks, "
+                f"{stats['files_per_second']} files/s, {stats['chunks_per_second']} chunks/s, ETA {eta}")
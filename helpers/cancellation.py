@@ -0,0 +1,180 @@
+import asyncio
+import threading
+
+# producer tasks of cancelled streams, kept referenced until they have unwound
+_unwinding = set()
+
+
+class CancelToken:
+    """Cancellation request for one generation; `reason` says why, e.g. superseded or disconnected."""
+
+    def __init__(self):
+        self.reason = None
+        self._event = asyncio.Event()
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def cancel(self, reason="cancelled"):
+        if self.reason is None:
+            self.reason = reason
+            self._event.set()
+
+    async def wait(self):
+        await self._event.wait()
+
+
+async def until_cancelled(stream, token):
+    """
+    Yields the items of an async stream until the token is cancelled, then cancels the stream.
+
+    The stream runs in its own task, so cancelling it interrupts whatever it awaits at that
+    moment (the HTTP stream from Ollama, a retriever call, a tool) rather than waiting for its
+    next item; closing the HTTP stream makes Ollama stop generating and frees its slot.
+    """
+    items = asyncio.Queue(maxsize=1)
+    done = object()
+
+    async def produce():
+        try:
+            async for item in stream:
+                await items.put((item, None))
+            await items.put((done, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await items.put((done, e))
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            get = asyncio.ensure_future(items.get())
+            cancelled = asyncio.ensure_future(token.wait())
+            try:
+                await asyncio.wait({get, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                cancelled.cancel()
+                if not get.done():
+                    get.cancel()
+            if not get.done() or get.cancelled():
+                return
+            item, error = get.result()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
+            _unwinding.add(producer)
+            producer.add_done_callback(_unwinding.discard)
+
+
+class GenerationTracker:
+    """
+    Keeps the in-flight generation of each session: starting a new one cancels the previous
+    one (superseded). Counts completed and cancelled generations and the tokens streamed for
+    answers that were then abandoned.
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+        self.completed = 0
+        self.completed_tokens = 0
+        self.cancelled = {}
+        self.cancelled_tokens = 0
+        self._lock = threading.Lock()
+
+    def start(self, session_id):
+        """Returns the token of a new generation for the session, cancelling the one in flight."""
+        token = CancelToken()
+        with self._lock:
+            previous = self.in_flight.get(session_id)
+            self.in_flight[session_id] = token
+        if previous is not None:
+            previous.cancel("superseded")
+        return token
+
+    def cancel(self, session_id, reason="cancelled"):
+        with self._lock:
+            token = self.in_flight.get(session_id)
+        if token is not None:
+            token.cancel(reason)
+        return token is not None
+
+    def finish(self, session_id, token, tokens):
+        """Records how the generation ended; `tokens` is how many were streamed before it did."""
+        with self._lock:
+            if self.in_flight.get(session_id) is token:
+                del self.in_flight[session_id]
+        if token.cancelled:
+            self.record_cancelled(tokens, token.reason)
+        else:
+            self.record_completed(tokens)
+
+    def record_completed(self, tokens):
+        with self._lock:
+            self.completed += 1
+            self.completed_tokens += tokens
+
+    def record_cancelled(self, tokens, reason):
+        with self._lock:
+            self.cancelled[reason] = self.cancelled.get(reason, 0) + 1
+            self.cancelled_tokens += tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self.in_flight),
+                "completed": self.completed,
+                "completed_tokens": self.completed_tokens,
+                "cancelled": dict(self.cancelled),
+                "cancelled_tokens": self.cancelled_tokens,
+            }
+
+    def summary(self):
+        stats = self.stats()
+        return f"{sum(stats['cancelled'].values())} answers cancelled, {stats['cancelled_tokens']} tokens discarded"
+
+
+tracker = None
+tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    """The process's generation tracker, shared by every app session and rerun."""
+    global tracker
+    with tracker_lock:
+        if tracker is None:
+            tracker = GenerationTracker()
+        return tracker
+
+
+def run_generation(stream, handle, tracker, on_abandon=None):
+    """
+    Passes the items of a synchronous answer stream to `handle`, which returns True for items
+    that carry answer tokens, and records how the generation ended in `tracker`.
+
+    Streamlit stops a script run that is still streaming when a new message arrives, by raising
+    an exception that is not an Exception subclass. On that or any error the stream is closed,
+    which closes the HTTP stream so Ollama stops generating the abandoned answer, then
+    `on_abandon()` can undo the unfinished turn; an interrupted run is recorded as superseded.
+    Returns the number of tokens.
+    """
+    tokens = 0
+    try:
+        for item in stream:
+            if handle(item):
+                tokens += 1
+    except BaseException as e:
+        stream.close()
+        if on_abandon is not None:
+            on_abandon()
+        if not isinstance(e, Exception):
+            tracker.record_cancelled(tokens, "superseded")
+            print(f"Cancelled generation after {tokens} tokens")
+        raise
+    tracker.record_completed(tokens)
+    return tokens
@@ -0,0 +1,118 @@
+import re
+import hashlib
+from .splitter import count_tokens
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def text_overlap(first, second, min_overlap=20):
+    """Returns the length of the longest suffix of `first` that is a prefix of `second`, or 0 if shorter than min_overlap."""
+    if len(second) < min_overlap:
+        return 0
+    probe = second[:min_overlap]
+    position = first.find(probe, max(0, len(first) - len(second)))
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(probe, position + 1)
+    return 0
+
+
+def simhash(text, shingle_size=3):
+    """64-bit SimHash of the word shingles of a text; near-duplicate texts differ in few bits."""
+    words = WORD_PATTERN.findall(text.lower())
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.md5(shingle.encode("utf-8")).digest()[:8], "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming_distance(first, second):
+    return bin(first ^ second).count("1")
+
+
+def merge_key(document):
+    return document.metadata.get("source"), document.metadata.get("page")
+
+
+def merge_adjacent(documents, min_overlap=20):
+    """
+    Merges chunks of the same source (and page) that overlap or follow each other into one span.
+
+    Returns [(rank, document)] where rank is the best retrieval rank among the merged chunks.
+    """
+    groups = {}
+    for rank, document in enumerate(documents):
+        groups.setdefault(merge_key(document), []).append((rank, document))
+
+    spans = []
+    for members in groups.values():
+        members.sort(key=lambda member: member[1].metadata.get("start_index", -1))
+        rank, current = members[0]
+        text = current.page_content
+        start = current.metadata.get("start_index")
+        end = start + len(text) if start is not None else None
+        merged = 1
+        for next_rank, document in members[1:]:
+            next_start = document.metadata.get("start_index")
+            if end is not None and next_start is not None:
+                # the offsets say exactly how much of the chunk is already in the span, however short
+                adjacent = next_start <= end + 1
+                overlap = min(max(0, end - next_start), len(document.page_content)) if adjacent else 0
+            else:
+                adjacent = False
+                if document.page_content in text:
+                    overlap = len(document.page_content)
+                else:
+                    overlap = text_overlap(text, document.page_content, min_overlap)
+            if overlap or adjacent:
+                separator = " " if adjacent and next_start >= end else ""
+                text += separator + document.page_content[overlap:]
+                rank = min(rank, next_rank)
+                merged += 1
+                if next_start is not None:
+                    end = max(end or 0, next_start + len(document.page_content))
+            else:
+                spans.append((rank, with_text(current, text, merged)))
+                rank, current, text, merged = next_rank, document, document.page_content, 1
+                end = next_start + len(text) if next_start is not None else None
+        spans.append((rank, with_text(current, text, merged)))
+    return spans
+
+
+def with_text(document, text, merged):
+    if merged == 1:
+        return document
+    metadata = dict(document.metadata)
+    metadata["merged_chunks"] = merged
+    return document.__class__(page_content=text, metadata=metadata)
+
+
+def compact_documents(documents, max_distance=3, min_overlap=20):
+    """
+    Removes repeated text from retrieved chunks before they are stuffed into the prompt.
+
+    Overlapping or adjacent chunks of the same source are merged into one span, then chunks
+    whose SimHash is within `max_distance` bits of a better ranked chunk are dropped as near
+    duplicates. The result keeps the retrieval order and the prompt tokens saved are printed.
+    """
+    if len(documents) < 2:
+        return documents
+    kept = []
+    hashes = []
+    for rank, document in sorted(merge_adjacent(documents, min_overlap), key=lambda span: span[0]):
+        fingerprint = simhash(document.page_content)
+        if any(hamming_distance(fingerprint, other) <= max_distance for other in hashes):
+            continue
+        hashes.append(fingerprint)
+        kept.append(document)
+
+    before = sum(count_tokens(document.page_content) for document in documents)
+    after = sum(count_tokens(document.page_content) for document in kept)
+    if before > after:
+        print(f"Context compaction: {len(documents)} chunks -> {len(kept)}, "
+              f"{before} -> {after} tokens ({before - after} saved)")
+    return kept
@@ -0,0 +1,82 @@
+import re
+import threading
+
+CONDENSE_STRATEGIES = ("always", "skip", "speculative")
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+# words that usually point back at something said earlier in the conversation
+REFERENCE_WORDS = {"it", "its", "it's", "that", "this", "these", "those", "they", "them", "their", "he", "him",
+                   "his", "she", "her", "there", "former", "latter", "above", "previous", "same"}
+FOLLOW_UP_STARTS = ("and", "but", "also", "so", "then", "or")
+FOLLOW_UP_PHRASES = ("what about", "how about", "what else", "why not", "tell me more", "more on")
+
+
+def is_self_contained(question, min_words=4):
+    """
+    Cheap check for questions that can be understood without the chat history.
+
+    Short questions, questions starting like a follow-up ("and ...", "what about ...") and
+    questions with pronouns or other back references are assumed to need the rewrite.
+    """
+    text = question.lower().strip()
+    words = WORD_PATTERN.findall(text)
+    if len(words) < min_words:
+        return False
+    if words[0] in FOLLOW_UP_STARTS or text.startswith(FOLLOW_UP_PHRASES):
+        return False
+    return not any(word in REFERENCE_WORDS for word in words)
+
+
+def plan(question, history, strategy):
+    """
+    Decides how to turn the question into a standalone question.
+
+    Returns "no_history" or "self_contained" when the question is used as is, "rewrite" when
+    the rewrite runs before retrieval and "speculate" when retrieval on the question runs
+    while the rewrite is generated.
+    """
+    if strategy not in CONDENSE_STRATEGIES:
+        raise ValueError(f"Unknown condense strategy {strategy!r}, expected one of {CONDENSE_STRATEGIES}")
+    if not history:
+        return "no_history"
+    if strategy == "always":
+        return "rewrite"
+    if is_self_contained(question):
+        return "self_contained"
+    return "speculate" if strategy == "speculative" else "rewrite"
+
+
+def query_change(original, rewritten):
+    """Returns the fraction of distinct words (three or more characters) that differ between two queries."""
+    first = {word for word in WORD_PATTERN.findall(original.lower()) if len(word) > 2}
+    second = {word for word in WORD_PATTERN.findall(rewritten.lower()) if len(word) > 2}
+    if not first and not second:
+        return 0.0
+    return 1 - len(first & second) / len(first | second)
+
+
+class CondenseStats:
+    """Counts how each turn's question was condensed."""
+
+    OUTCOMES = ("no_history", "self_contained", "speculative_kept", "rewritten")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.OUTCOMES, 0)
+        self._lock = threading.Lock()
+
+    def record(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            turns = sum(self.counts.values())
+            avoided = self.counts["no_history"] + self.counts["self_contained"]
+            return {
+                "turns": turns,
+                **self.counts,
+                "rewrite_calls": self.counts["speculative_kept"] + self.counts["rewritten"],
+                # turns that did not wait for a rewrite call
+                "rewrite_avoided_rate": round(avoided / turns, 3) if turns else 0.0,
+                # rewrites whose retrieval results were already there
+                "speculative_kept_rate": round(self.counts["speculative_kept"] / turns, 3) if turns else 0.0,
+            }
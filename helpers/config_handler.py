@@ -1,3 +1,6 @@
+import os
+import re
+import json
 import configparser
 
 CONFIG_FILE_PATH='config/dev.ini'
@@ -69,6 +72,309 @@ def get_model(config_file=CONFIG_FILE_PATH):
     return model
 
 
+def read_settings(config_file=CONFIG_FILE_PATH):
+    """Reads the configuration file, ignoring inline ';' comments on values."""
+    config = configparser.ConfigParser(inline_comment_prefixes=(';',))
+    config.read(config_file)
+    return config
+
+
+def write_setting(section, key, value, config_file=CONFIG_FILE_PATH):
+    """
+    Sets one value in the configuration file in place, keeping its inline comment and the rest
+    of the file as they are (ConfigParser.write would drop every comment). Adds the key or the
+    section if they are missing.
+    """
+    with open(config_file, "r") as f:
+        lines = f.read().splitlines()
+    section_start = next((i for i, line in enumerate(lines) if line.strip().lower() == f"[{section.lower()}]"), None)
+    if section_start is None:
+        lines += ["", f"[{section}]", f"{key} = {value}"]
+    else:
+        section_end = next((i for i in range(section_start + 1, len(lines)) if lines[i].lstrip().startswith("[")),
+                           len(lines))
+        pattern = re.compile(rf"^(\s*{re.escape(key)}\s*=\s*)([^;]*?)(\s*;.*)?$", re.IGNORECASE)
+        for i in range(section_start + 1, section_end):
+            match = pattern.match(lines[i])
+            if match:
+                lines[i] = f"{match.group(1)}{value}{match.group(3) or ''}"
+                break
+        else:
+            while section_end > section_start + 1 and not lines[section_end - 1].strip():
+                section_end -= 1
+            lines.insert(section_end, f"{key} = {value}")
+    with open(config_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def get_answer_cache_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the semantic answer cache settings from the configuration file."""
+    config = read_settings(config_file)
+    return {
+        "enabled": config.getboolean('Cache', 'answer_cache_enabled', fallback=True),
+        "similarity_threshold": config.getfloat('Cache', 'answer_cache_similarity_threshold', fallback=0.92),
+        "max_entries": config.getint('Cache', 'answer_cache_max_entries', fallback=512),
+        "ttl": config.getint('Cache', 'answer_cache_ttl', fallback=86400),
+    }
+
+
+def get_docs_split_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the document chunking settings from the [Docs] section of the configuration file."""
+    config = read_settings(config_file)
+    split_method = config.get('Docs', 'docs_split_method', fallback='sentence').strip('"\'').lower()
+    if split_method not in ('sentence', 'paragraph', 'markdown', 'fixed'):
+        raise ValueError(f"docs_split_method must be sentence, paragraph, markdown or fixed, not {split_method!r}.")
+    return {
+        "chunk_size": config.getint('Docs', 'docs_chunk_size', fallback=512),
+        "chunk_overlap": config.getint('Docs', 'docs_chunk_overlap', fallback=50),
+        "split_method": split_method,
+    }
+
+
+def get_extraction_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the PDF/DOCX text extraction settings from the [Docs] section of the configuration file."""
+    config = read_settings(config_file)
+    cache_dir = config.get('Docs', 'docs_extract_cache_dir', fallback='')
+    if not cache_dir:
+        cache_dir = os.path.join(os.path.dirname(get_db_path(config_file)), 'extract_cache')
+    return {
+        "cache_dir": cache_dir,
+        "workers": config.getint('Docs', 'docs_extract_workers', fallback=0) or None,
+        "pages_per_task": config.getint('Docs', 'docs_extract_pages_per_task', fallback=16),
+    }
+
+
+def get_retrieval_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the retrieval and reranking settings from the configuration file."""
+    config = read_settings(config_file)
+    params = json.loads(config.get('Retrieval', 'retriever_params', fallback='{}') or '{}')
+    k = int(params.get("k", 5))
+    return {
+        "k": k,
+        "similarity_threshold": float(params.get("similarity_threshold", 0.0)),
+        "rerank_enabled": config.getboolean('Retrieval', 'rerank_enabled', fallback=True),
+        "fetch_k": max(k, config.getint('Retrieval', 'rerank_fetch_k', fallback=20)),
+        "score_gap": config.getfloat('Retrieval', 'rerank_score_gap', fallback=0.15),
+        "context_budget": config.getint('Retrieval', 'rerank_context_budget', fallback=1500),
+        "lexical_weight": config.getfloat('Retrieval', 'rerank_lexical_weight', fallback=0.3),
+        "compact_enabled": config.getboolean('Retrieval', 'compact_context', fallback=True),
+        "near_duplicate_distance": config.getint('Retrieval', 'near_duplicate_distance', fallback=3),
+    }
+
+
+def get_prompt_layout(config_file=CONFIG_FILE_PATH):
+    """Gets the prompt layout of the RAG chains: prefix_stable or context_first."""
+    config = read_settings(config_file)
+    layout = config.get('Chain', 'prompt_layout', fallback='context_first').lower()
+    if layout not in ('prefix_stable', 'context_first'):
+        raise ValueError(f"prompt_layout must be prefix_stable or context_first, not {layout!r}.")
+    return layout
+
+
+def get_condense_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the question condensing (history-aware rewrite) settings from the configuration file."""
+    config = read_settings(config_file)
+    strategy = config.get('Chain', 'condense_strategy', fallback='always').lower()
+    if strategy not in ('always', 'skip', 'speculative'):
+        raise ValueError(f"condense_strategy must be always, skip or speculative, not {strategy!r}.")
+    return {
+        "strategy": strategy,
+        "max_change": config.getfloat('Chain', 'condense_max_change', fallback=0.2),
+    }
+
+
+def get_index_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the vector index sharding and bulk build settings from the configuration file."""
+    config = read_settings(config_file)
+    shard_by = config.get('Index', 'shard_by', fallback='none').lower()
+    if shard_by not in ('none', 'folder', 'type', 'hash'):
+        raise ValueError(f"shard_by must be none, folder, type or hash, not {shard_by!r}.")
+    return {
+        "shard_by": shard_by,
+        "shard_count": config.getint('Index', 'shard_count', fallback=4),
+        "build_batch_size": config.getint('Index', 'build_batch_size', fallback=64),
+    }
+
+
+def get_hnsw_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the HNSW parameters new Chroma collections are created with (Chroma's defaults when unset)."""
+    config = read_settings(config_file)
+    space = config.get('Index', 'hnsw_space', fallback='l2').lower()
+    if space not in ('l2', 'cosine', 'ip'):
+        raise ValueError(f"hnsw_space must be l2, cosine or ip, not {space!r}.")
+    return {
+        "space": space,
+        "M": config.getint('Index', 'hnsw_m', fallback=16),
+        "construction_ef": config.getint('Index', 'hnsw_construction_ef', fallback=100),
+        "search_ef": config.getint('Index', 'hnsw_search_ef', fallback=10),
+    }
+
+
+def get_faiss_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the FAISS index type and search settings used by docs_db_handler from the configuration file."""
+    config = read_settings(config_file)
+    index_type = config.get('FAISS', 'index_type', fallback='flat').lower()
+    if index_type not in ('flat', 'hnsw', 'ivf_flat', 'ivf_pq'):
+        raise ValueError(f"index_type must be flat, hnsw, ivf_flat or ivf_pq, not {index_type!r}.")
+    return {
+        "index_type": index_type,
+        "nlist": config.getint('FAISS', 'nlist', fallback=0),
+        "nprobe": config.getint('FAISS', 'nprobe', fallback=8),
+        "pq_m": config.getint('FAISS', 'pq_m', fallback=16),
+        "pq_bits": config.getint('FAISS', 'pq_bits', fallback=8),
+        "hnsw_m": config.getint('FAISS', 'hnsw_m', fallback=32),
+        "ef_construction": config.getint('FAISS', 'ef_construction', fallback=200),
+        "ef_search": config.getint('FAISS', 'ef_search', fallback=64),
+        "train_sample": config.getint('FAISS', 'train_sample', fallback=50000),
+        "mmap": config.getboolean('FAISS', 'mmap', fallback=True),
+    }
+
+
+def get_work_queue_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the distributed indexing work queue settings from the [Index] section of the configuration file."""
+    config = read_settings(config_file)
+    return {
+        # empty: index_queue.sqlite3 in the DB_PATH directory
+        "queue_path": config.get('Index', 'queue_path', fallback='').strip(),
+        "lease_seconds": config.getfloat('Index', 'lease_seconds', fallback=300.0),
+        "max_attempts": config.getint('Index', 'max_attempts', fallback=3),
+    }
+
+
+def get_watcher_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the data folder watcher settings from the configuration file."""
+    config = read_settings(config_file)
+    mode = config.get('Watcher', 'mode', fallback='polling').lower()
+    if mode not in ('polling', 'events'):
+        raise ValueError(f"Watcher mode must be polling or events, not {mode!r}.")
+    return {
+        "mode": mode,
+        "interval": config.getfloat('Watcher', 'interval', fallback=5.0),
+        "debounce": config.getfloat('Watcher', 'debounce', fallback=2.0),
+    }
+
+
+def get_embedding_dispatch_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the query embedding batching settings from the configuration file."""
+    config = read_settings(config_file)
+    return {
+        "batch_window_ms": config.getfloat('Embedding', 'query_batch_window_ms', fallback=5),
+        "max_batch_size": config.getint('Embedding', 'query_max_batch_size', fallback=32),
+    }
+
+
+def get_ollama_url(config_file=CONFIG_FILE_PATH):
+    """Gets the Ollama server URL from the configuration file."""
+    config = read_settings(config_file)
+    return config.get('Ollama', 'ollama_api_url', fallback='http://localhost:11434')
+
+
+def get_ollama_pool_settings(config_file=CONFIG_FILE_PATH):
+    """
+    Gets the Ollama backend pool settings from the configuration file.
+
+    ollama_model_placement pins models to backends, e.g.
+    "mxbai-embed-large=http://embed:11434, llama3.2=http://gpu1:11434|http://gpu2:11434".
+    """
+    config = read_settings(config_file)
+    backends = config.get('Ollama', 'ollama_backends', fallback='') or get_ollama_url(config_file)
+    placement = {}
+    for entry in config.get('Ollama', 'ollama_model_placement', fallback='').split(','):
+        if not entry.strip():
+            continue
+        if '=' not in entry:
+            raise ValueError(f"ollama_model_placement entries must look like model=url|url, not {entry.strip()!r}.")
+        model, urls = entry.split('=', 1)
+        placement[model.strip()] = [url.strip() for url in urls.split('|') if url.strip()]
+    return {
+        "backends": [url.strip() for url in backends.split(',') if url.strip()],
+        "max_concurrency": config.getint('Ollama', 'ollama_backend_max_concurrency', fallback=4),
+        "placement": placement,
+        "health_interval": config.getfloat('Ollama', 'ollama_health_interval', fallback=10.0),
+        "queue_timeout": config.getfloat('Ollama', 'ollama_queue_timeout', fallback=300.0),
+        "host": config.get('Ollama', 'ollama_pool_host', fallback='127.0.0.1'),
+        "port": config.getint('Ollama', 'ollama_pool_port', fallback=11500),
+    }
+
+
+def parse_class_values(value, cast=float):
+    """Parses "interactive:8, batch:2" into {"interactive": 8.0, "batch": 2.0}."""
+    values = {}
+    for entry in value.split(','):
+        if not entry.strip():
+            continue
+        if ':' not in entry:
+            raise ValueError(f"Scheduler entries must look like class:value, not {entry.strip()!r}.")
+        name, number = entry.split(':', 1)
+        values[name.strip()] = cast(number.strip())
+    return values
+
+
+def get_scheduler_settings(config_file=CONFIG_FILE_PATH):
+    """
+    Gets the Ollama request scheduler settings from the configuration file.
+
+    scheduler_mode is off (the default), local (an in-process proxy orders this process's
+    requests only; other processes still compete for the same slots unscheduled) or shared
+    (ollama_backends is a shared `python -m helpers.ollama_pool` proxy that schedules the
+    requests of every app).
+    """
+    config = read_settings(config_file)
+    mode = config.get('Scheduler', 'scheduler_mode', fallback='off').strip().lower()
+    if mode not in ('off', 'local', 'shared'):
+        raise ValueError(f"scheduler_mode must be off, local or shared, not {mode!r}.")
+    weights = parse_class_values(config.get('Scheduler', 'scheduler_weights', fallback='interactive:8, batch:2, indexing:1'))
+    limits = parse_class_values(config.get('Scheduler', 'scheduler_limits', fallback=''), int)
+    default_class = config.get('Scheduler', 'scheduler_default_class', fallback='interactive').strip()
+    unknown = (set(limits) | {default_class}) - set(weights)
+    if unknown:
+        raise ValueError(f"Scheduler classes {sorted(unknown)} have no weight in scheduler_weights.")
+    return {"mode": mode, "weights": weights, "limits": limits, "default_class": default_class}
+
+
+def get_warmup_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the startup warm-up settings from the configuration file."""
+    config = read_settings(config_file)
+    models = config.get('Warmup', 'warmup_models', fallback='')
+    return {
+        "enabled": config.getboolean('Warmup', 'warmup_enabled', fallback=True),
+        "models": [model.strip() for model in models.split(',') if model.strip()],
+    }
+
+
+def get_server_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the HTTP chat server settings from the configuration file."""
+    config = read_settings(config_file)
+    return {
+        "host": config.get('Server', 'host', fallback='127.0.0.1'),
+        "port": config.getint('Server', 'port', fallback=8080),
+        "max_concurrency": config.getint('Server', 'max_concurrency', fallback=2),
+        "max_queue": config.getint('Server', 'max_queue', fallback=32),
+    }
+
+
+def get_agent_pool_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the per-session agent pool settings from the configuration file."""
+    config = read_settings(config_file)
+    return {
+        "max_agents": config.getint('Agent', 'agent_pool_max_agents', fallback=16),
+        "ttl": config.getint('Agent', 'agent_pool_ttl', fallback=1800),
+    }
+
+
+def get_sandbox_settings(config_file=CONFIG_FILE_PATH):
+    """Gets the settings of the sandbox workers that run tool code from the configuration file."""
+    config = read_settings(config_file)
+    return {
+        "workers": config.getint('Sandbox', 'sandbox_workers', fallback=2),
+        "max_jobs": config.getint('Sandbox', 'sandbox_max_jobs', fallback=200),
+        "cpu_seconds": config.getfloat('Sandbox', 'sandbox_cpu_seconds', fallback=2.0),
+        "wall_seconds": config.getfloat('Sandbox', 'sandbox_wall_seconds', fallback=5.0),
+        "memory_mb": config.getint('Sandbox', 'sandbox_memory_mb', fallback=512),
+        "queue_timeout": config.getfloat('Sandbox', 'sandbox_queue_timeout', fallback=10.0),
+    }
+
+
 if __name__ == "__main__":
     read_config()
     print(get_embedding_model())
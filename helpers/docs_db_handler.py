@@ -1,8 +1,17 @@
 import os
+import time
+import shutil
+import pickle
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.document_loaders import DirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema.document import Document
+from . import config_handler, splitter, faiss_index
+
+# names the version folder under the store folder that holds the current index.faiss and index.pkl
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2
 
 def load_docs(data_folder):
     print(f"Loading documents from {data_folder}")
@@ -15,44 +24,124 @@ def load_docs(data_folder):
 
 
 def split_docs(docs: list[Document]):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000,
-                                                   chunk_overlap=80,
-                                                   length_function=len,
-                                                   is_separator_regex=False)
-    return text_splitter.split_documents(docs)
+    settings = config_handler.get_docs_split_settings()
+    return splitter.split_documents(docs,
+                                    chunk_size=settings["chunk_size"],
+                                    chunk_overlap=settings["chunk_overlap"],
+                                    method=settings["split_method"])
+
+def build_db(chunks, embeddings_model, settings):
+    """
+    Embeds the chunks and stores them in a new FAISS index of the configured type (trained on a
+    sample of the vectors for IVF and PQ).
+    """
+    texts = [chunk.page_content for chunk in chunks]
+    vectors = np.array(embeddings_model.embed_documents(texts), dtype="float32")
+    index = faiss_index.new_index(vectors, settings)
+    vectorstore = FAISS(embedding_function=embeddings_model, index=index, docstore=InMemoryDocstore(),
+                        index_to_docstore_id={})
+    vectorstore.add_embeddings(zip(texts, vectors.tolist()), metadatas=[chunk.metadata for chunk in chunks])
+    print(f"Built a {type(index).__name__} over {index.ntotal} chunks")
+    return vectorstore
+
+def load_db(folder_path, embeddings, settings):
+    """
+    Loads a saved FAISS store like FAISS.load_local, but memory-maps the index when `mmap` is set,
+    so a large index opens at once and its pages are shared between processes.
+    """
+    # both files come from the version the pointer named when it was read
+    path = current_path(folder_path) or folder_path
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    index = faiss_index.read_index(os.path.join(path, "index.faiss"), settings)
+    return FAISS(embedding_function=embeddings, index=index, docstore=docstore,
+                 index_to_docstore_id=index_to_docstore_id)
+
+def current_path(folder_path):
+    """
+    Returns the folder holding the current index.faiss and index.pkl: the version the CURRENT
+    pointer names, or the store folder itself for a store saved before versions; None if empty.
+    """
+    pointer = os.path.join(folder_path, CURRENT_FILE)
+    if os.path.exists(pointer):
+        with open(pointer, "r") as f:
+            return os.path.join(folder_path, f.read().strip())
+    if os.path.exists(os.path.join(folder_path, "index.faiss")):
+        return folder_path
+    return None
+
+def save_db(vectorstore, folder_path):
+    """
+    Saves like save_local, but into a new version folder and then swaps the CURRENT pointer with
+    one rename, so a reader always gets an index and a docstore of the same version. Processes
+    that memory-map an older index keep reading its files; all but the last KEEP_VERSIONS
+    versions are removed.
+    """
+    version = f"v{time.time_ns()}"
+    vectorstore.save_local(os.path.join(folder_path, version))
+    pointer = os.path.join(folder_path, CURRENT_FILE)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+    versions = sorted(name for name in os.listdir(folder_path)
+                      if name.startswith("v") and name[1:].isdigit() and os.path.isdir(os.path.join(folder_path, name)))
+    for name in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(folder_path, name), ignore_errors=True)
 
 def init_db(chunks, embeddings_model, folder_path, embeddings):
     """
     Initialize FAISS with given chunks and embedding model, save it to the folder path, or load from the folder if it exists.
+    The index type and its search settings come from the [FAISS] section of the configuration.
     """
-    faiss_path = os.path.join(folder_path, "index.faiss")
-    if os.path.exists(faiss_path):
-        vectorstore = FAISS.load_local(folder_path, embeddings, allow_dangerous_deserialization=True)
+    settings = config_handler.get_faiss_settings()
+    if current_path(folder_path):
+        vectorstore = load_db(folder_path, embeddings, settings)
     else:
-        vectorstore = FAISS.from_documents(documents=chunks, embedding=embeddings_model)
-        os.makedirs(folder_path, exist_ok=True)
-        vectorstore.save_local(folder_path)
+        vectorstore = build_db(chunks, embeddings_model, settings)
+        save_db(vectorstore, folder_path)
     return vectorstore
 
 def add_db_docs(vectorstore, data_path, db_path, embeddings_model):
     """
     Load documents from the folder, check if they exist in the vectorstore, and add them if they don't.
     """
+    settings = config_handler.get_faiss_settings()
+    faiss_path = os.path.join(current_path(db_path) or db_path, "index.faiss")
     documents = load_docs(data_path)
+    added = False
     for document in documents:
         content = document.page_content
         embedding = embeddings_model.embed_query(content)
         result = vectorstore.similarity_search_by_vector(embedding, k=3)
         if not result:
             print("This content does not exist in vector database. Adding the content.")
+            if settings["mmap"]:
+                # a memory-mapped index is read-only; read it into RAM before adding to it
+                vectorstore.index = faiss_index.read_index(faiss_path, {**settings, "mmap": False})
+                settings = {**settings, "mmap": False}
             chunks = split_docs(content)
             vectorstore.add_texts(chunks)
-    vectorstore.save_local(db_path)
+            added = True
+    if added:
+        save_db(vectorstore, db_path)
     
     
 if __name__ == "__main__":
-    import config_handler
-    print('came here')
-    data_folder = config_handler.get_data_folder()
-    print(data_folder)
-    load_docs(data_folder)
+    import argparse
+    parser = argparse.ArgumentParser(description="Load the documents, or report recall and latency of the FAISS index types.")
+    parser.add_argument("--report", metavar="FAISS_FOLDER",
+                        help="Benchmark every index type on the vectors of the FAISS store saved in this folder")
+    parser.add_argument("--queries", type=int, default=200, help="Vectors held out as queries for the report")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query for recall@k")
+    args = parser.parse_args()
+    if args.report:
+        import faiss
+        settings = config_handler.get_faiss_settings()
+        vectors = faiss_index.stored_vectors(faiss.read_index(os.path.join(current_path(args.report) or args.report, "index.faiss")))
+        vectors, queries = faiss_index.split_queries(vectors, args.queries)
+        print(f"Benchmarking {len(vectors)} vectors of dimension {vectors.shape[1]} with {len(queries)} held-out queries")
+        print(faiss_index.format_report(faiss_index.benchmark(vectors, queries, settings, k=args.k), k=args.k))
+    else:
+        data_folder = config_handler.get_data_folder()
+        print(data_folder)
+        load_docs(data_folder)
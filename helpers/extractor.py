@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# bump when the extraction output changes, so cached text is extracted again
+EXTRACTOR_VERSION = "1"
+PARALLEL_EXTENSIONS = (".pdf", ".docx")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_file(cache_dir, digest):
+    return os.path.join(cache_dir, f"{digest}-v{EXTRACTOR_VERSION}.json")
+
+
+def read_cache(cache_dir, digest):
+    path = cache_file(cache_dir, digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def write_cache(cache_dir, digest, records):
+    os.makedirs(cache_dir, exist_ok=True)
+    # write to a temporary file first so readers never see a partial cache entry
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(records, f)
+    os.replace(temp_path, cache_file(cache_dir, digest))
+
+
+def with_source(records, path):
+    return [{"page_content": r["page_content"], "metadata": {**r["metadata"], "source": path}} for r in records]
+
+
+def count_pdf_pages(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def extract_pdf_pages(path, start, end):
+    """Extracts the text of pages [start, end) of a PDF; runs in a worker process."""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(number, reader.pages[number].extract_text()) for number in range(start, end)]
+
+
+def extract_docx(path):
+    """Extracts the text of a DOCX file; runs in a worker process."""
+    import docx2txt
+    return docx2txt.process(path)
+
+
+def extract_files(paths, cache_dir, workers=None, pages_per_task=16):
+    """
+    Extracts the text of PDF and DOCX files, one record per PDF page and one per DOCX file.
+
+    Results are cached in `cache_dir` by file hash and EXTRACTOR_VERSION, so unchanged files
+    are never parsed again. Uncached PDFs are split into ranges of `pages_per_task` pages that
+    are extracted across a pool of `workers` processes together with the DOCX files.
+    Returns {path: [{"page_content", "metadata"}]}; files that fail to extract are left out.
+    """
+    results = {}
+    digests = {}
+    for path in paths:
+        digest = file_hash(path)
+        cached = read_cache(cache_dir, digest)
+        if cached is not None:
+            results[path] = with_source(cached, path)
+        else:
+            digests[path] = digest
+    if not digests:
+        return results
+
+    records = {path: [] for path in digests}
+    failed = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = []
+        for path in digests:
+            if path.lower().endswith(".pdf"):
+                try:
+                    total = count_pdf_pages(path)
+                except Exception as e:
+                    print(f"Error reading {path}: {str(e)}")
+                    failed.add(path)
+                    continue
+                for start in range(0, total, pages_per_task):
+                    end = min(start + pages_per_task, total)
+                    tasks.append((path, total, pool.submit(extract_pdf_pages, path, start, end)))
+            else:
+                tasks.append((path, None, pool.submit(extract_docx, path)))
+        for path, total, future in tasks:
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error extracting {path}: {str(e)}")
+                failed.add(path)
+                continue
+            if total is None:
+                records[path].append({"page_content": result, "metadata": {}})
+            else:
+                records[path].extend({"page_content": text, "metadata": {"page": number, "total_pages": total}}
+                                     for number, text in result)
+
+    for path, digest in digests.items():
+        if path in failed:
+            continue
+        write_cache(cache_dir, digest, records[path])
+        results[path] = with_source(records[path], path)
+        print(f"Extracted {len(records[path])} pages from {path}")
+    return results
@@ -0,0 +1,152 @@
+import math
+import time
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+# k-means wants about this many training vectors per centroid
+TRAINING_POINTS_PER_CENTROID = 39
+
+
+def auto_nlist(count, nlist=0):
+    """Number of IVF clusters: `nlist` if set, else about 4 * sqrt(count), kept trainable from `count` vectors."""
+    if nlist <= 0:
+        nlist = int(4 * math.sqrt(count))
+    return max(1, min(nlist, count // TRAINING_POINTS_PER_CENTROID))
+
+
+def effective_index_type(count, settings):
+    """ivf_pq needs enough vectors to train its codebooks; smaller corpora use ivf_flat instead."""
+    index_type = settings["index_type"]
+    training = min(count, settings["train_sample"])
+    if index_type == "ivf_pq" and training < TRAINING_POINTS_PER_CENTROID * 2 ** settings["pq_bits"]:
+        print(f"Only {training} training vectors, too few to train PQ codes; using ivf_flat")
+        return "ivf_flat"
+    return index_type
+
+
+def factory_string(index_type, dimension, count, settings):
+    """Returns the faiss.index_factory description of an index type for `count` vectors (trained on at most `train_sample`)."""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{settings['hnsw_m']},Flat"
+    nlist = auto_nlist(min(count, settings["train_sample"]), settings["nlist"])
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        if dimension % settings["pq_m"]:
+            raise ValueError(f"pq_m={settings['pq_m']} must divide the embedding dimension {dimension}.")
+        return f"IVF{nlist},PQ{settings['pq_m']}x{settings['pq_bits']}"
+    raise ValueError(f"index_type must be one of {INDEX_TYPES}, not {index_type!r}.")
+
+
+def set_search_params(index, settings):
+    """Applies nprobe (IVF) or efSearch (HNSW) to a built or loaded index."""
+    import faiss
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = settings["ef_search"]
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(settings["nprobe"], ivf.nlist)
+    return index
+
+
+def new_index(vectors, settings):
+    """
+    Creates an empty, trained index for the vectors (a float32 matrix): IVF and PQ indexes are
+    trained on a random sample of at most `train_sample` of them. The vectors are not added.
+    """
+    import faiss
+    import numpy as np
+    count, dimension = vectors.shape
+    index_type = effective_index_type(count, settings)
+    index = faiss.index_factory(dimension, factory_string(index_type, dimension, count, settings))
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = settings["ef_construction"]
+    if not index.is_trained:
+        sample = vectors
+        if count > settings["train_sample"]:
+            sample = vectors[np.random.default_rng(0).choice(count, settings["train_sample"], replace=False)]
+        start = time.perf_counter()
+        index.train(sample)
+        print(f"Trained {index_type} index on {len(sample)} vectors in {time.perf_counter() - start:.1f}s")
+    return set_search_params(index, settings)
+
+
+def read_index(path, settings):
+    """
+    Reads a saved index, memory-mapped and read-only when `mmap` is set: it opens without reading
+    the vectors into RAM, and processes that map the same file share its pages.
+    """
+    import faiss
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if settings["mmap"] else 0
+    return set_search_params(faiss.read_index(path, flags), settings)
+
+
+def stored_vectors(index):
+    """Reads the vectors back from an index (approximations for PQ indexes)."""
+    import faiss
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def exact_neighbours(vectors, queries, k):
+    """Ground truth for the recall report: the ids of the k nearest vectors by L2 distance."""
+    import faiss
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index.search(queries, k)[1]
+
+
+def recall_at_k(found, truth):
+    """Fraction of the true k nearest neighbours that were returned, averaged over the queries."""
+    hits = sum(len(set(row) & set(true_row)) for row, true_row in zip(found.tolist(), truth.tolist()))
+    return hits / truth.size if truth.size else 0.0
+
+
+def split_queries(vectors, count=200):
+    """Holds out `count` random vectors as queries, so they are not in the benchmarked index."""
+    import numpy as np
+    order = np.random.default_rng(0).permutation(len(vectors))
+    count = min(count, len(vectors) // 10 or 1)
+    return vectors[order[count:]], vectors[order[:count]]
+
+
+def benchmark(vectors, queries, settings, k=10, index_types=INDEX_TYPES):
+    """
+    Builds each index type over the vectors and reports recall@k against exact search, the
+    mean latency per query (one query at a time, as the retriever searches), build time and
+    the size of the saved index.
+    """
+    import faiss
+    import numpy as np
+    truth = exact_neighbours(vectors, queries, k)
+    rows = []
+    for index_type in dict.fromkeys(effective_index_type(len(vectors), {**settings, "index_type": index_type})
+                                    for index_type in index_types):
+        start = time.perf_counter()
+        index = new_index(vectors, {**settings, "index_type": index_type})
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+        found = []
+        start = time.perf_counter()
+        for query in queries:
+            found.append(index.search(query.reshape(1, -1), k)[1][0])
+        latency = (time.perf_counter() - start) / len(queries)
+        rows.append({
+            "index_type": index_type,
+            "recall": round(recall_at_k(np.array(found), truth), 4),
+            "latency_ms": round(latency * 1000, 3),
+            "build_seconds": round(build_seconds, 2),
+            "size_mb": round(faiss.serialize_index(index).nbytes / 1e6, 2),
+        })
+    return rows
+
+
+def format_report(rows, k=10):
+    lines = [f"{'index':<10} {'recall@' + str(k):>10} {'ms/query':>10} {'build s':>9} {'size MB':>9}"]
+    for row in rows:
+        lines.append(f"{row['index_type']:<10} {row['recall']:>10.4f} {row['latency_ms']:>10.3f} "
+                     f"{row['build_seconds']:>9.2f} {row['size_mb']:>9.2f}")
+    return "\n".join(lines)
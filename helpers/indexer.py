@@ -1,13 +1,29 @@
 import os
+import sys
+import time
+import uuid
+import socket
+import threading
+import subprocess
+from typing import Any, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.document_loaders import TextLoader, PyPDFLoader, Docx2txtLoader, UnstructuredMarkdownLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from . import config_handler
+from . import config_handler, splitter, extractor, watcher, sharding, reranker, ollama_pool, snapshot, build_checkpoint, work_queue
+from .answer_cache import SemanticAnswerCache
 
 EMBEDDING_MODEL = config_handler.get_embedding_model()
 PERSISTENT_DIRECTORY = config_handler.get_db_path()
 DATA_FOLDER = config_handler.get_data_folder()
+INDEX_VERSION_FILE = "index_version"
+WATCH_STATE_FILE = "watch_state.json"
+WORK_QUEUE_FILE = "index_queue.sqlite3"
+query_dispatchers = {}
+query_dispatchers_lock = threading.Lock()
 
 
 loader_mapping = {
@@ -18,82 +34,724 @@ loader_mapping = {
     }
 
 
+def get_index_version(persistent_directory=PERSISTENT_DIRECTORY):
+    """
+    Returns the version marker of the index, which changes whenever index_files() changes the corpus.
+    """
+    version_file = os.path.join(persistent_directory, INDEX_VERSION_FILE)
+    if not os.path.exists(version_file):
+        return "0"
+    with open(version_file, "r") as f:
+        return f.read().strip() or "0"
+
+
+def bump_index_version(persistent_directory=PERSISTENT_DIRECTORY):
+    os.makedirs(persistent_directory, exist_ok=True)
+    version = str(time.time_ns())
+    with open(os.path.join(persistent_directory, INDEX_VERSION_FILE), "w") as f:
+        f.write(version)
+    return version
+
+
+class QueryEmbeddingDispatcher(Embeddings):
+    """
+    Batches concurrent embed_query calls into one embed_documents call to Ollama.
+
+    The first query of a batch waits `batch_window` seconds for others to join, then embeds
+    the whole batch (at most `max_batch_size` texts per call) and hands each caller its vector.
+    Identical texts that are already waiting or being embedded share the same result.
+    Document embedding during indexing is passed straight through.
+    """
+
+    def __init__(self, embeddings, batch_window=0.005, max_batch_size=32):
+        self.embeddings = embeddings
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.queries = 0
+        self.coalesced = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._pending = []
+        self._in_flight = {}
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        with self._lock:
+            self.queries += 1
+            future = self._in_flight.get(text)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[text] = future
+                self._pending.append(text)
+                leader = len(self._pending) == 1
+        if leader:
+            time.sleep(self.batch_window)
+            self._dispatch()
+        return future.result()
+
+    def _dispatch(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        for start in range(0, len(batch), self.max_batch_size):
+            texts = batch[start:start + self.max_batch_size]
+            try:
+                vectors, error = self.embeddings.embed_documents(texts), None
+            except Exception as e:
+                vectors, error = None, e
+            with self._lock:
+                self.batches += 1
+                futures = [self._in_flight.pop(text) for text in texts]
+            for i, future in enumerate(futures):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(vectors[i])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+                "queries_per_batch": (self.queries - self.coalesced) / self.batches if self.batches else 0.0,
+            }
+
+
+def setup_embeddings(embedding_model):
+    """
+    Returns the embeddings for a model; query embeddings go through one dispatcher per model shared by the process.
+    """
+    settings = config_handler.get_embedding_dispatch_settings()
+    if settings["batch_window_ms"] <= 0:
+        return OllamaEmbeddings(model=embedding_model, keep_alive=-1, base_url=ollama_pool.get_base_url())
+    with query_dispatchers_lock:
+        if embedding_model not in query_dispatchers:
+            query_dispatchers[embedding_model] = QueryEmbeddingDispatcher(
+                OllamaEmbeddings(model=embedding_model, keep_alive=-1, base_url=ollama_pool.get_base_url()),
+                batch_window=settings["batch_window_ms"] / 1000,
+                max_batch_size=settings["max_batch_size"],
+            )
+        return query_dispatchers[embedding_model]
+
+
+class ShardedVectorStore:
+    """
+    Spreads chunks over one Chroma collection per shard and searches the shards in parallel.
+
+    Chunks are routed by the [Index] shard_by key of their source file and tagged with a
+    "shard" metadata field. It offers the parts of the Chroma interface the indexer uses
+    (add_documents, get, delete, as_retriever).
+    """
+
+    def __init__(self, persistent_directory, embeddings, shard_by, shard_count=4, data_folder=DATA_FOLDER,
+                 collection_metadata=None):
+        import chromadb
+        self.persistent_directory = persistent_directory
+        self.embeddings = embeddings
+        self.shard_by = shard_by
+        self.shard_count = shard_count
+        self.data_folder = data_folder
+        self.collection_metadata = collection_metadata
+        self.client = chromadb.PersistentClient(path=persistent_directory)
+        self.shards = {}
+        self.spaces = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=8)
+        for collection in self.client.list_collections():
+            name = collection if isinstance(collection, str) else collection.name
+            if name.startswith(sharding.SHARD_PREFIX):
+                self.get_shard(name)
+
+    def get_shard(self, name):
+        with self._lock:
+            if name not in self.shards:
+                self.shards[name] = Chroma(collection_name=name, client=self.client, embedding_function=self.embeddings,
+                                           collection_metadata=self.collection_metadata)
+                # the distance a shard was created with, which decides how its distances become relevance
+                metadata = self.client.get_collection(name).metadata or {}
+                self.spaces[name] = metadata.get("hnsw:space", "l2")
+            return self.shards[name]
+
+    def shard_for(self, source):
+        return sharding.collection_name(sharding.shard_key(source, self.data_folder, self.shard_by, self.shard_count))
+
+    def add_documents(self, documents):
+        by_shard = {}
+        for document in documents:
+            name = self.shard_for(document.metadata["source"])
+            document.metadata["shard"] = name
+            by_shard.setdefault(name, []).append(document)
+        ids = []
+        for name, shard_documents in by_shard.items():
+            ids.extend(self.get_shard(name).add_documents(documents=shard_documents))
+        return ids
+
+    def add_embedded(self, texts, vectors, metadatas):
+        """Stores chunks whose vectors were computed elsewhere (by distributed index workers)."""
+        by_shard = {}
+        for text, vector, metadata in zip(texts, vectors, metadatas):
+            name = self.shard_for(metadata["source"])
+            metadata["shard"] = name
+            by_shard.setdefault(name, []).append((text, vector, metadata))
+        ids = []
+        for name, records in by_shard.items():
+            texts, vectors, metadatas = (list(column) for column in zip(*records))
+            self.get_shard(name)
+            ids.extend(upsert_embedded(self.client.get_collection(name), texts, vectors, metadatas))
+        return ids
+
+    def get(self, where=None, include=None):
+        result = {"ids": [], "metadatas": []}
+        for shard in list(self.shards.values()):
+            shard_result = shard.get(where=where, include=include if include is not None else ["metadatas"])
+            result["ids"].extend(shard_result["ids"])
+            result["metadatas"].extend(shard_result.get("metadatas") or [])
+        return result
+
+    def delete(self, ids):
+        for shard in list(self.shards.values()):
+            shard.delete(ids=ids)
+
+    def reset_collection(self):
+        """Drops every shard, like Chroma.reset_collection does for a single collection."""
+        with self._lock:
+            for name in self.shards:
+                self.client.delete_collection(name)
+            self.shards = {}
+            self.spaces = {}
+
+    def search_with_distances(self, query, k=4, shards=None, filter=None):
+        """Returns the k [(chunk, distance)] closest to the query over the given shards (all shards by default)."""
+        names = [name for name in self.shards if not shards or name in shards]
+        if not names:
+            return []
+        # embed once and reuse the vector for every shard
+        embedding = self.embeddings.embed_query(query)
+
+        def search_shard(name):
+            return self.shards[name].similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+
+        results = list(self._pool.map(search_shard, names))
+        return sharding.merge_top_k(results, k)
+
+    def search(self, query, k=4, shards=None, filter=None):
+        return [document for document, distance in self.search_with_distances(query, k, shards, filter)]
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None, shards=None):
+        """Like Chroma's: [(chunk, relevance)] with relevance in [0, 1], higher is closer."""
+        results = self.search_with_distances(query, k, shards, filter)
+        return [(document, sharding.relevance_score(distance, self.spaces.get(document.metadata.get("shard"), "l2")))
+                for document, distance in results]
+
+    def as_retriever(self, search_type="similarity", search_kwargs=None, shards=None):
+        search_kwargs = search_kwargs or {}
+        return ShardedRetriever(store=self, k=search_kwargs.get("k", 4), shards=shards)
+
+
+class ShardedRetriever(BaseRetriever):
+    """
+    Retriever over a ShardedVectorStore. The shards it searches can be narrowed with the
+    `shards` field, or per call with retriever.invoke(query, shards=[...], filter={...}).
+    """
+
+    store: Any
+    k: int = 4
+    shards: Optional[List[str]] = None
+
+    def _get_relevant_documents(self, query, *, run_manager, shards=None, filter=None):
+        return self.store.search(query, k=self.k, shards=shards or self.shards, filter=filter)
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Fetches `fetch_k` candidates from the vector store and keeps only the best few.
+
+    Candidates are reranked by vector relevance and lexical overlap with the query, then cut
+    by the threshold, score gap, k and context budget (see reranker.rerank), so the prompt
+    only carries chunks that are likely to matter. Each kept chunk gets a "rerank_score".
+    """
+
+    store: Any
+    k: int = 5
+    fetch_k: int = 20
+    similarity_threshold: float = 0.0
+    score_gap: float = 0.15
+    context_budget: int = 1500
+    lexical_weight: float = 0.3
+    shards: Optional[List[str]] = None
+
+    def _get_relevant_documents(self, query, *, run_manager, shards=None, filter=None):
+        search_kwargs = {"k": self.fetch_k, "filter": filter}
+        if isinstance(self.store, ShardedVectorStore):
+            search_kwargs["shards"] = shards or self.shards
+        candidates = self.store.similarity_search_with_relevance_scores(query, **search_kwargs)
+        kept = reranker.rerank(query, candidates, k=self.k, similarity_threshold=self.similarity_threshold,
+                               score_gap=self.score_gap, context_budget=self.context_budget,
+                               lexical_weight=self.lexical_weight)
+        for document, score in kept:
+            document.metadata["rerank_score"] = round(score, 4)
+        return [document for document, score in kept]
+
+
+def chroma_collection(vector_store):
+    """The chromadb collection behind a langchain Chroma store, which doesn't expose it publicly."""
+    return vector_store._collection
+
+
+def upsert_embedded(collection, texts, vectors, metadatas):
+    ids = [str(uuid.uuid4()) for _ in texts]
+    collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+    return ids
+
+
+def add_embedded_chunks(vector_store, texts, vectors, metadatas):
+    """Adds chunks with precomputed vectors to the vector store without embedding them again."""
+    if isinstance(vector_store, ShardedVectorStore):
+        return vector_store.add_embedded(texts, vectors, metadatas)
+    return upsert_embedded(chroma_collection(vector_store), texts, vectors, metadatas)
+
+
+def collection_metadata():
+    """Chroma metadata that creates collections with the HNSW parameters under [Index] (see helpers.ann_tuning)."""
+    return {f"hnsw:{key}": value for key, value in config_handler.get_hnsw_settings().items()}
+
+
 def setup_vector_store(persistent_directory, embedding_model):
     """     
     Configure a vectore store to persist local data.
     """
     print(persistent_directory)
     print(embedding_model)
-    embeddings = OllamaEmbeddings(model=embedding_model)
+    embeddings = setup_embeddings(embedding_model)
+    index_settings = config_handler.get_index_settings()
+    if index_settings["shard_by"] != "none":
+        return ShardedVectorStore(persistent_directory, embeddings,
+                                  shard_by=index_settings["shard_by"],
+                                  shard_count=index_settings["shard_count"],
+                                  collection_metadata=collection_metadata())
     # Initialize Chroma vector store
-    vectorstore = Chroma(persist_directory=persistent_directory, embedding_function=embeddings)
+    vectorstore = Chroma(persist_directory=persistent_directory, embedding_function=embeddings,
+                         collection_metadata=collection_metadata())
     return vectorstore
 
 
-def setup_retriever(persistent_directory, embedding_model, search_type="similarity"):
+def setup_retriever(persistent_directory, embedding_model, search_type="similarity", shards=None):
     vector_store = setup_vector_store(persistent_directory, embedding_model)
+    settings = config_handler.get_retrieval_settings()
+    if settings["rerank_enabled"]:
+        return RerankingRetriever(store=vector_store, k=settings["k"], fetch_k=settings["fetch_k"],
+                                  similarity_threshold=settings["similarity_threshold"],
+                                  score_gap=settings["score_gap"], context_budget=settings["context_budget"],
+                                  lexical_weight=settings["lexical_weight"], shards=shards)
+    if shards:
+        return vector_store.as_retriever(search_type=search_type, shards=shards)
     return vector_store.as_retriever(search_type=search_type)
 
 
+def setup_answer_cache(persistent_directory, embedding_model):
+    """
+    Create the semantic answer cache configured under [Cache], or None when it is disabled.
+    """
+    settings = config_handler.get_answer_cache_settings()
+    if not settings["enabled"]:
+        return None
+    return SemanticAnswerCache(
+        setup_embeddings(embedding_model),
+        index_version_fn=lambda: get_index_version(persistent_directory),
+        similarity_threshold=settings["similarity_threshold"],
+        max_entries=settings["max_entries"],
+        ttl=settings["ttl"],
+    )
+
+
+def list_files(directory_path):
+    """Returns the paths of all files under the directory that have a loader."""
+    file_paths = []
+    for root, dirs, files in os.walk(directory_path):
+        for file in files:
+            if os.path.splitext(file)[1].lower() in loader_mapping:
+                file_paths.append(os.path.join(root, file))
+    return file_paths
+
+
+def extract_binary_files(file_paths):
+    """
+    Extracts PDF and DOCX files in parallel through the extracted-text cache.
+    """
+    settings = config_handler.get_extraction_settings()
+    binary_paths = [path for path in file_paths if os.path.splitext(path)[1].lower() in extractor.PARALLEL_EXTENSIONS]
+    if not binary_paths:
+        return {}
+    return extractor.extract_files(binary_paths,
+                                   cache_dir=settings["cache_dir"],
+                                   workers=settings["workers"],
+                                   pages_per_task=settings["pages_per_task"])
+
+
+def load_file(file_path, split_method=None, extracted=None):
+    """
+    Loads a file into documents, using its extracted text when available.
+    """
+    if extracted and file_path in extracted:
+        return [Document(page_content=record["page_content"], metadata=record["metadata"])
+                for record in extracted[file_path]]
+    file_ext = os.path.splitext(file_path)[1].lower()
+    loader_class = loader_mapping[file_ext]
+    if file_ext == ".md" and split_method == "markdown":
+        # keep the raw markdown so headings can drive the split
+        loader_class = TextLoader
+    loader = loader_class(file_path)
+    return loader.load()
+
+
 def load_multiple_file_types(directory_path):
     """Load multiple file types using loader mapping"""    
     all_documents = []
-    
-    # Walk through directory and load files based on extension
-    for root, dirs, files in os.walk(directory_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_ext = os.path.splitext(file)[1].lower()
-            
-            if file_ext in loader_mapping:
-                try:
-                    print(f"Working on {file_path}")
-                    loader_class = loader_mapping[file_ext]
-                    loader = loader_class(file_path)
-                    documents = loader.load()
-                    all_documents.extend(documents)
-                    print(f"Loaded {len(documents)} documents from {file}")
-                except Exception as e:
-                    print(f"Error loading {file}: {str(e)}")
+    file_paths = list_files(directory_path)
+    extracted = extract_binary_files(file_paths)
+    for file_path in file_paths:
+        file = os.path.basename(file_path)
+        try:
+            print(f"Working on {file_path}")
+            documents = load_file(file_path, extracted=extracted)
+            all_documents.extend(documents)
+            print(f"Loaded {len(documents)} documents from {file}")
+        except Exception as e:
+            print(f"Error loading {file}: {str(e)}")
     
     return all_documents
 
 
+def index_file(vector_store, file_path, split_settings, extracted=None, batch_size=None, start_batch=0,
+               on_batch=None):
+    """
+    Loads, splits and stores one file, replacing any chunks it already has in the vector store.
+
+    With a batch_size the chunks are stored batch by batch and on_batch(batches, chunks) is called
+    after each one. A start_batch above 0 resumes an interrupted run: the chunks of the first
+    batches are already stored, so they are skipped instead of replacing the file's chunks.
+    """
+    file = os.path.basename(file_path)
+    #load 
+    documents = load_file(file_path, split_settings["split_method"], extracted)
+    print(f"Loaded {len(documents)} documents from {file}")
+    #split
+    chunks = splitter.split_documents(documents,
+                                      chunk_size=split_settings["chunk_size"],
+                                      chunk_overlap=split_settings["chunk_overlap"],
+                                      method=split_settings["split_method"])
+    print(f"Split documents into {len(chunks)} chunks.")
+    batch_size = batch_size or max(len(chunks), 1)
+    #store; under the index lock, so snapshots see either the old or the new chunks of the file
+    document_ids = []
+    with snapshot.index_lock(PERSISTENT_DIRECTORY):
+        if start_batch == 0:
+            remove_file(vector_store, file_path)
+        for start in range(start_batch * batch_size, len(chunks), batch_size):
+            document_ids.extend(vector_store.add_documents(documents=chunks[start:start + batch_size]))
+            if on_batch is not None:
+                on_batch(start // batch_size + 1, len(document_ids))
+    print(f"Stored {len(document_ids)} document IDs in the vector store.")
+    print(document_ids[:3])
+    return document_ids
+
+
+def remove_file(vector_store, file_path):
+    """
+    Deletes all chunks of a file from the vector store and returns how many were removed.
+    """
+    with snapshot.index_lock(PERSISTENT_DIRECTORY):
+        ids = vector_store.get(where={"source": file_path}, include=[])["ids"]
+        if ids:
+            vector_store.delete(ids=ids)
+    if ids:
+        print(f"Removed {len(ids)} chunks of {file_path} from the vector store.")
+    return len(ids)
+
+
+def indexed_sources(vector_store):
+    """Returns the source paths that have chunks in the vector store."""
+    metadatas = vector_store.get(include=["metadatas"])["metadatas"]
+    return {metadata["source"] for metadata in metadatas if metadata and metadata.get("source")}
+
+
 def index_files():
     """     
     Indexes files from the data folder and returns the indexed chunks.
     """
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000,
-                                                   chunk_overlap=80,
-                                                   length_function=len,
-                                                   is_separator_regex=False)
+    split_settings = config_handler.get_docs_split_settings()
     # moved the embedding logic to setup_vector_store function
     vector_store = setup_vector_store(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+    stored_chunks = 0
+    file_paths = list_files(DATA_FOLDER)
+    # PDF and DOCX pages are extracted up front across a process pool
+    extracted = extract_binary_files(file_paths)
     
-    # Walk through directory and load files based on extension
-    for root, dirs, files in os.walk(DATA_FOLDER):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_ext = os.path.splitext(file)[1].lower()
-            
-            if file_ext in loader_mapping:
-                try:
-                    print(f"Working on {file_path}")
-                    #load 
-                    loader_class = loader_mapping[file_ext]
-                    loader = loader_class(file_path)
-                    documents = loader.load()
-                    print(f"Loaded {len(documents)} documents from {file}")
-                    #split
-                    chunks = splitter.split_documents(documents)
-                    print(f"Split documents into {len(chunks)} chunks.")
-                    #store
-                    document_ids = vector_store.add_documents(documents=chunks)
-                    print(f"Stored {len(document_ids)} document IDs in the vector store.")
-                    print(document_ids[:3])
-                except Exception as e:
-                    print(f"Error loading {file}: {str(e)}")
+    for file_path in file_paths:
+        file = os.path.basename(file_path)
+        try:
+            print(f"Working on {file_path}")
+            stored_chunks += len(index_file(vector_store, file_path, split_settings, extracted))
+        except Exception as e:
+            print(f"Error loading {file}: {str(e)}")
+    if stored_chunks:
+        # invalidates answers cached against the previous corpus
+        bump_index_version(PERSISTENT_DIRECTORY)
     return vector_store
 
+
+def build_fingerprint(split_settings, index_settings, embedding_model=EMBEDDING_MODEL):
+    """The settings a build checkpoint is valid for: changing any of them changes the chunks or vectors."""
+    return {
+        "embedding_model": embedding_model,
+        "split": split_settings,
+        "shard_by": index_settings["shard_by"],
+        "shard_count": index_settings["shard_count"],
+    }
+
+
+def setup_build_checkpoint():
+    """Returns the (not yet loaded) build checkpoint of the index for the current settings."""
+    return build_checkpoint.BuildCheckpoint(
+        os.path.join(PERSISTENT_DIRECTORY, build_checkpoint.CHECKPOINT_FILE),
+        build_fingerprint(config_handler.get_docs_split_settings(), config_handler.get_index_settings()),
+    )
+
+
+def build_status():
+    """Tells whether a previous build can be resumed with the current settings, and how far it got."""
+    checkpoint = setup_build_checkpoint()
+    return {"resumable": checkpoint.load(), **checkpoint.summary()}
+
+
+def build_index(rebuild=False, report=print):
+    """
+    Indexes the data folder like index_files(), checkpointing after every batch of chunks.
+
+    An interrupted build resumes where it stopped: files stored by an earlier run and unchanged
+    since are skipped, and a half-stored file continues at its next batch. With rebuild, the
+    vector store and the checkpoint are cleared first. report() gets a progress line per file.
+    """
+    split_settings = config_handler.get_docs_split_settings()
+    batch_size = config_handler.get_index_settings()["build_batch_size"]
+    vector_store = setup_vector_store(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+    checkpoint = setup_build_checkpoint()
+    checkpoint.load()
+    if rebuild:
+        with snapshot.index_lock(PERSISTENT_DIRECTORY):
+            vector_store.reset_collection()
+        checkpoint.reset()
+    file_paths = list_files(DATA_FOLDER)
+    states = {file_path: build_checkpoint.file_state(file_path) for file_path in file_paths}
+    pending = [file_path for file_path in file_paths if not checkpoint.is_done(file_path, states[file_path])]
+    for source in [source for source in checkpoint.sources() if source not in states]:
+        # removed from the data folder since the checkpoint was written
+        remove_file(vector_store, source)
+        checkpoint.forget(source)
+    progress = build_checkpoint.BuildProgress(len(file_paths), done_files=len(file_paths) - len(pending))
+    if len(pending) < len(file_paths):
+        report(f"Resuming build: {len(file_paths) - len(pending)} of {len(file_paths)} files already indexed")
+    # PDF and DOCX pages are extracted up front across a process pool
+    extracted = extract_binary_files(pending)
+    failed = 0
+
+    for file_path in pending:
+        state = states[file_path]
+        start_batch = checkpoint.batches_done(file_path, state)
+        resumed_chunks = checkpoint.partial[file_path]["chunks"] if start_batch else 0
+        stored = [0]
+
+        def on_batch(batches, chunks):
+            progress.update(chunks=chunks - stored[0])
+            stored[0] = chunks
+            checkpoint.record_batch(file_path, state, batches, resumed_chunks + chunks)
+
+        print(f"Working on {file_path}")
+        try:
+            index_file(vector_store, file_path, split_settings, extracted, batch_size, start_batch, on_batch)
+            checkpoint.record_file(file_path, state, resumed_chunks + stored[0])
+        except Exception as e:
+            failed += 1
+            print(f"Error loading {os.path.basename(file_path)}: {str(e)}")
+        progress.update(files=1)
+        report(progress.line())
+    if progress.chunks or rebuild:
+        # invalidates answers cached against the previous corpus
+        bump_index_version(PERSISTENT_DIRECTORY)
+    if not failed:
+        checkpoint.complete()
+    return vector_store
+
+
+def setup_work_queue():
+    settings = config_handler.get_work_queue_settings()
+    os.makedirs(PERSISTENT_DIRECTORY, exist_ok=True)
+    return work_queue.WorkQueue(settings["queue_path"] or os.path.join(PERSISTENT_DIRECTORY, WORK_QUEUE_FILE),
+                                lease_seconds=settings["lease_seconds"], max_attempts=settings["max_attempts"])
+
+
+def embed_file(file_path, embeddings, split_settings):
+    """
+    Worker step of distributed indexing: loads, splits and embeds one file and returns its
+    chunks with their vectors, for the coordinator to merge into the vector store.
+    """
+    documents = load_file(file_path, split_settings["split_method"], extract_binary_files([file_path]))
+    chunks = splitter.split_documents(documents,
+                                      chunk_size=split_settings["chunk_size"],
+                                      chunk_overlap=split_settings["chunk_overlap"],
+                                      method=split_settings["split_method"])
+    texts = [chunk.page_content for chunk in chunks]
+    print(f"Embedding {len(texts)} chunks of {file_path}")
+    return {
+        "texts": texts,
+        "metadatas": [chunk.metadata for chunk in chunks],
+        "vectors": embeddings.embed_documents(texts) if texts else [],
+    }
+
+
+def merge_results(vector_store, queue, limit=16):
+    """
+    Merge step of distributed indexing: writes the embedded files of the queue into the vector
+    store, replacing their old chunks, and drops the chunks of deleted files. Only the
+    coordinator runs it, so the vector store has a single writer. Returns the number of files
+    indexed, chunks stored and files deleted.
+    """
+    files = chunks = deleted = 0
+    for path, op, result in queue.results(limit):
+        with snapshot.index_lock(PERSISTENT_DIRECTORY):
+            remove_file(vector_store, path)
+            if op == "index" and result["texts"]:
+                add_embedded_chunks(vector_store, result["texts"], result["vectors"], result["metadatas"])
+        # a crash before this line merges the file again, which replaces the same chunks
+        queue.mark_merged(path)
+        if op == "index":
+            files += 1
+            chunks += len(result["texts"])
+        else:
+            deleted += 1
+    return files, chunks, deleted
+
+
+def run_index_worker(worker=None, ollama_url=None, poll_interval=1.0):
+    """
+    Claims files from the work queue and embeds them until the queue is drained. Workers can run
+    as several processes and on several hosts sharing the queue file; ollama_url points a worker
+    at its own Ollama host (the Ollama pool by default).
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    queue = setup_work_queue()
+    split_settings = config_handler.get_docs_split_settings()
+    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL, keep_alive=-1,
+                                  base_url=ollama_url or ollama_pool.get_base_url("indexing"))
+    start = time.perf_counter()
+    completed = work_queue.run_worker(queue, worker, lambda path: embed_file(path, embeddings, split_settings),
+                                      poll_interval=poll_interval)
+    print(f"Worker {worker} embedded {completed} files in {time.perf_counter() - start:.1f}s")
+    queue.close()
+    return completed
+
+
+def coordinate_index(workers=0, poll_interval=1.0, report=print):
+    """
+    Distributed indexing: queues the new and changed files of the data folder (and deletions of
+    removed ones), optionally starts `workers` local worker processes, and merges the embedded
+    files into the vector store as they arrive until the queue is drained.
+    """
+    queue = setup_work_queue()
+    vector_store = setup_vector_store(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+    files = {file_path: build_checkpoint.file_state(file_path) for file_path in list_files(DATA_FOLDER)}
+    queued = queue.enqueue(files)
+    report(f"Queued {queued} of {len(files)} files in {queue.path}")
+    processes = [subprocess.Popen([sys.executable, "-m", "helpers.indexer", "--worker"]) for _ in range(workers)]
+    progress = build_checkpoint.BuildProgress(queued)
+    deleted = 0
+    try:
+        while True:
+            merged_files, merged_chunks, merged_deletions = merge_results(vector_store, queue)
+            deleted += merged_deletions
+            if merged_files or merged_deletions:
+                progress.update(files=merged_files, chunks=merged_chunks)
+                report(progress.line())
+            elif not queue.has_open_tasks() and not queue.counts()["embedded"]:
+                break
+            else:
+                time.sleep(poll_interval)
+    finally:
+        for process in processes:
+            process.wait()
+    for path, error in queue.failures().items():
+        report(f"Failed to index {path}: {error}")
+    if progress.files or deleted:
+        # invalidates answers cached against the previous corpus
+        bump_index_version(PERSISTENT_DIRECTORY)
+    queue.close()
+    return vector_store
+
+
+def watch_files():
+    """
+    Keeps the vector store in sync with the data folder: changed files are re-indexed and
+    the chunks of removed or renamed files are deleted, seconds after the change.
+    """
+    settings = config_handler.get_watcher_settings()
+    split_settings = config_handler.get_docs_split_settings()
+    vector_store = setup_vector_store(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
+
+    def update_file(file_path):
+        print(f"Working on {file_path}")
+        index_file(vector_store, file_path, split_settings, extract_binary_files([file_path]))
+
+    index_watcher = watcher.IndexWatcher(
+        DATA_FOLDER,
+        loader_mapping.keys(),
+        index_fn=update_file,
+        remove_fn=lambda file_path: remove_file(vector_store, file_path),
+        state_file=os.path.join(PERSISTENT_DIRECTORY, WATCH_STATE_FILE),
+        interval=settings["interval"],
+        debounce=settings["debounce"],
+        on_change=lambda: bump_index_version(PERSISTENT_DIRECTORY),
+    )
+    if not index_watcher.known:
+        # first run: treat what is already indexed as up to date, so only new files
+        # are indexed and the chunks of files that no longer exist are removed
+        current = watcher.snapshot(DATA_FOLDER, index_watcher.extensions)
+        index_watcher.known = {source: current.get(source, [0, 0]) for source in indexed_sources(vector_store)}
+
+    observer = watcher.start_event_trigger(index_watcher) if settings["mode"] == "events" else None
+    print(f"Watching {DATA_FOLDER} ({settings['mode']}, every {settings['interval']}s)")
+    try:
+        index_watcher.run()
+    except KeyboardInterrupt:
+        index_watcher.stop()
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        print(f"Indexing metrics: {index_watcher.metrics}")
+
+
 if __name__ == "__main__":
-    index_files()  # Call the function to index files and store them in the vector store
+    import argparse
+    parser = argparse.ArgumentParser(description="Index the documents of the data folder into the vector store.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and apply file changes incrementally")
+    parser.add_argument("--coordinate", action="store_true",
+                        help="Queue the data folder for index workers and merge their results into the vector store")
+    parser.add_argument("--workers", type=int, default=0, help="Local worker processes to start with --coordinate")
+    parser.add_argument("--worker", action="store_true", help="Embed queued files until the queue is drained")
+    parser.add_argument("--ollama-url", help="Ollama host of this worker (default: the configured Ollama pool)")
+    args = parser.parse_args()
+    # indexing embeddings use the Ollama capacity chat requests leave over
+    ollama_pool.set_default_priority("indexing")
+    if args.watch:
+        watch_files()
+    elif args.coordinate:
+        coordinate_index(workers=args.workers)
+    elif args.worker:
+        run_index_worker(ollama_url=args.ollama_url)
+    else:
+        index_files()  # Call the function to index files and store them in the vector store
@@ -1,17 +1,120 @@
+import asyncio
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_retrieval_chain, create_history_aware_retriever
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
+from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chat_models import init_chat_model
 from langgraph.prebuilt import create_react_agent
+from . import config_handler, compactor, ollama_pool, condense
+from .prompt_prefix import PrefixReuseTracker
+
+# one tracker per model, as Ollama keeps the evaluated prompt per loaded model
+prefix_trackers = {}
+condense_stats = condense.CondenseStats()
+speculation_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-retrieval")
 
 
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
 
+def with_context_compaction(retriever):
+    """Merges overlapping chunks and drops near duplicates from the retriever output, if enabled in [Retrieval]."""
+    settings = config_handler.get_retrieval_settings()
+    if not settings["compact_enabled"]:
+        return retriever
+    return retriever | RunnableLambda(
+        lambda docs: compactor.compact_documents(docs, max_distance=settings["near_duplicate_distance"]))
+
+
+def get_prefix_tracker(model):
+    if model not in prefix_trackers:
+        prefix_trackers[model] = PrefixReuseTracker()
+    return prefix_trackers[model]
+
+
+def with_prefix_tracking(llm, model):
+    """Records the prompts sent to the model to measure how much of each prompt Ollama can reuse."""
+    return RunnableLambda(get_prefix_tracker(model).observe) | llm
+
+
+def setup_condense_step(llm, retriever, contextualize_q_prompt, retrieve=True):
+    """
+    Build the step that turns {"input", "history"} into a standalone question and its context.
+
+    The [Chain] condense_strategy decides when the history-aware rewrite runs: "always" runs it
+    whenever there is history, "skip" also skips it for questions that look self-contained, and
+    "speculative" additionally retrieves on the raw question while the rewrite is generated and
+    keeps those results if the rewrite barely changed the question. The output adds
+    "standalone_question" and "context" to the inputs; with retrieve=False, "context" is only
+    added when speculative results were kept.
+    """
+    settings = config_handler.get_condense_settings()
+    strategy = settings["strategy"]
+    rewrite_chain = contextualize_q_prompt | llm | StrOutputParser()
+
+    def output(inputs, question, context=None):
+        result = {**inputs, "standalone_question": question}
+        if context is not None:
+            result["context"] = context
+        return result
+
+    def kept_speculation(question, rewritten):
+        return condense.query_change(question, rewritten) <= settings["max_change"]
+
+    def condense_question(inputs, config):
+        question = inputs["input"]
+        action = condense.plan(question, inputs.get("history"), strategy)
+        if action in ("no_history", "self_contained"):
+            condense_stats.record(action)
+            return output(inputs, question, retriever.invoke(question, config) if retrieve else None)
+        speculative = speculation_pool.submit(retriever.invoke, question, config) if action == "speculate" else None
+        try:
+            rewritten = rewrite_chain.invoke(inputs, config).strip() or question
+        except BaseException:
+            # don't leave a stale retrieval queued on the shared speculation pool
+            if speculative is not None:
+                speculative.cancel()
+            raise
+        if speculative is not None and kept_speculation(question, rewritten):
+            condense_stats.record("speculative_kept")
+            return output(inputs, question, speculative.result())
+        if speculative is not None:
+            speculative.cancel()
+        condense_stats.record("rewritten")
+        return output(inputs, rewritten, retriever.invoke(rewritten, config) if retrieve else None)
+
+    async def acondense_question(inputs, config):
+        question = inputs["input"]
+        action = condense.plan(question, inputs.get("history"), strategy)
+        if action in ("no_history", "self_contained"):
+            condense_stats.record(action)
+            return output(inputs, question, await retriever.ainvoke(question, config) if retrieve else None)
+        speculative = asyncio.ensure_future(retriever.ainvoke(question, config)) if action == "speculate" else None
+        try:
+            rewritten = (await rewrite_chain.ainvoke(inputs, config)).strip() or question
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+            raise
+        if speculative is not None and kept_speculation(question, rewritten):
+            condense_stats.record("speculative_kept")
+            return output(inputs, question, await speculative)
+        if speculative is not None:
+            speculative.cancel()
+        condense_stats.record("rewritten")
+        return output(inputs, rewritten, await retriever.ainvoke(rewritten, config) if retrieve else None)
+
+    return RunnableLambda(condense_question, afunc=acondense_question)
+
+
 def setup_agent(model_provider, model):
-    model = init_chat_model(str(model_provider) + str(":") + str(model))
+    model_kwargs = {"base_url": ollama_pool.get_base_url()} if str(model_provider) == "ollama" else {}
+    model = init_chat_model(str(model_provider) + str(":") + str(model), **model_kwargs)
     system_message = """ You are a helpful assistant. Anaser the user's question as best as you can. Use the tools available to you."""
 
     prompt = ChatPromptTemplate.from_messages(
@@ -31,6 +134,7 @@ def setup_agent(model_provider, model):
 def setup_chain(model, retriever, context_size=8192):
     llm = ChatOllama(
         model=model,
+        base_url=ollama_pool.get_base_url(),
         temperature=0.8,
         num_predict=256,
         keep_alive=-1,
@@ -39,7 +143,16 @@ def setup_chain(model, retriever, context_size=8192):
         return_source_documents=True,
     )
 
-    template = """ 
+    if config_handler.get_prompt_layout() == "prefix_stable":
+        # instructions and history first, so consecutive turns share the prompt prefix
+        template = """ 
+        You are a helpful assistant. Answer the following questions accurately, considering the history of the conversation, and the context provided.
+        Chat history: {history}
+        Context: {context}
+        User question: {input}
+        """
+    else:
+        template = """ 
         You are a helpful assistant. Answer the following questions accurately, considering the history of the conversation, and the context provided.
         Context: {context}
         Chat history: {history}
@@ -47,13 +160,15 @@ def setup_chain(model, retriever, context_size=8192):
         """
 
     prompt = ChatPromptTemplate.from_template(template)
-    question_answer_chain = create_stuff_documents_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(retriever, question_answer_chain)
+    question_answer_chain = create_stuff_documents_chain(with_prefix_tracking(llm, model), prompt)
+    rag_chain = create_retrieval_chain(with_context_compaction(retriever), question_answer_chain)
     return rag_chain
 
 
-def setup_chain_chatbot(model, retriever):
-    llm = ChatOllama(model=model, temperature=0.8, num_predict=256, keep_alive=-1)
+def setup_chain_chatbot(model, retriever, answer_cache=None):
+    llm = ChatOllama(model=model, temperature=0.8, num_predict=256, keep_alive=-1,
+                     base_url=ollama_pool.get_base_url())
+    retriever = with_context_compaction(retriever)
 
     contextualize_q_system_prompt = (
         "Given a chat history and the latest user question "
@@ -69,26 +184,80 @@ def setup_chain_chatbot(model, retriever):
             ("human", "{input}"),
         ]
     )
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
-    )
     ### Answer question ###
-    system_prompt = (
-        "You are an assistant named Benedict. Your task is question-answering."
-        "Use the following pieces of retrieved context to answer "
-        "the question. If you don't know the answer, make your best guess."
-        "Keep the answer concise and short."
-        "\n\n"
-        "{context}"
-    )
+    if config_handler.get_prompt_layout() == "prefix_stable":
+        # The system prompt and history form an append-only prefix that Ollama can reuse
+        # across turns; the retrieved context changes every turn, so it goes with the question.
+        system_prompt = (
+            "You are an assistant named Benedict. Your task is question-answering."
+            "Use the retrieved context given with the question to answer "
+            "the question. If you don't know the answer, make your best guess."
+            "Keep the answer concise and short."
+        )
+        question_prompt = "Context:\n{context}\n\nQuestion: {input}"
+    else:
+        system_prompt = (
+            "You are an assistant named Benedict. Your task is question-answering."
+            "Use the following pieces of retrieved context to answer "
+            "the question. If you don't know the answer, make your best guess."
+            "Keep the answer concise and short."
+            "\n\n"
+            "{context}"
+        )
+        question_prompt = "{input}"
     qa_prompt = ChatPromptTemplate.from_messages(
         [
             ("system", system_prompt),
             MessagesPlaceholder("history"),
-            ("human", "{input}"),
+            ("human", question_prompt),
         ]
     )
-    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
+    question_answer_chain = create_stuff_documents_chain(with_prefix_tracking(llm, model), qa_prompt)
+    if answer_cache is not None:
+        return setup_cached_chain(model, llm, retriever, contextualize_q_prompt,
+                                  question_answer_chain, answer_cache)
+    # same output keys as create_retrieval_chain, plus "standalone_question"
+    condense_step = setup_condense_step(llm, retriever, contextualize_q_prompt)
+    rag_chain = condense_step | RunnablePassthrough.assign(answer=question_answer_chain)
 
     return rag_chain
+
+
+def setup_cached_chain(model, llm, retriever, contextualize_q_prompt, question_answer_chain, answer_cache):
+    """
+    Build a RAG chain that answers repeated standalone questions from the semantic answer cache.
+
+    The output has the same "context" and "answer" keys as create_retrieval_chain, plus
+    "standalone_question" and "cache_hit".
+    """
+    # retrieval waits until the cache missed, unless speculative retrieval already ran
+    condense_step = setup_condense_step(llm, retriever, contextualize_q_prompt, retrieve=False)
+
+    def lookup_answer(inputs):
+        return answer_cache.lookup(inputs["standalone_question"], model)
+
+    def store_answer(outputs):
+        if outputs.get("answer"):
+            answer_cache.store(outputs["standalone_question"], model, outputs["answer"], outputs.get("context"))
+
+    answer_from_cache = RunnablePassthrough.assign(
+        context=lambda x: x["cache_hit"]["sources"],
+        answer=lambda x: x["cache_hit"]["answer"],
+    )
+    retrieve_context = RunnableBranch(
+        (lambda x: "context" in x, RunnablePassthrough()),
+        RunnablePassthrough.assign(context=itemgetter("standalone_question") | retriever),
+    )
+    # a passthrough with a function streams its input on and calls the function with the whole
+    # output only once the stream has run out, so an answer closed part-way is never cached
+    generate_answer = (
+        retrieve_context
+        | RunnablePassthrough.assign(answer=question_answer_chain)
+        | RunnablePassthrough(store_answer)
+    )
+
+    return (
+        condense_step
+        | RunnablePassthrough.assign(cache_hit=lookup_answer)
+        | RunnableBranch((lambda x: x["cache_hit"] is not None, answer_from_cache), generate_answer)
+    )
@@ -0,0 +1,359 @@
+import json
+import threading
+import http.client
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from . import config_handler
+from .scheduler import PriorityScheduler, split_class
+
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "te", "trailer", "transfer-encoding",
+                      "upgrade", "host", "content-length"}
+# statuses that mean the backend could not serve the request, so another backend may
+FAILOVER_STATUSES = {502, 503, 504}
+# requests that occupy a model slot, and so go through the scheduler
+SCHEDULED_PATHS = {"/api/generate", "/api/chat", "/api/embed", "/api/embeddings"}
+
+
+def model_names(name):
+    """Ollama lists "llama3.2" as "llama3.2:latest"; both refer to the same model."""
+    return {name, name[:-len(":latest")]} if name.endswith(":latest") else {name, name + ":latest"}
+
+
+class Backend:
+    def __init__(self, url, max_concurrency=2):
+        self.url = url.rstrip("/")
+        parts = urlsplit(self.url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.healthy = True
+        # models pulled on the backend, None until the first health check
+        self.models = None
+        self.requests = 0
+        self.failures = 0
+
+    def connection(self, timeout):
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=timeout)
+
+    def has_model(self, model):
+        return self.models is None or bool(model_names(model) & self.models)
+
+    def stats(self):
+        return {"url": self.url, "healthy": self.healthy, "outstanding": self.outstanding,
+                "max_concurrency": self.max_concurrency, "requests": self.requests, "failures": self.failures,
+                "models": sorted(self.models) if self.models is not None else None}
+
+
+class BackendPool:
+    """
+    Routes Ollama requests over several backends.
+
+    A request goes to the backend with the fewest outstanding requests relative to its
+    concurrency cap among the healthy backends that can serve its model: the backends pinned
+    to the model in `placement`, else the ones that have the model pulled. When every
+    candidate is at its cap the request waits for a free slot. Backends that fail are marked
+    unhealthy until a health check (GET /api/tags) succeeds again.
+    """
+
+    def __init__(self, urls, max_concurrency=2, placement=None, health_interval=10.0, queue_timeout=300.0,
+                 request_timeout=600.0, scheduler=None):
+        self.backends = [Backend(url, max_concurrency) for url in dict.fromkeys(url.rstrip("/") for url in urls)]
+        self.placement = {}
+        for model, model_urls in (placement or {}).items():
+            pinned = [url.rstrip("/") for url in model_urls]
+            for name in model_names(model):
+                self.placement[name] = pinned
+        self.health_interval = health_interval
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        # orders requests by priority class before they compete for a backend slot
+        self.scheduler = scheduler
+
+    def candidates(self, model, exclude=()):
+        backends = [backend for backend in self.backends if backend not in exclude]
+        if model and model in self.placement:
+            backends = [backend for backend in backends if backend.url in self.placement[model]]
+        elif model:
+            # fall back to every backend if none reports the model, so Ollama returns the error
+            backends = [backend for backend in backends if backend.has_model(model)] or backends
+        # when every candidate is marked down, try them anyway: one may have recovered
+        return [backend for backend in backends if backend.healthy] or backends
+
+    def acquire(self, model=None, exclude=(), timeout=None):
+        """Reserves a slot on the best backend for the model; returns None if there is none or the wait times out."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self.condition:
+            candidates = self.candidates(model, exclude)
+            if not candidates:
+                return None
+
+            def free():
+                return [backend for backend in self.candidates(model, exclude)
+                        if backend.outstanding < backend.max_concurrency]
+
+            if not self.condition.wait_for(free, timeout):
+                return None
+            backend = min(free(), key=lambda b: (b.outstanding / b.max_concurrency, b.outstanding, b.requests))
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend, failed=False):
+        with self.condition:
+            backend.outstanding -= 1
+            if failed:
+                backend.failures += 1
+                backend.healthy = False
+            self.condition.notify_all()
+
+    def check_health(self, backend):
+        connection = backend.connection(timeout=min(5.0, self.health_interval or 5.0))
+        try:
+            connection.request("GET", "/api/tags")
+            response = connection.getresponse()
+            body = response.read()
+            healthy = response.status == 200
+            models = {model["name"] for model in json.loads(body).get("models", [])} if healthy else None
+        except (OSError, ValueError, http.client.HTTPException):
+            healthy, models = False, None
+        finally:
+            connection.close()
+        with self.condition:
+            if healthy and not backend.healthy:
+                print(f"Ollama backend {backend.url} is back up")
+            elif not healthy and backend.healthy:
+                print(f"Ollama backend {backend.url} is down")
+            backend.healthy = healthy
+            if models is not None:
+                backend.models = {name for model in models for name in model_names(model)}
+            self.condition.notify_all()
+
+    def check_all(self):
+        for backend in self.backends:
+            self.check_health(backend)
+
+    def run_health_checks(self):
+        while not self.stopped.is_set():
+            self.check_all()
+            self.stopped.wait(self.health_interval)
+
+    def start(self):
+        """Starts the background health checks."""
+        thread = threading.Thread(target=self.run_health_checks, name="ollama-health", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopped.set()
+
+    def stats(self):
+        with self.condition:
+            stats = {"backends": [backend.stats() for backend in self.backends]}
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats()
+        return stats
+
+
+class PoolRequestHandler(BaseHTTPRequestHandler):
+    """Forwards Ollama API requests to a backend of the server's pool, streaming the response back."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.route()[1] == "/pool/stats":
+            return self.send_json(200, self.server.pool.stats())
+        self.forward()
+
+    def do_POST(self):
+        self.forward()
+
+    def do_DELETE(self):
+        self.forward()
+
+    def do_HEAD(self):
+        self.forward()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self):
+        """Returns (priority class, path) of the request; the class comes from a /p/<class> base URL prefix."""
+        scheduler = self.server.pool.scheduler
+        if scheduler is None:
+            return split_class(self.path, (), None)
+        return split_class(self.path, scheduler.weights, scheduler.default_class)
+
+    def forward(self):
+        pool = self.server.pool
+        priority_class, path = self.route()
+        ticket = None
+        if pool.scheduler is not None and self.command == "POST" and path in SCHEDULED_PATHS:
+            ticket = pool.scheduler.acquire(priority_class, pool.queue_timeout)
+            if ticket is None:
+                return self.send_json(503, {"error": f"timed out waiting for an Ollama slot ({priority_class})"})
+        try:
+            self.forward_to_backend(path)
+        finally:
+            if ticket is not None:
+                pool.scheduler.release(ticket)
+
+    def forward_to_backend(self, path):
+        pool = self.server.pool
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        model = None
+        if body:
+            try:
+                model = json.loads(body).get("model")
+            except (ValueError, AttributeError):
+                pass
+        headers = {key: value for key, value in self.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+        tried = []
+        while True:
+            backend = pool.acquire(model, exclude=tried)
+            if backend is None:
+                return self.send_json(503, {"error": f"no Ollama backend available for {model or 'the request'}"})
+            connection = backend.connection(pool.request_timeout)
+            try:
+                connection.request(self.command, path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                # nothing has been sent to the client yet, so fail over to the next backend
+                print(f"Ollama backend {backend.url} failed: {str(e)}")
+                connection.close()
+                pool.release(backend, failed=True)
+                tried.append(backend)
+                continue
+            if response.status in FAILOVER_STATUSES and pool.candidates(model, tried + [backend]) != []:
+                connection.close()
+                pool.release(backend, failed=True)
+                tried.append(backend)
+                continue
+            try:
+                self.relay(response)
+            except (BrokenPipeError, ConnectionResetError):
+                # the client went away; closing the upstream connection stops the generation
+                pass
+            finally:
+                connection.close()
+                pool.release(backend)
+            return
+
+    def relay(self, response):
+        self.send_response(response.status)
+        for key, value in response.getheaders():
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(key, value)
+        content_length = response.getheader("Content-Length")
+        if content_length is not None or self.command == "HEAD":
+            if content_length is not None:
+                self.send_header("Content-Length", content_length)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(response.read())
+            return
+        # streamed responses (generation tokens) are passed on chunk by chunk as they arrive
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        while True:
+            chunk = response.read1(65536)
+            if not chunk:
+                break
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(pool, host="127.0.0.1", port=0):
+    """Starts the pool proxy in a background thread and returns the server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), PoolRequestHandler)
+    server.daemon_threads = True
+    server.pool = pool
+    threading.Thread(target=server.serve_forever, name="ollama-pool", daemon=True).start()
+    return server
+
+
+def setup_scheduler(settings, scheduler_settings):
+    """The scheduler for a pool: all backend slots are shared out by priority class."""
+    pinned = [url for urls in settings["placement"].values() for url in urls]
+    capacity = len(set(url.rstrip("/") for url in settings["backends"] + pinned)) * settings["max_concurrency"]
+    return PriorityScheduler(capacity, scheduler_settings["weights"], limits=scheduler_settings["limits"],
+                             default_class=scheduler_settings["default_class"])
+
+
+def setup_pool(settings=None, scheduler_settings=None):
+    settings = settings or config_handler.get_ollama_pool_settings()
+    scheduler_settings = scheduler_settings or config_handler.get_scheduler_settings()
+    pinned = [url for urls in settings["placement"].values() for url in urls]
+    scheduler = setup_scheduler(settings, scheduler_settings) if scheduler_settings["mode"] != "off" else None
+    return BackendPool(settings["backends"] + pinned, max_concurrency=settings["max_concurrency"],
+                       placement=settings["placement"], health_interval=settings["health_interval"],
+                       queue_timeout=settings["queue_timeout"], scheduler=scheduler)
+
+
+base_url = None
+base_url_lock = threading.Lock()
+scheduler_settings = None
+# priority class of this process's requests when a caller does not name one
+default_priority = None
+
+
+def set_default_priority(priority_class):
+    """Sets the priority class of the requests of this process, e.g. "indexing" for a re-index run."""
+    global default_priority
+    default_priority = priority_class
+
+
+def get_base_url(priority=None):
+    """
+    Returns the URL Ollama clients should use, for requests of the given priority class.
+
+    With a single backend, no placement and no local scheduling that is the backend itself.
+    Otherwise a pool proxy is started in this process (once) and its local URL is returned, so
+    every client (LangChain, ollama, Strands) is load balanced and scheduled without changes.
+    When requests are scheduled the class travels as a /p/<class> prefix of the base URL.
+    """
+    global base_url, scheduler_settings
+    with base_url_lock:
+        if base_url is None:
+            settings = config_handler.get_ollama_pool_settings()
+            scheduler_settings = config_handler.get_scheduler_settings()
+            if len(settings["backends"]) <= 1 and not settings["placement"] and scheduler_settings["mode"] != "local":
+                base_url = settings["backends"][0] if settings["backends"] else config_handler.get_ollama_url()
+                base_url = base_url.rstrip("/")
+            else:
+                pool = setup_pool(settings, scheduler_settings)
+                pool.start()
+                server = serve(pool)
+                base_url = f"http://127.0.0.1:{server.server_address[1]}"
+                print(f"Routing Ollama requests over {len(pool.backends)} backends through {base_url}")
+    if scheduler_settings["mode"] == "off":
+        return base_url
+    return f"{base_url}/p/{priority or default_priority or scheduler_settings['default_class']}"
+
+
+if __name__ == "__main__":
+    # a shared pool for several apps: point their ollama_backends at this proxy
+    settings = config_handler.get_ollama_pool_settings()
+    pool = setup_pool(settings)
+    pool.start()
+    server = serve(pool, host=settings["host"], port=settings["port"])
+    print(f"Ollama pool listening on http://{settings['host']}:{server.server_address[1]} "
+          f"for {', '.join(backend.url for backend in pool.backends)}")
+    if pool.scheduler is not None:
+        print(f"Scheduling {pool.scheduler.capacity} slots by class: "
+              f"{', '.join(f'{name} (weight {weight:g}, limit {pool.scheduler.limits[name]})' for name, weight in pool.scheduler.weights.items())}")
+    threading.Event().wait()
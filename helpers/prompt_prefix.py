@@ -0,0 +1,47 @@
+import os
+import threading
+from collections import deque
+from .splitter import count_tokens
+
+
+class PrefixReuseTracker:
+    """
+    Measures how much of each prompt repeats the start of a recent prompt.
+
+    Ollama keeps the evaluated prompt of a loaded model and only prefills the tokens after the
+    longest prefix it shares with the new prompt, so the reuse rate approximates the fraction
+    of prompt tokens that did not have to be prefilled again.
+    """
+
+    def __init__(self, history_size=16):
+        self.recent = deque(maxlen=history_size)
+        self.prompts = 0
+        self.prompt_tokens = 0
+        self.reused_tokens = 0
+        self.last_reuse_rate = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, prompt):
+        """Records a prompt (a string or a PromptValue) and returns it unchanged, so it can sit in a chain."""
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        with self._lock:
+            shared = max((len(os.path.commonprefix([previous, text])) for previous in self.recent), default=0)
+            self.recent.append(text)
+        total = count_tokens(text)
+        reused = count_tokens(text, 0, shared)
+        with self._lock:
+            self.prompts += 1
+            self.prompt_tokens += total
+            self.reused_tokens += reused
+            self.last_reuse_rate = reused / total if total else 0.0
+        return prompt
+
+    def stats(self):
+        with self._lock:
+            return {
+                "prompts": self.prompts,
+                "prompt_tokens": self.prompt_tokens,
+                "reused_tokens": self.reused_tokens,
+                "reuse_rate": round(self.reused_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+                "last_reuse_rate": round(self.last_reuse_rate, 3),
+            }
@@ -0,0 +1,67 @@
+import asyncio
+import contextlib
+
+
+class ServiceBusy(Exception):
+    """Raised when the queue of requests waiting for Ollama is full."""
+
+
+class RequestGate:
+    """
+    Admission control for requests toward Ollama.
+
+    At most `max_concurrency` requests run at a time (match OLLAMA_NUM_PARALLEL), at most
+    `max_queue` wait for a slot and any more are rejected with ServiceBusy, and requests of
+    the same session run one after the other in arrival order.
+    """
+
+    def __init__(self, max_concurrency=2, max_queue=32):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session_locks = {}
+
+    def is_full(self):
+        return self.waiting >= self.max_queue
+
+    @contextlib.asynccontextmanager
+    async def slot(self, session_id):
+        if self.is_full():
+            self.rejected += 1
+            raise ServiceBusy(f"{self.waiting} requests are already waiting for Ollama")
+        # asyncio.Lock wakes waiters in FIFO order, which keeps a session's turns in order
+        lock, users = self._session_locks.get(session_id, (asyncio.Lock(), 0))
+        self._session_locks[session_id] = (lock, users + 1)
+        self.waiting += 1
+        queued = True
+        try:
+            async with lock:
+                async with self._semaphore:
+                    self.waiting -= 1
+                    queued = False
+                    self.active += 1
+                    try:
+                        yield
+                    finally:
+                        self.active -= 1
+        finally:
+            if queued:
+                # cancelled, e.g. the client disconnected, while still waiting
+                self.waiting -= 1
+            lock, users = self._session_locks[session_id]
+            if users <= 1:
+                del self._session_locks[session_id]
+            else:
+                self._session_locks[session_id] = (lock, users - 1)
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
@@ -0,0 +1,54 @@
+import re
+from .splitter import count_tokens
+
+TERM_PATTERN = re.compile(r"\w+")
+
+
+def query_terms(text):
+    """Lower-cased words of three or more characters, which skips most stop words."""
+    return {term for term in TERM_PATTERN.findall(text.lower()) if len(term) > 2}
+
+
+def lexical_overlap(terms, text):
+    """Returns the fraction of the query terms that appear in the text."""
+    if not terms:
+        return 0.0
+    return len(terms & query_terms(text)) / len(terms)
+
+
+def rerank(query, candidates, k=5, similarity_threshold=0.0, score_gap=0.15, context_budget=1500,
+           lexical_weight=0.3, min_k=1):
+    """
+    Reranks [(document, relevance)] candidates and keeps only the ones worth sending to the model.
+
+    The score blends the vector relevance with the lexical overlap between the query and the
+    chunk. Chunks whose vector relevance is below `similarity_threshold` are skipped (the same
+    scale as the retriever's similarity threshold, so the lexical blend doesn't shift it).
+    Starting from the best chunk, results are kept until one's score drops more than
+    `score_gap` below the previous kept one, it would take the chunks over `context_budget`
+    tokens, or k chunks are kept. The first `min_k` chunks are always kept. Returns
+    [(document, score)] in score order.
+    """
+    terms = query_terms(query)
+    scored = sorted(
+        ((document, (1 - lexical_weight) * relevance + lexical_weight * lexical_overlap(terms, document.page_content),
+          relevance)
+         for document, relevance in candidates),
+        key=lambda result: result[1], reverse=True)
+
+    kept = []
+    used_tokens = 0
+    for document, score, relevance in scored:
+        if len(kept) >= k:
+            break
+        tokens = count_tokens(document.page_content)
+        if len(kept) >= min_k:
+            if relevance < similarity_threshold:
+                continue
+            if score_gap and kept[-1][1] - score > score_gap:
+                break
+            if used_tokens + tokens > context_budget:
+                break
+        kept.append((document, score))
+        used_tokens += tokens
+    return kept
@@ -0,0 +1,130 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .splitter import count_tokens, TOKEN_PATTERN
+
+SUMMARY_PROMPT = """Update the summary of a conversation between a user and an assistant.
+Keep names, facts, decisions and open questions; drop small talk. Answer with the summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:"""
+
+
+def format_turns(turns):
+    return "\n".join(f"User: {human}\nAssistant: {ai}" for human, ai in turns)
+
+
+def truncate_tokens(text, max_tokens, keep="end"):
+    """Cuts text to at most max_tokens tokens, keeping its start or its end."""
+    matches = list(TOKEN_PATTERN.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    if keep == "start":
+        return text[:matches[max_tokens - 1].end()]
+    return text[matches[-max_tokens].start():]
+
+
+def llm_summarizer(llm, max_words=150):
+    """Returns summarize(summary, turns) that folds turns into the summary with one LLM call."""
+    def summarize(summary, turns):
+        prompt = SUMMARY_PROMPT.format(max_words=max_words, summary=summary or "(none)", turns=format_turns(turns))
+        response = llm.invoke(prompt)
+        return getattr(response, "content", response).strip()
+    return summarize
+
+
+class RollingSummaryMemory:
+    """
+    Conversation memory whose prompt text stays under `max_tokens` however long the chat runs.
+
+    The last `keep_turns` turns are kept verbatim. Older turns are folded into a running summary
+    by `summarize(summary, turns)`, which runs in a background thread so a reply never waits for
+    it. Until a fold finishes its turns are still shown verbatim, and when the text would exceed
+    the cap the oldest of them, then the oldest recent turns, then the start of the summary are
+    dropped.
+    """
+
+    def __init__(self, summarize, max_tokens=2048, keep_turns=2, summary_tokens=None):
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summary_tokens = summary_tokens or max_tokens // 4
+        self.summary = ""
+        self.turns = []
+        # turns past keep_turns that are not in the summary yet
+        self.unsummarized = []
+        self.folds = 0
+        self._lock = threading.Lock()
+        self._folding = None
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+
+    def add_turn(self, human, ai):
+        with self._lock:
+            self.turns.append((human, ai))
+            while len(self.turns) > self.keep_turns:
+                self.unsummarized.append(self.turns.pop(0))
+            if self.unsummarized and self._folding is None:
+                self._folding = self._pool.submit(self._fold)
+
+    def _fold(self):
+        while True:
+            with self._lock:
+                turns = list(self.unsummarized)
+                summary = self.summary
+                if not turns:
+                    self._folding = None
+                    return
+            try:
+                new_summary = self.summarize(summary, turns)
+            except Exception as e:
+                # keep the turns unsummarized; they are dropped from the prompt first when space runs out
+                print(f"Conversation summary failed: {str(e)}")
+                with self._lock:
+                    self._folding = None
+                return
+            with self._lock:
+                self.summary = truncate_tokens(new_summary, self.summary_tokens, keep="start")
+                del self.unsummarized[:len(turns)]
+                self.folds += 1
+
+    def wait(self, timeout=None):
+        """Blocks until the background summary is up to date (for tests and shutdown)."""
+        with self._lock:
+            folding = self._folding
+        if folding is not None:
+            folding.result(timeout)
+
+    def history_text(self):
+        """Returns the history for the prompt: the summary and the verbatim turns, within max_tokens."""
+        with self._lock:
+            summary, older, recent = self.summary, list(self.unsummarized), list(self.turns)
+        pieces = [format_turns([turn]) for turn in older + recent]
+        summary_text = f"Summary of the earlier conversation: {summary}" if summary else ""
+        budget = self.max_tokens - count_tokens(summary_text)
+        # keep the newest turns that fit; the summary covers the rest once folded
+        kept = []
+        for piece in reversed(pieces):
+            tokens = count_tokens(piece) + 1
+            if tokens > budget:
+                break
+            kept.insert(0, piece)
+            budget -= tokens
+        if not kept and pieces:
+            # a single turn longer than the cap: keep its end, the summary gives way
+            summary_text = truncate_tokens(summary_text, self.max_tokens // 4, keep="start")
+            kept = [truncate_tokens(pieces[-1], self.max_tokens - count_tokens(summary_text) - 1)]
+        return "\n".join(([summary_text] if summary_text else []) + kept)
+
+    def stats(self):
+        with self._lock:
+            return {"turns": len(self.turns), "unsummarized": len(self.unsummarized), "folds": self.folds,
+                    "summary_tokens": count_tokens(self.summary)}
+
+    def close(self):
+        self._pool.shutdown(wait=False)
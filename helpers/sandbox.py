@@ -0,0 +1,337 @@
+import io
+import os
+import math
+import json
+import queue
+import atexit
+import select
+import shutil
+import signal
+import tempfile
+import time
+import threading
+import contextlib
+import multiprocessing
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-time limit applies
+    resource = None
+
+# results are cut to this many characters, so what crosses the pipe stays small
+MAX_OUTPUT_CHARS = 10000
+# a job's encoded result is at most this many bytes; anything longer was not written by run_job
+MAX_RESULT_BYTES = 12 * MAX_OUTPUT_CHARS + 1024
+RESULT_STATUSES = {"ok", "error", "timeout", "killed"}
+MATH_CHARS = set('0123456789+-*/.() ')
+# environment jobs run with; nothing of the app's, so no credentials
+JOB_ENVIRONMENT = {"PATH": os.defpath, "LANG": "C.UTF-8"}
+# extra time the pool gives a worker past the wall-time limit before it counts it as hung
+WORKER_GRACE_SECONDS = 2.0
+
+
+class SandboxError(Exception):
+    """Raised when a job fails in its worker, breaks a limit or finds no free worker."""
+
+
+def eval_math(expression):
+    """Evaluates an arithmetic expression; only digits, operators, parentheses and spaces are allowed."""
+    if not all(c in MATH_CHARS for c in expression):
+        raise ValueError("Invalid characters in expression")
+    return eval(expression, {"__builtins__": {}}, {})
+
+
+def exec_python(code):
+    """Runs Python code in the current process and returns what it printed."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        exec(compile(code, "<sandbox>", "exec"), {"__name__": "__sandbox__"})
+    return output.getvalue()
+
+
+JOBS = {"math": eval_math, "python": exec_python}
+
+
+def run_job(kind, payload):
+    """Runs a job in the current process; returns (status, text) with status "ok" or "error"."""
+    try:
+        return "ok", str(JOBS[kind](payload))[:MAX_OUTPUT_CHARS]
+    except MemoryError:
+        return "error", "memory limit exceeded"
+    except BaseException as e:
+        return "error", f"{type(e).__name__}: {e}"[:MAX_OUTPUT_CHARS]
+
+
+def encode_result(status, text):
+    return json.dumps([status, text]).encode()
+
+
+def decode_result(data):
+    """
+    Decodes a (status, text) result sent by a job or a worker. Results are plain JSON, never
+    pickles: the job that wrote them ran untrusted code. Raises ValueError on anything else.
+    """
+    result = json.loads(data)
+    if (not isinstance(result, list) or len(result) != 2 or result[0] not in RESULT_STATUSES
+            or not isinstance(result[1], str)):
+        raise ValueError("malformed sandbox result")
+    return result[0], result[1]
+
+
+def _limit_job(cpu_seconds, memory_mb):
+    # a fresh child has used no CPU yet; the hard limit is one second past the soft one, so a job
+    # that raises its own soft limit is still killed (SIGXCPU at the soft limit, SIGKILL at the hard one)
+    soft = max(1, math.ceil(cpu_seconds))
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _read_result(fd, pid, wall_seconds, cpu_seconds):
+    """Reads a forked job's result, killing its process group at the wall-time limit."""
+    data = b""
+    deadline = time.monotonic() + wall_seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+            _kill_group(pid)
+            os.waitpid(pid, 0)
+            return "timeout", f"time limit of {wall_seconds:g}s exceeded"
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_RESULT_BYTES:
+            _kill_group(pid)
+            os.waitpid(pid, 0)
+            return "error", "job returned an invalid result"
+    # anything the job started in the background goes with it
+    _kill_group(pid)
+    os.waitpid(pid, 0)
+    if not data:
+        return "killed", f"job stopped: CPU limit of {cpu_seconds:g}s or memory limit exceeded"
+    try:
+        return decode_result(data)
+    except ValueError:
+        return "error", "job returned an invalid result"
+
+
+def _fork_job(kind, payload, cpu_seconds, wall_seconds, memory_mb):
+    """Runs one job in a child forked from the worker, in its own process group and temporary folder."""
+    workdir = tempfile.mkdtemp(prefix="sandbox-job-")
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # the job keeps only its result pipe, not the worker's connection to the app
+            os.closerange(3, write_fd)
+            os.closerange(write_fd + 1, os.sysconf("SC_OPEN_MAX"))
+            os.setpgid(0, 0)
+            os.chdir(workdir)
+            _limit_job(cpu_seconds, memory_mb)
+            result = run_job(kind, payload)
+            with os.fdopen(write_fd, "wb") as f:
+                f.write(encode_result(*result))
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    try:
+        return _read_result(read_fd, pid, wall_seconds, cpu_seconds)
+    finally:
+        os.close(read_fd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _worker_main(connection, cpu_seconds, wall_seconds, memory_mb):
+    """
+    Loop of a worker process. The worker stays a small, single-threaded template: each
+    (kind, payload) job runs in a child forked from it with its own limits, so jobs start warm
+    yet share no state, and a job can't loosen the limits of the next one.
+    """
+    os.environ.clear()
+    os.environ.update(JOB_ENVIRONMENT)
+    os.chdir(tempfile.gettempdir())
+    while True:
+        try:
+            job = connection.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        kind, payload = job
+        if hasattr(os, "fork") and resource is not None:
+            result = _fork_job(kind, payload, cpu_seconds, wall_seconds, memory_mb)
+        else:
+            result = run_job(kind, payload)
+        try:
+            connection.send_bytes(encode_result(*result))
+        except (OSError, ValueError):
+            return
+
+
+class _Worker:
+    def __init__(self, context, cpu_seconds, wall_seconds, memory_mb):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, cpu_seconds, wall_seconds, memory_mb),
+                                       daemon=True, name="sandbox-worker")
+        self.process.start()
+        child.close()
+        self.jobs = 0
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        self.kill()
+
+
+class SandboxPool:
+    """
+    Warm worker processes that run tool code away from the serving process.
+
+    This limits resources; it is not a security sandbox. Jobs get no environment variables of
+    the app and run in an empty temporary folder, but they can still read what the user
+    running the app can read, and use the network.
+
+    Each job runs in a fresh child of one of `workers` pre-started interpreters and gets
+    `cpu_seconds` of CPU time, `wall_seconds` in total and `memory_mb` of address space; a job
+    that breaks a limit is killed with anything it started. A runaway job ties up only its own
+    worker. Workers are replaced after `max_jobs` jobs. Jobs and results travel over a pipe;
+    results come back as JSON, so nothing a job writes is ever unpickled.
+    """
+
+    def __init__(self, workers=2, max_jobs=200, cpu_seconds=2.0, wall_seconds=5.0, memory_mb=512,
+                 queue_timeout=10.0):
+        self.size = workers
+        self.max_jobs = max_jobs
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.memory_mb = memory_mb
+        self.queue_timeout = queue_timeout
+        methods = multiprocessing.get_all_start_methods()
+        # forkserver forks workers from a clean, single-threaded server rather than from the app
+        self.context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self.idle = queue.Queue()
+        self.counts = {"jobs": 0, "errors": 0, "timeouts": 0, "killed": 0, "recycled": 0, "busy": 0}
+        self.closed = False
+        self._lock = threading.Lock()
+        self._workers = set()
+        for _ in range(workers):
+            self._add_worker()
+
+    def _add_worker(self):
+        worker = _Worker(self.context, self.cpu_seconds, self.wall_seconds, self.memory_mb)
+        with self._lock:
+            if self.closed:
+                worker.stop()
+                return
+            self._workers.add(worker)
+        self.idle.put(worker)
+
+    def _retire(self, worker, kill=False):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill() if kill else worker.stop()
+        # start the replacement off the request path
+        threading.Thread(target=self._add_worker, name="sandbox-respawn", daemon=True).start()
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def run(self, kind, payload):
+        """Runs a job ("math" or "python") in a worker and returns its result; raises SandboxError."""
+        if self.closed:
+            raise SandboxError("sandbox pool is closed")
+        try:
+            worker = self.idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            self._count("busy")
+            raise SandboxError("all sandbox workers are busy")
+        self._count("jobs")
+        worker.jobs += 1
+        try:
+            worker.connection.send((kind, payload))
+            # the worker enforces the limits itself; this only catches a worker that hangs or dies
+            if not worker.connection.poll(self.wall_seconds + WORKER_GRACE_SECONDS):
+                self._count("timeouts")
+                self._retire(worker, kill=True)
+                raise SandboxError(f"time limit of {self.wall_seconds:g}s exceeded")
+            status, value = decode_result(worker.connection.recv_bytes(MAX_RESULT_BYTES))
+        except (EOFError, OSError):
+            self._count("killed")
+            self._retire(worker, kill=True)
+            raise SandboxError(f"worker stopped: CPU limit of {self.cpu_seconds:g}s or memory limit exceeded")
+        except ValueError:
+            # a worker that sends something else can't be trusted with another job
+            self._count("errors")
+            self._retire(worker, kill=True)
+            raise SandboxError("worker returned an invalid result")
+        if worker.jobs >= self.max_jobs:
+            self._count("recycled")
+            self._retire(worker)
+        else:
+            self.idle.put(worker)
+        if status != "ok":
+            self._count({"timeout": "timeouts", "killed": "killed"}.get(status, "errors"))
+            raise SandboxError(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"workers": len(self._workers), "idle": self.idle.qsize(), **self.counts}
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process's sandbox pool, started on first use with the [Sandbox] settings."""
+    global pool
+    with pool_lock:
+        if pool is None:
+            from . import config_handler
+            pool = SandboxPool(**config_handler.get_sandbox_settings())
+            atexit.register(pool.close)
+        return pool
+
+
+def run_math(expression):
+    """Evaluates an arithmetic expression in the sandbox pool; the answer or the error, as text for a model."""
+    try:
+        return f"The result of {expression} is {get_pool().run('math', expression)}"
+    except SandboxError as e:
+        return f"Error calculating {expression}: {e}"
+
+
+def run_python(code):
+    """Runs Python code in the sandbox pool; what it printed or the error, as text for a model."""
+    try:
+        return get_pool().run("python", code) or "(no output)"
+    except SandboxError as e:
+        return f"Error running code: {e}"
@@ -0,0 +1,119 @@
+import time
+import itertools
+import threading
+from collections import deque
+
+# the base URL path prefix that carries a request's class through any Ollama client, e.g. /p/batch/api/chat
+CLASS_PREFIX = "/p/"
+
+
+def split_class(path, classes, default_class):
+    """Returns (priority class, path without the class prefix) of a request path."""
+    if path.startswith(CLASS_PREFIX):
+        name, _, rest = path[len(CLASS_PREFIX):].partition("/")
+        return (name if name in classes else default_class), "/" + rest
+    return default_class, path
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Ticket:
+    def __init__(self, priority_class, tag, seq):
+        self.priority_class = priority_class
+        self.tag = tag
+        self.seq = seq
+        self.granted = False
+        self.enqueued = time.perf_counter()
+
+
+class PriorityScheduler:
+    """
+    Decides which request goes to Ollama next when more want to run than it has slots for.
+
+    `capacity` requests run at once (the backends' OLLAMA_NUM_PARALLEL together). Waiting requests
+    are served by weighted fair queueing: each gets a virtual finish tag of 1/weight past its
+    class's previous one, and the lowest tag goes next, so over time the classes share the slots
+    in proportion to their weights and no class starves. A class never holds more than its limit
+    of the slots; keeping background limits below capacity leaves slots free for interactive
+    requests, which then wait for no one. Queue times are recorded per class.
+    """
+
+    def __init__(self, capacity, weights, limits=None, default_class="interactive", samples=1000):
+        if default_class not in weights:
+            raise ValueError(f"The default class {default_class!r} must be one of {sorted(weights)}.")
+        self.capacity = capacity
+        self.weights = dict(weights)
+        self.limits = {name: min(capacity, (limits or {}).get(name, capacity)) for name in weights}
+        self.default_class = default_class
+        self.active = dict.fromkeys(weights, 0)
+        self.requests = dict.fromkeys(weights, 0)
+        self.timeouts = dict.fromkeys(weights, 0)
+        self.queue_times = {name: deque(maxlen=samples) for name in weights}
+        self.waiting = []
+        self.virtual_time = 0.0
+        self.last_tag = dict.fromkeys(weights, 0.0)
+        self.condition = threading.Condition()
+        self._seq = itertools.count()
+
+    def _dispatch(self):
+        """Grants free slots to the waiting requests with the lowest tags whose class is under its limit."""
+        granted = False
+        while sum(self.active.values()) < self.capacity:
+            eligible = [ticket for ticket in self.waiting
+                        if self.active[ticket.priority_class] < self.limits[ticket.priority_class]]
+            if not eligible:
+                break
+            ticket = min(eligible, key=lambda t: (t.tag, t.seq))
+            self.waiting.remove(ticket)
+            ticket.granted = True
+            self.active[ticket.priority_class] += 1
+            self.virtual_time = max(self.virtual_time, ticket.tag - 1.0 / self.weights[ticket.priority_class])
+            self.queue_times[ticket.priority_class].append(time.perf_counter() - ticket.enqueued)
+            granted = True
+        if granted:
+            self.condition.notify_all()
+
+    def acquire(self, priority_class=None, timeout=None):
+        """Waits for a slot; returns a ticket to release, or None if the wait timed out."""
+        priority_class = priority_class if priority_class in self.weights else self.default_class
+        with self.condition:
+            # a class idle for a while starts at the current virtual time, not with saved-up credit
+            tag = max(self.virtual_time, self.last_tag[priority_class]) + 1.0 / self.weights[priority_class]
+            self.last_tag[priority_class] = tag
+            ticket = _Ticket(priority_class, tag, next(self._seq))
+            self.requests[priority_class] += 1
+            self.waiting.append(ticket)
+            self._dispatch()
+            if not self.condition.wait_for(lambda: ticket.granted, timeout):
+                self.waiting.remove(ticket)
+                self.timeouts[priority_class] += 1
+                return None
+            return ticket
+
+    def release(self, ticket):
+        with self.condition:
+            self.active[ticket.priority_class] -= 1
+            self._dispatch()
+
+    def stats(self):
+        with self.condition:
+            classes = {}
+            for name in self.weights:
+                times = list(self.queue_times[name])
+                classes[name] = {
+                    "weight": self.weights[name],
+                    "limit": self.limits[name],
+                    "active": self.active[name],
+                    "waiting": sum(1 for ticket in self.waiting if ticket.priority_class == name),
+                    "requests": self.requests[name],
+                    "timeouts": self.timeouts[name],
+                    "queue_ms_p50": round(percentile(times, 0.5) * 1000, 1),
+                    "queue_ms_p95": round(percentile(times, 0.95) * 1000, 1),
+                    "queue_ms_max": round(max(times, default=0.0) * 1000, 1),
+                }
+            return {"capacity": self.capacity, "classes": classes}
@@ -0,0 +1,53 @@
+import os
+import re
+import math
+import heapq
+import hashlib
+
+SHARD_KEYS = ("none", "folder", "type", "hash")
+SHARD_PREFIX = "shard_"
+
+
+def shard_key(file_path, data_folder, shard_by, shard_count=4):
+    """
+    Returns the shard a file belongs to: its top-level folder under the data folder, its
+    file type, or a stable hash bucket of its relative path.
+    """
+    relative_path = os.path.relpath(file_path, data_folder)
+    if shard_by == "folder":
+        parts = relative_path.split(os.sep)
+        return parts[0] if len(parts) > 1 else "root"
+    if shard_by == "type":
+        return os.path.splitext(file_path)[1].lstrip(".").lower() or "none"
+    if shard_by == "hash":
+        digest = hashlib.md5(relative_path.encode("utf-8")).hexdigest()
+        return str(int(digest, 16) % shard_count)
+    raise ValueError(f"Unknown shard key {shard_by!r}, expected one of {SHARD_KEYS}")
+
+
+def collection_name(key):
+    """Turns a shard key into a valid Chroma collection name (3-63 characters of [a-zA-Z0-9._-])."""
+    name = SHARD_PREFIX + re.sub(r"[^a-zA-Z0-9._-]", "_", key)
+    return name[:63].rstrip("._-")
+
+
+def merge_top_k(results_per_shard, k):
+    """
+    Merges per-shard [(document, distance)] lists, each sorted by distance, into the overall top k.
+    """
+    return heapq.nsmallest(k, (result for results in results_per_shard for result in results),
+                           key=lambda result: result[1])
+
+
+def relevance_score(distance, space="l2"):
+    """
+    Turns a Chroma distance into a relevance in [0, 1], higher is closer, the way langchain's
+    Chroma does for a collection's hnsw:space.
+    """
+    if space == "cosine":
+        return 1.0 - distance
+    if space == "l2":
+        return 1.0 - distance / math.sqrt(2)
+    if space == "ip":
+        return 1.0 - distance if distance > 0 else -1.0 * distance
+    raise ValueError(f"Unknown hnsw:space {space!r}, expected l2, cosine or ip")
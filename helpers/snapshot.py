@@ -0,0 +1,323 @@
+import os
+import io
+import json
+import mmap
+import zlib
+import time
+import struct
+import hashlib
+import threading
+import contextlib
+
+MAGIC = b"RAGSNAP1"
+FORMAT_VERSION = 1
+# magic, header offset, header length, header sha256, padded to 64 bytes
+PREAMBLE = struct.Struct("<8sQQ32s8x")
+ALIGNMENT = 64
+VECTOR_FORMATS = {"float32": "f", "float16": "e"}
+INDEX_LOCK_FILE = "index.lock"
+BATCH_SIZE = 1000
+
+held_locks = threading.local()
+
+
+@contextlib.contextmanager
+def index_lock(persistent_directory, shared=False):
+    """
+    Cross-process lock on the index directory: writers take it exclusively for each file
+    update and snapshot exports take it shared, so an export never sees half an update.
+
+    Re-entrant within a thread; a no-op where fcntl is not available.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    depths = held_locks.__dict__.setdefault("depths", {})
+    if depths.get(persistent_directory):
+        depths[persistent_directory] += 1
+        try:
+            yield
+        finally:
+            depths[persistent_directory] -= 1
+        return
+    os.makedirs(persistent_directory, exist_ok=True)
+    with open(os.path.join(persistent_directory, INDEX_LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        depths[persistent_directory] = 1
+        try:
+            yield
+        finally:
+            depths[persistent_directory] = 0
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def align(handle):
+    padding = -handle.tell() % ALIGNMENT
+    handle.write(b"\0" * padding)
+
+
+def write_snapshot(path, collections, dtype="float32", compress=True, metadata=None):
+    """
+    Writes a snapshot file from collections given as [(name, collection_metadata, batches)],
+    where batches yields (ids, embeddings, documents, metadatas) lists.
+
+    Layout: a fixed preamble, the vectors of every record as one aligned little-endian array
+    (so it can be memory-mapped), the records (id, text, metadata) as JSON lines, optionally
+    zlib-compressed, and a JSON header with the manifest and a sha256 per section. The file
+    is written next to `path` and moved into place once complete. Returns the header.
+    """
+    if dtype not in VECTOR_FORMATS:
+        raise ValueError(f"Unknown vector type {dtype!r}, expected one of {tuple(VECTOR_FORMATS)}")
+    item_format = VECTOR_FORMATS[dtype]
+    temp_path = path + ".tmp"
+    records = io.BytesIO()
+    compressor = zlib.compressobj(6) if compress else None
+    records_hash = hashlib.sha256()
+    vectors_hash = hashlib.sha256()
+    manifest = []
+    count = 0
+    dimension = None
+
+    def add_records(data):
+        data = compressor.compress(data) if compressor else data
+        records_hash.update(data)
+        records.write(data)
+
+    with open(temp_path, "wb") as handle:
+        handle.write(b"\0" * PREAMBLE.size)
+        align(handle)
+        vectors_offset = handle.tell()
+        for name, collection_metadata, batches in collections:
+            start = count
+            for ids, embeddings, documents, metadatas in batches:
+                for embedding in embeddings:
+                    if dimension is None:
+                        dimension = len(embedding)
+                    elif len(embedding) != dimension:
+                        raise ValueError(f"Embedding of dimension {len(embedding)} in a {dimension} dimension index")
+                    data = struct.pack(f"<{dimension}{item_format}", *embedding)
+                    vectors_hash.update(data)
+                    handle.write(data)
+                lines = "".join(json.dumps([record_id, document, record_metadata]) + "\n"
+                                for record_id, document, record_metadata in zip(ids, documents, metadatas))
+                add_records(lines.encode("utf-8"))
+                count += len(ids)
+            manifest.append({"name": name, "metadata": collection_metadata, "start": start, "count": count - start})
+        vectors_length = handle.tell() - vectors_offset
+        if compressor:
+            tail = compressor.flush()
+            records_hash.update(tail)
+            records.write(tail)
+
+        align(handle)
+        records_offset = handle.tell()
+        handle.write(records.getbuffer())
+        header = {
+            "format_version": FORMAT_VERSION,
+            "created": time.time(),
+            "count": count,
+            "dimension": dimension or 0,
+            "dtype": dtype,
+            "text_compression": "zlib" if compress else "none",
+            "collections": manifest,
+            "sections": {
+                "vectors": {"offset": vectors_offset, "length": vectors_length, "sha256": vectors_hash.hexdigest()},
+                "records": {"offset": records_offset, "length": records.tell(), "sha256": records_hash.hexdigest()},
+            },
+            **(metadata or {}),
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_offset = handle.tell()
+        handle.write(header_bytes)
+        handle.seek(0)
+        handle.write(PREAMBLE.pack(MAGIC, header_offset, len(header_bytes), hashlib.sha256(header_bytes).digest()))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_path, path)
+    return header
+
+
+class SnapshotReader:
+    """
+    Reads a snapshot through a memory map: vectors are read in place, so opening a snapshot
+    costs no more than reading its header, and records are only decompressed when asked for.
+    """
+
+    def __init__(self, path, verify=True):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_offset, header_length, header_hash = PREAMBLE.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an index snapshot")
+        header_bytes = self.map[header_offset:header_offset + header_length]
+        if hashlib.sha256(header_bytes).digest() != header_hash:
+            self.close()
+            raise ValueError(f"Snapshot header of {path} is corrupt")
+        self.header = json.loads(header_bytes)
+        if self.header["format_version"] > FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Snapshot format {self.header['format_version']} is newer than this reader")
+        self.count = self.header["count"]
+        self.dimension = self.header["dimension"]
+        self.item_format = VECTOR_FORMATS[self.header["dtype"]]
+        self.vector_struct = struct.Struct(f"<{self.dimension}{self.item_format}")
+        if verify:
+            try:
+                self.verify()
+            except ValueError:
+                self.close()
+                raise
+
+    def section(self, name):
+        section = self.header["sections"][name]
+        return memoryview(self.map)[section["offset"]:section["offset"] + section["length"]]
+
+    def verify(self):
+        for name, section in self.header["sections"].items():
+            view = self.section(name)
+            try:
+                if hashlib.sha256(view).hexdigest() != section["sha256"]:
+                    raise ValueError(f"Snapshot section {name} of {self.path} is corrupt")
+            finally:
+                view.release()
+
+    def vector(self, index):
+        offset = self.header["sections"]["vectors"]["offset"] + index * self.vector_struct.size
+        return self.vector_struct.unpack_from(self.map, offset)
+
+    def vectors(self, start=0, end=None):
+        """Vectors [start, end) as a float32 NumPy array; float32 snapshots are read in place from the map."""
+        import numpy as np
+        end = self.count if end is None else end
+        dtype = np.dtype("<f4") if self.item_format == "f" else np.dtype("<f2")
+        offset = self.header["sections"]["vectors"]["offset"] + start * self.dimension * dtype.itemsize
+        array = np.frombuffer(self.map, dtype=dtype, count=(end - start) * self.dimension, offset=offset)
+        return array.reshape(end - start, self.dimension).astype(np.float32, copy=False)
+
+    def records(self):
+        """Returns every record as (id, document, metadata)."""
+        view = self.section("records")
+        try:
+            data = bytes(view)
+        finally:
+            view.release()
+        if self.header["text_compression"] == "zlib":
+            data = zlib.decompress(data)
+        return [tuple(json.loads(line)) for line in data.decode("utf-8").splitlines()]
+
+    def collections(self, batch_size=BATCH_SIZE):
+        """Yields (name, collection_metadata, batches) per collection, each batch being (ids, embeddings, documents, metadatas)."""
+        records = self.records()
+        for collection in self.header["collections"]:
+            def batches(collection=collection):
+                end = collection["start"] + collection["count"]
+                for start in range(collection["start"], end, batch_size):
+                    stop = min(start + batch_size, end)
+                    ids, documents, metadatas = zip(*records[start:stop])
+                    embeddings = [list(self.vector(index)) for index in range(start, stop)]
+                    yield list(ids), embeddings, list(documents), list(metadatas)
+            yield collection["name"], collection.get("metadata"), batches()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_snapshot(persistent_directory, output_path, dtype="float32", compress=True, metadata=None):
+    """
+    Exports every collection of the Chroma index to a snapshot file.
+
+    The index lock is held shared for the whole export, so the indexer cannot change the
+    index half-way through; a running indexer simply waits for the export to finish.
+    """
+    import chromadb
+    client = chromadb.PersistentClient(path=persistent_directory)
+
+    def batches(collection):
+        total = collection.count()
+        for offset in range(0, total, BATCH_SIZE):
+            result = collection.get(include=["embeddings", "documents", "metadatas"], limit=BATCH_SIZE, offset=offset)
+            yield result["ids"], result["embeddings"], result["documents"], result["metadatas"]
+
+    with index_lock(persistent_directory, shared=True):
+        names = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+        collections = []
+        for name in sorted(names):
+            collection = client.get_collection(name)
+            collections.append((name, collection.metadata, batches(collection)))
+        return write_snapshot(output_path, collections, dtype=dtype, compress=compress, metadata=metadata)
+
+
+def import_snapshot(snapshot_path, persistent_directory, replace=False):
+    """
+    Loads a snapshot into the Chroma index at persistent_directory without re-embedding anything.
+
+    Existing collections with data are only overwritten with replace=True. Returns the header.
+    """
+    import chromadb
+    client = chromadb.PersistentClient(path=persistent_directory)
+    with SnapshotReader(snapshot_path) as reader, index_lock(persistent_directory):
+        existing = {c if isinstance(c, str) else c.name for c in client.list_collections()}
+        for collection in reader.header["collections"]:
+            name = collection["name"]
+            if name in existing and client.get_collection(name).count():
+                if not replace:
+                    raise ValueError(f"Collection {name} already has data, import with replace=True to overwrite it")
+                client.delete_collection(name)
+        for name, collection_metadata, batches in reader.collections(
+                batch_size=min(BATCH_SIZE, client.get_max_batch_size())):
+            target = client.get_or_create_collection(name, metadata=collection_metadata)
+            for ids, embeddings, documents, metadatas in batches:
+                target.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            print(f"Imported {target.count()} chunks into {name}")
+        return reader.header
+
+
+if __name__ == "__main__":
+    import argparse
+    from . import config_handler, indexer
+
+    parser = argparse.ArgumentParser(description="Export or import the vector index as a single snapshot file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write the index to a snapshot file")
+    export_parser.add_argument("output", help="Snapshot file to write")
+    export_parser.add_argument("--float16", action="store_true", help="Store vectors as float16 (half the size)")
+    export_parser.add_argument("--no-compress", action="store_true", help="Store chunk text uncompressed")
+    import_parser = commands.add_parser("import", help="Load a snapshot file into the index")
+    import_parser.add_argument("snapshot", help="Snapshot file to load")
+    import_parser.add_argument("--replace", action="store_true", help="Overwrite collections that already have data")
+    info_parser = commands.add_parser("info", help="Verify a snapshot file and print its manifest")
+    info_parser.add_argument("snapshot", help="Snapshot file to inspect")
+    for command_parser in (export_parser, import_parser):
+        command_parser.add_argument("--db-path", default=config_handler.get_db_path(), help="Chroma index directory")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "export":
+        header = export_snapshot(args.db_path, args.output, dtype="float16" if args.float16 else "float32",
+                                 compress=not args.no_compress,
+                                 metadata={"embedding_model": config_handler.get_embedding_model(),
+                                           "index_version": indexer.get_index_version(args.db_path)})
+        print(f"Exported {header['count']} chunks to {args.output} "
+              f"({os.path.getsize(args.output) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+    elif args.command == "import":
+        header = import_snapshot(args.snapshot, args.db_path, replace=args.replace)
+        if header.get("embedding_model") not in (None, config_handler.get_embedding_model()):
+            print(f"Warning: the snapshot was embedded with {header['embedding_model']}, "
+                  f"but EMBEDDING_MODEL is {config_handler.get_embedding_model()}")
+        # answers cached against the previous index no longer apply
+        indexer.bump_index_version(args.db_path)
+        print(f"Imported {header['count']} chunks in {time.perf_counter() - start:.1f}s")
+    else:
+        with SnapshotReader(args.snapshot) as reader:
+            print(json.dumps(reader.header, indent=2))
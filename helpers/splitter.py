@@ -0,0 +1,158 @@
+import re
+import time
+
+SPLIT_METHODS = ("sentence", "paragraph", "markdown", "fixed")
+
+# a cheap stand-in for the model tokenizer: words and punctuation marks
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+BOUNDARY_PATTERNS = {
+    "paragraph": re.compile(r"\n[ \t]*\n\s*"),
+    "sentence": re.compile(r"(?<=[.!?])\s+|\n[ \t]*\n\s*"),
+    "markdown": re.compile(r"\n[ \t]*\n\s*|\n(?=#{1,6}[ \t])"),
+}
+HEADING_PATTERN = re.compile(r"(#{1,6})[ \t]+([^\n]*)")
+
+
+def count_tokens(text, start=0, end=None):
+    end = len(text) if end is None else end
+    return sum(1 for _ in TOKEN_PATTERN.finditer(text, start, end))
+
+
+def iter_units(text, method):
+    """
+    Yields (start, end, heading_level, heading_title) spans of the units chunks are built from.
+
+    Only offsets are produced, so the text is sliced once per chunk rather than once per unit.
+    """
+    start = 0
+    for match in BOUNDARY_PATTERNS[method].finditer(text):
+        if match.start() > start:
+            yield span_with_heading(text, start, match.start(), method)
+        start = match.end() if match.end() > match.start() else match.start() + 1
+    if start < len(text):
+        yield span_with_heading(text, start, len(text), method)
+
+
+def span_with_heading(text, start, end, method):
+    if method == "markdown":
+        heading = HEADING_PATTERN.match(text, start, end)
+        if heading:
+            return start, end, len(heading.group(1)), heading.group(2).strip()
+    return start, end, 0, None
+
+
+def token_spans(text, start, end, chunk_size, chunk_overlap):
+    """Splits text[start:end] into spans of at most chunk_size tokens that overlap by chunk_overlap tokens."""
+    tokens = [(m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text, start, end)]
+    step = max(1, chunk_size - chunk_overlap)
+    for first in range(0, len(tokens), step):
+        last = min(first + chunk_size, len(tokens)) - 1
+        yield tokens[first][0], tokens[last][1], last - first + 1
+        if last == len(tokens) - 1:
+            break
+
+
+def split_text(text, chunk_size=512, chunk_overlap=50, method="sentence"):
+    """
+    Splits text into chunks of at most chunk_size tokens in a single pass.
+
+    Units (sentences, paragraphs or markdown blocks) are packed greedily; consecutive chunks
+    share whole units worth up to chunk_overlap tokens, and units longer than a chunk are split
+    by tokens. In markdown mode every heading starts a new chunk.
+    Returns a list of (chunk_text, start_index, heading_path).
+    """
+    if method not in SPLIT_METHODS:
+        raise ValueError(f"Unknown split method {method!r}, expected one of {SPLIT_METHODS}")
+    chunk_overlap = min(chunk_overlap, chunk_size - 1)
+    if method == "fixed":
+        return [(text[start:end], start, None) for start, end, _ in token_spans(text, 0, len(text), chunk_size, chunk_overlap)]
+
+    chunks = []
+    headings = {}
+    current = []
+    current_tokens = 0
+
+    def heading_path():
+        return " > ".join(headings[level] for level in sorted(headings)) or None
+
+    def flush():
+        if current:
+            start, end = current[0][0], current[-1][1]
+            chunks.append((text[start:end].strip(), start, current[0][3]))
+
+    for start, end, level, title in iter_units(text, method):
+        if level:
+            flush()
+            current, current_tokens = [], 0
+            headings = {lvl: name for lvl, name in headings.items() if lvl < level}
+            headings[level] = title
+        tokens = count_tokens(text, start, end)
+        if tokens > chunk_size:
+            flush()
+            current, current_tokens = [], 0
+            path = heading_path()
+            chunks.extend((text[s:e], s, path) for s, e, _ in token_spans(text, start, end, chunk_size, chunk_overlap))
+            continue
+        if current and current_tokens + tokens > chunk_size:
+            flush()
+            kept, kept_tokens = [], 0
+            for unit in reversed(current):
+                if kept_tokens + unit[2] > chunk_overlap:
+                    break
+                kept.insert(0, unit)
+                kept_tokens += unit[2]
+            if kept_tokens + tokens > chunk_size:
+                kept, kept_tokens = [], 0
+            current, current_tokens = kept, kept_tokens
+        current.append((start, end, tokens, heading_path()))
+        current_tokens += tokens
+    flush()
+    return [chunk for chunk in chunks if chunk[0]]
+
+
+def split_documents(documents, chunk_size=512, chunk_overlap=50, method="sentence"):
+    """
+    Splits documents into chunk documents of the same class.
+
+    Each chunk keeps the metadata of its document (such as the PDF "page") and adds
+    "chunk_index", "start_index" and, in markdown mode, the "heading" path it falls under.
+    """
+    chunks = []
+    for document in documents:
+        pieces = split_text(document.page_content, chunk_size, chunk_overlap, method)
+        for index, (content, start, heading) in enumerate(pieces):
+            metadata = dict(document.metadata)
+            metadata["chunk_index"] = index
+            metadata["start_index"] = start
+            if heading:
+                metadata["heading"] = heading
+            chunks.append(document.__class__(page_content=content, metadata=metadata))
+    return chunks
+
+
+def benchmark(documents, settings):
+    """Compares the configured splitter with the previous RecursiveCharacterTextSplitter(1000, 80)."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    recursive = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=80, length_function=len,
+                                               is_separator_regex=False)
+    candidates = [("recursive (1000 chars, 80 overlap)", recursive.split_documents)]
+    for method in SPLIT_METHODS:
+        label = f"{method} ({settings['chunk_size']} tokens, {settings['chunk_overlap']} overlap)"
+        candidates.append((label, lambda docs, method=method: split_documents(
+            docs, settings["chunk_size"], settings["chunk_overlap"], method)))
+
+    total_chars = sum(len(document.page_content) for document in documents)
+    print(f"Benchmarking on {len(documents)} documents, {total_chars} characters")
+    print(f"{'splitter':45} {'chunks':>8} {'seconds':>9} {'chunks/s':>10} {'MB/s':>7}")
+    for label, split in candidates:
+        start = time.perf_counter()
+        chunks = split(documents)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        print(f"{label:45} {len(chunks):>8} {elapsed:>9.3f} {len(chunks) / elapsed:>10.0f} "
+              f"{total_chars / elapsed / 1e6:>7.2f}")
+
+
+if __name__ == "__main__":
+    from helpers import config_handler, indexer
+    benchmark(indexer.load_multiple_file_types(indexer.DATA_FOLDER), config_handler.get_docs_split_settings())
@@ -3,8 +3,8 @@ from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_community.utilities import WikipediaAPIWrapper
 from langchain_community.tools.wikipedia.tool import WikipediaQueryRun
 from langchain.tools.retriever import create_retriever_tool
-from helpers import config_handler, indexer
-from strands_tools import calculator, current_time, python_repl
+from helpers import config_handler, indexer, sandbox
+from strands_tools import current_time
 
 EMBEDDING_MODEL = config_handler.get_embedding_model()
 PERSISTENT_DIRECTORY = config_handler.get_db_path()
@@ -28,16 +28,14 @@ wikipedia_tool = wikipedia.as_tool(name="wikidata", description="Search for info
 @tool
 def math_tool(expression: str) -> str:
     """Evaluate a mathematical expressions to calculate its result. This tool must be used to evaluate a mathematical calculation question from user."""
-    try:
-        # Only allow basic mathematical operations for safety
-        allowed_chars = set('0123456789+-*/.() ')
-        if not all(c in allowed_chars for c in expression):
-            return "Error: Invalid characters in expression"
-        
-        result = eval(expression)
-        return f"The result of {expression} is {result}"
-    except Exception as e:
-        return f"Error calculating {expression}: {str(e)}"
+    # evaluated in a sandbox worker, so a runaway expression like 9**9**9 can't freeze the app
+    return sandbox.run_math(expression)
+
+#---------- setup a sandboxed python tool ------------------#
+@tool("python_repl")
+def python_tool(code: str) -> str:
+    """Run Python code and return what it prints. Use print() to show results. Each run starts with a fresh interpreter state."""
+    return sandbox.run_python(code)
 
 #---------- setup local retriever tool ------------------#
 retriever = indexer.setup_retriever(persistent_directory=PERSISTENT_DIRECTORY, embedding_model=EMBEDDING_MODEL)
@@ -48,4 +46,4 @@ retriever_tool = create_retriever_tool(
 )
 
 # Define the tools
-tools = [math_tool, wikipedia_tool, search_tool, retriever_tool, calculator, current_time, python_repl]
+tools = [math_tool, wikipedia_tool, search_tool, retriever_tool, current_time, python_tool]
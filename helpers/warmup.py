@@ -0,0 +1,79 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import config_handler, ollama_pool
+
+PROBE_QUERY = "warm up"
+
+
+def preload_chat_model(model, ollama_url):
+    """Loads a chat model into Ollama without generating; keep_alive=-1 keeps it loaded like the chains do."""
+    from ollama import Client
+    Client(host=ollama_url).generate(model=model, prompt="", keep_alive=-1)
+
+
+def probe_retriever(retriever):
+    """Runs a tiny query, which loads the embedding model and opens and reads the vector index."""
+    retriever.invoke(PROBE_QUERY)
+
+
+class WarmUp:
+    """
+    Preloads the chat models and the retrieval path before the first user query.
+
+    The chat models are loaded and a probe query runs through the retriever concurrently.
+    `ready` is only set once every step has finished; `ok` tells whether all of them succeeded.
+    A failed step is reported but does not stop the others, so the app can still start cold.
+    """
+
+    def __init__(self, chat_models, retriever=None, ollama_url="http://localhost:11434"):
+        self.steps = {f"chat_model:{model}": (preload_chat_model, (model, ollama_url))
+                      for model in dict.fromkeys(chat_models)}
+        if retriever is not None:
+            self.steps["retriever_probe"] = (probe_retriever, (retriever,))
+        self.ready = threading.Event()
+        self.ok = False
+        self.report = {}
+        self.seconds = None
+
+    def run_step(self, name):
+        function, args = self.steps[name]
+        start = time.perf_counter()
+        try:
+            function(*args)
+            result = {"ok": True}
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {str(e)}")
+            result = {"ok": False, "error": str(e)}
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        return name, result
+
+    def run(self):
+        """Runs the warm-up steps concurrently and blocks until they are done. Returns True if all succeeded."""
+        start = time.perf_counter()
+        if self.steps:
+            with ThreadPoolExecutor(max_workers=len(self.steps)) as pool:
+                self.report = dict(pool.map(self.run_step, self.steps))
+        self.seconds = round(time.perf_counter() - start, 3)
+        self.ok = all(result["ok"] for result in self.report.values())
+        print(f"Warm-up {'completed' if self.ok else 'finished with errors'} in {self.seconds}s")
+        self.ready.set()
+        return self.ok
+
+    def start(self):
+        """Runs the warm-up in a background thread."""
+        thread = threading.Thread(target=self.run, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        state = ("ready" if self.ok else "failed") if self.ready.is_set() else "warming_up"
+        return {"state": state, "seconds": self.seconds, "steps": self.report}
+
+
+def setup_warmup(chat_models, retriever=None):
+    """Builds a WarmUp from the [Warmup] settings against the Ollama pool; with warm-up disabled it has no steps."""
+    settings = config_handler.get_warmup_settings()
+    if not settings["enabled"]:
+        return WarmUp([])
+    return WarmUp(list(chat_models) + settings["models"], retriever, ollama_pool.get_base_url())
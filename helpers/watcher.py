@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import threading
+
+
+def snapshot(directory, extensions):
+    """Returns {path: [mtime_ns, size]} for the files under the directory with one of the extensions."""
+    files = {}
+    for root, dirs, names in os.walk(directory):
+        for name in names:
+            if os.path.splitext(name)[1].lower() not in extensions:
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files[path] = [stat.st_mtime_ns, stat.st_size]
+    return files
+
+
+def diff_snapshots(old, new):
+    """Returns the paths that were added or modified, and the paths that were removed."""
+    changed = [path for path, state in new.items() if old.get(path) != state]
+    removed = [path for path in old if path not in new]
+    return changed, removed
+
+
+class IndexWatcher:
+    """
+    Keeps the index in sync with a folder by polling it for changes.
+
+    A changed file is re-indexed with `index_fn(path)` (which replaces its old chunks) and a
+    removed or renamed-away file is dropped with `remove_fn(path)`. Files are only processed
+    once they have been quiet for `debounce` seconds, so a file that is still being written
+    is indexed once. The scan state is saved to `state_file`, so a restart only picks up what
+    changed while the watcher was down.
+    """
+
+    def __init__(self, directory, extensions, index_fn, remove_fn, state_file=None,
+                 interval=5.0, debounce=2.0, on_change=None):
+        self.directory = directory
+        self.extensions = tuple(extensions)
+        self.index_fn = index_fn
+        self.remove_fn = remove_fn
+        self.state_file = state_file
+        self.interval = interval
+        self.debounce = debounce
+        self.on_change = on_change
+        self.known = {}
+        self.pending = {}
+        self.metrics = {
+            "indexed_files": 0,
+            "removed_files": 0,
+            "failed_files": 0,
+            "pending_files": 0,
+            "last_lag_seconds": 0.0,
+            "max_lag_seconds": 0.0,
+            "last_scan": None,
+        }
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.load_state()
+
+    def load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        with open(self.state_file, "r") as f:
+            state = json.load(f)
+        self.known = state.get("files", {})
+        self.metrics.update(state.get("metrics", {}))
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"files": self.known, "metrics": self.metrics}, f)
+        os.replace(temp_file, self.state_file)
+
+    def poll_once(self, now=None):
+        """Scans the folder once and processes the changes that have settled. Returns True if the index changed."""
+        real_time = now is None
+        now = time.time() if real_time else now
+        current = snapshot(self.directory, self.extensions)
+        changed, removed = diff_snapshots(self.known, current)
+        for path in changed + removed:
+            state = current.get(path)
+            seen = self.pending.get(path)
+            if seen is None:
+                self.pending[path] = {"first_seen": now, "last_seen": now, "state": state}
+            elif seen["state"] != state:
+                # still being written: wait for it to settle, but keep first_seen so lag covers the wait
+                seen["last_seen"] = now
+                seen["state"] = state
+        for path in set(self.pending) - set(changed) - set(removed):
+            # changed back to what is already indexed
+            del self.pending[path]
+
+        index_changed = False
+        for path, seen in list(self.pending.items()):
+            if now - seen["last_seen"] < self.debounce:
+                continue
+            del self.pending[path]
+            try:
+                if seen["state"] is not None:
+                    self.index_fn(path)
+                    self.known[path] = seen["state"]
+                    self.metrics["indexed_files"] += 1
+                else:
+                    self.remove_fn(path)
+                    self.known.pop(path, None)
+                    self.metrics["removed_files"] += 1
+                index_changed = True
+            except Exception as e:
+                # known is left as it was, so the next scan retries the file
+                print(f"Error updating the index for {path}: {str(e)}")
+                self.metrics["failed_files"] += 1
+                continue
+            # indexing lag: from the scan that noticed the change until the index reflects it
+            lag = (time.time() if real_time else now) - seen["first_seen"]
+            self.metrics["last_lag_seconds"] = round(lag, 3)
+            self.metrics["max_lag_seconds"] = max(self.metrics["max_lag_seconds"], round(lag, 3))
+
+        self.metrics["pending_files"] = len(self.pending)
+        self.metrics["last_scan"] = now
+        if index_changed and self.on_change:
+            self.on_change()
+        if index_changed:
+            self.save_state()
+        return index_changed
+
+    def run(self):
+        """Polls until stop() is called; wake() triggers a scan before the interval ends."""
+        while not self.stopped.is_set():
+            self.poll_once()
+            # poll again soon while changes are waiting out the debounce
+            timeout = min(self.interval, self.debounce) if self.pending else self.interval
+            self.wake.wait(timeout)
+            self.wake.clear()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+
+def start_event_trigger(watcher):
+    """
+    Wakes the watcher on file system events (inotify, FSEvents, ...) instead of waiting for the next poll.
+    """
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+
+    class WakeHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            watcher.wake.set()
+
+    observer = Observer()
+    observer.schedule(WakeHandler(), watcher.directory, recursive=True)
+    observer.start()
+    return observer
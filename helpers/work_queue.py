@@ -0,0 +1,213 @@
+import json
+import time
+import zlib
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    path TEXT PRIMARY KEY,
+    op TEXT NOT NULL,
+    state TEXT NOT NULL,
+    file_state TEXT,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result BLOB,
+    updated_at REAL
+)
+"""
+# pending -> leased -> embedded -> merged; a lease that runs out puts the task back in play,
+# and a task that failed max_attempts times is parked as failed until the next enqueue
+TASK_STATES = ("pending", "leased", "embedded", "merged", "failed")
+
+
+def encode_result(result):
+    return zlib.compress(json.dumps(result).encode("utf-8"))
+
+
+def decode_result(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8")) if blob is not None else None
+
+
+class WorkQueue:
+    """
+    Durable queue of files to index, shared by a coordinator and any number of worker processes.
+
+    Workers claim a file with a lease of `lease_seconds` and keep it alive with heartbeats. A
+    worker that dies lets its lease run out, after which another worker picks the file up; a
+    file that fails `max_attempts` times is marked failed. A result is only accepted from the
+    worker that still holds the lease, so a file is never merged twice. The queue lives in one
+    SQLite file in WAL mode, so every process opens its own WorkQueue on the same path.
+    """
+
+    def __init__(self, path, lease_seconds=300.0, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.connection.close()
+
+    def transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front, so two claims never pick the same task."""
+        return _Transaction(self)
+
+    def enqueue(self, files):
+        """
+        Adds {path: file_state} to the queue and returns how many files need indexing.
+
+        Files already merged (or in flight) with the same state are left alone; new, changed
+        and previously failed files are (re)queued. Queued files that are not in `files` any
+        more get a delete task for the merge step.
+        """
+        now = time.time()
+        queued = 0
+        with self.transaction() as cursor:
+            known = {row[0]: row[1:] for row in cursor.execute("SELECT path, op, state, file_state FROM tasks")}
+            for path, state in files.items():
+                file_state = json.dumps(state)
+                op, task_state, known_file_state = known.get(path, (None, None, None))
+                if op == "index" and known_file_state == file_state and task_state != "failed":
+                    continue
+                cursor.execute("INSERT OR REPLACE INTO tasks (path, op, state, file_state, attempts, updated_at) "
+                               "VALUES (?, 'index', 'pending', ?, 0, ?)", (path, file_state, now))
+                queued += 1
+            for path, (op, state, file_state) in known.items():
+                if path not in files and not (op == "delete" and state == "merged"):
+                    # nothing to compute: the merge step drops the file's chunks
+                    cursor.execute("UPDATE tasks SET op = 'delete', state = 'embedded', worker = NULL, result = NULL, "
+                                   "updated_at = ? WHERE path = ?", (now, path))
+        return queued
+
+    def claim(self, worker):
+        """Leases the next pending (or abandoned) file to the worker; returns its path or None."""
+        now = time.time()
+        with self.transaction() as cursor:
+            while True:
+                row = cursor.execute(
+                    "SELECT path, attempts FROM tasks WHERE op = 'index' AND "
+                    "(state = 'pending' OR (state = 'leased' AND lease_until < ?)) ORDER BY updated_at, path LIMIT 1",
+                    (now,)).fetchone()
+                if row is None:
+                    return None
+                path, attempts = row
+                if attempts < self.max_attempts:
+                    break
+                # its last worker died holding the lease
+                cursor.execute("UPDATE tasks SET state = 'failed', error = 'lease expired', worker = NULL, "
+                               "updated_at = ? WHERE path = ?", (now, path))
+            cursor.execute("UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                           "updated_at = ? WHERE path = ?", (worker, now + self.lease_seconds, now, path))
+            return path
+
+    def heartbeat(self, worker, path):
+        """Extends the worker's lease; returns False if the lease was lost to another worker."""
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE tasks SET lease_until = ? WHERE path = ? AND state = 'leased' AND worker = ?",
+                           (time.time() + self.lease_seconds, path, worker))
+            return cursor.rowcount == 1
+
+    def complete(self, worker, path, result):
+        """Stores the worker's result for the merge step; returns False if the worker no longer holds the lease."""
+        blob = encode_result(result)
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE tasks SET state = 'embedded', result = ?, error = NULL, updated_at = ? "
+                           "WHERE path = ? AND state = 'leased' AND worker = ?", (blob, time.time(), path, worker))
+            return cursor.rowcount == 1
+
+    def fail(self, worker, path, error):
+        """Gives the file back for a retry, or marks it failed after max_attempts."""
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                           "worker = NULL, error = ?, updated_at = ? WHERE path = ? AND state = 'leased' AND worker = ?",
+                           (self.max_attempts, str(error), time.time(), path, worker))
+            return cursor.rowcount == 1
+
+    def results(self, limit=16):
+        """Returns up to `limit` [(path, op, result)] ready for the merge step."""
+        with self._lock:
+            rows = self.connection.execute("SELECT path, op, result FROM tasks WHERE state = 'embedded' "
+                                           "ORDER BY updated_at LIMIT ?", (limit,)).fetchall()
+        return [(path, op, decode_result(blob)) for path, op, blob in rows]
+
+    def mark_merged(self, path):
+        with self.transaction() as cursor:
+            # the result is in the vector store now, so it is not kept twice
+            cursor.execute("UPDATE tasks SET state = 'merged', result = NULL, updated_at = ? "
+                           "WHERE path = ? AND state = 'embedded'", (time.time(), path))
+
+    def counts(self):
+        with self._lock:
+            rows = self.connection.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        return {**dict.fromkeys(TASK_STATES, 0), **dict(rows)}
+
+    def has_open_tasks(self):
+        """True while files are waiting for or being processed by a worker."""
+        counts = self.counts()
+        return counts["pending"] + counts["leased"] > 0
+
+    def failures(self):
+        with self._lock:
+            return dict(self.connection.execute("SELECT path, error FROM tasks WHERE state = 'failed'").fetchall())
+
+
+class _Transaction:
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __enter__(self):
+        self.queue._lock.acquire()
+        self.cursor = self.queue.connection.cursor()
+        self.cursor.execute("BEGIN IMMEDIATE")
+        return self.cursor
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            self.cursor.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.queue._lock.release()
+
+
+def run_worker(queue, worker, process_fn, poll_interval=1.0, stop=None):
+    """
+    Claims files from the queue and stores process_fn(path) for each, until no file is waiting
+    or being worked on any more (or `stop` is set). The lease is renewed in the background while
+    a file is processed. Returns the number of files this worker completed.
+    """
+    stop = stop or threading.Event()
+    completed = 0
+    while not stop.is_set():
+        path = queue.claim(worker)
+        if path is None:
+            if not queue.has_open_tasks():
+                break
+            # other workers hold the remaining leases; wait in case one of them dies
+            stop.wait(poll_interval)
+            continue
+        done = threading.Event()
+
+        def renew_lease(path=path, done=done):
+            while not done.wait(queue.lease_seconds / 3):
+                if not queue.heartbeat(worker, path):
+                    return
+
+        threading.Thread(target=renew_lease, name="lease-heartbeat", daemon=True).start()
+        try:
+            result = process_fn(path)
+        except Exception as e:
+            print(f"Worker {worker} failed on {path}: {str(e)}")
+            queue.fail(worker, path, e)
+            continue
+        finally:
+            done.set()
+        if queue.complete(worker, path, result):
+            completed += 1
+        else:
+            print(f"Worker {worker} lost the lease on {path}; its result was dropped")
+    return completed
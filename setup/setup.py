@@ -5,19 +5,23 @@ Setup script for GenAI Apps - Creates vector database by indexing documents.
 This script:
 1. Loads configuration from config/dev.ini
 2. Validates required directories and files exist
-3. Calls the indexer to create the vector database
-4. Provides detailed logging and error handling
+3. Calls the indexer to create the vector database, resuming an interrupted build
+4. Warms up the chat and embedding models
+5. Provides detailed logging and error handling
+
+Run with --non-interactive to resume or rebuild without prompting (for provisioning jobs).
 """
 
 import os
 import sys
 import logging
+import argparse
 from datetime import datetime
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from helpers import config_handler, indexer
+from helpers import config_handler, indexer, warmup, ollama_pool
 
 def setup_logging():
     """Setup logging for the setup process."""
@@ -82,8 +86,15 @@ def validate_prerequisites(logger):
         logger.error(f"✗ Prerequisite validation failed: {str(e)}")
         return False
 
-def check_existing_database(logger):
-    """Check if vector database already exists."""
+def check_existing_database(logger, non_interactive=False):
+    """
+    Check if vector database already exists and decide how to build it.
+
+    Returns "resume" to continue an interrupted build (or index only new and changed files),
+    "rebuild" to recreate the database from scratch, or None to keep the existing database.
+    Without prompting, a build is resumed when its checkpoint matches the current settings
+    and rebuilt otherwise.
+    """
     try:
         db_path = config_handler.get_db_path()
         
@@ -97,34 +108,57 @@ def check_existing_database(logger):
         
         existing_files = [f for f in chroma_files if os.path.exists(f)]
         
-        if existing_files:
-            logger.warning(f"⚠ Existing database files found:")
-            for file in existing_files:
-                logger.warning(f"  - {file}")
-            
-            response = input("Database already exists. Do you want to recreate it? (y/N): ").strip().lower()
-            if response in ['y', 'yes']:
+        if not existing_files:
+            logger.info("✓ No existing database found, proceeding with creation")
+            return "rebuild"
+
+        logger.warning(f"⚠ Existing database files found:")
+        for file in existing_files:
+            logger.warning(f"  - {file}")
+
+        status = indexer.build_status()
+        if status["resumable"]:
+            logger.info(f"Build checkpoint: {status['files_done']} files and {status['chunks']} chunks indexed, "
+                        f"{'completed' if status['completed'] else 'interrupted'}")
+        if non_interactive:
+            mode = "resume" if status["resumable"] else "rebuild"
+            logger.info(f"Non-interactive mode: {'resuming the build' if mode == 'resume' else 'recreating the database'}")
+            return mode
+
+        if status["resumable"] and not status["completed"]:
+            response = input("A previous build was interrupted. Resume it, rebuild from scratch or cancel? (R/b/c): ").strip().lower()
+            if response in ['', 'r', 'resume']:
+                logger.info("User chose to resume the build")
+                return "resume"
+            if response in ['b', 'rebuild']:
                 logger.info("User chose to recreate the database")
-                return True
-            else:
-                logger.info("User chose to keep existing database")
-                return False
+                return "rebuild"
+            logger.info("User chose to keep existing database")
+            return None
+
+        response = input("Database already exists. Do you want to recreate it? (y/N): ").strip().lower()
+        if response in ['y', 'yes']:
+            logger.info("User chose to recreate the database")
+            return "rebuild"
         else:
-            logger.info("✓ No existing database found, proceeding with creation")
-            return True
+            logger.info("User chose to keep existing database")
+            return None
             
     except Exception as e:
         logger.error(f"Error checking existing database: {str(e)}")
-        return True  # Proceed anyway
+        return "resume"  # Proceed anyway; unchanged files of a matching checkpoint are skipped
 
-def create_vector_database(logger):
-    """Create the vector database using the indexer."""
+def create_vector_database(logger, rebuild=True):
+    """Create the vector database using the indexer, checkpointing so an interrupted build can resume."""
     try:
         logger.info("Starting vector database creation...")
         logger.info("This may take several minutes depending on the number of documents...")
+        logger.info("Progress is checkpointed: if the build stops, run the setup again to resume it")
         
+        # A bulk build yields to chat requests served by the same Ollama
+        ollama_pool.set_default_priority("indexing")
         # Call the indexer to create the vector database
-        vector_store = indexer.index_files(config_handler)
+        vector_store = indexer.build_index(rebuild=rebuild, report=logger.info)
         
         if vector_store:
             logger.info("✓ Vector database created successfully!")
@@ -148,6 +182,9 @@ def create_vector_database(logger):
             logger.error("✗ Failed to create vector database")
             return False
             
+    except KeyboardInterrupt:
+        logger.warning("⚠ Build interrupted; progress up to the last batch is saved, run the setup again to resume")
+        return False
     except Exception as e:
         logger.error(f"✗ Error creating vector database: {str(e)}")
         logger.error("This might be due to:")
@@ -155,10 +192,36 @@ def create_vector_database(logger):
         logger.error("  - Embedding model not available (install with: ollama pull mxbai-embed-large)")
         logger.error("  - Network connectivity issues")
         logger.error("  - Insufficient disk space")
+        logger.error("Indexed files are checkpointed, so running the setup again resumes the build")
+        return False
+
+def warm_up_models(logger):
+    """Preload the chat and embedding models and probe the new index, so the first query is not cold."""
+    try:
+        logger.info("Warming up models...")
+        retriever = indexer.setup_retriever(
+            persistent_directory=config_handler.get_db_path(),
+            embedding_model=config_handler.get_embedding_model()
+        )
+        warm_up = warmup.setup_warmup([config_handler.get_model()], retriever)
+        warm_up.run()
+        for step, result in warm_up.report.items():
+            if result["ok"]:
+                logger.info(f"✓ {step} ready in {result['seconds']}s")
+            else:
+                logger.warning(f"⚠ {step} failed: {result['error']}")
+        return warm_up.ok
+
+    except Exception as e:
+        logger.warning(f"⚠ Warm-up failed: {str(e)}")
         return False
 
 def main():
     """Main setup function."""
+    parser = argparse.ArgumentParser(description="Create the vector database by indexing the data folder.")
+    parser.add_argument("--non-interactive", action="store_true",
+                        help="Do not prompt: resume a matching build checkpoint, otherwise rebuild")
+    args = parser.parse_args()
     logger = setup_logging()
     
     print("=" * 60)
@@ -175,12 +238,15 @@ def main():
         sys.exit(1)
     
     # Step 2: Check for existing database
-    if not check_existing_database(logger):
+    mode = check_existing_database(logger, non_interactive=args.non_interactive)
+    if mode is None:
         logger.info("Setup cancelled by user")
         sys.exit(0)
     
     # Step 3: Create vector database
-    if create_vector_database(logger):
+    if create_vector_database(logger, rebuild=mode == "rebuild"):
+        # Step 4: Warm up models (a failure here does not fail the setup)
+        warm_up_models(logger)
         print()
         print("=" * 60)
         print("✓ SETUP COMPLETED SUCCESSFULLY!")
@@ -0,0 +1,106 @@
+import unittest
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import agent_pool
+
+
+class FakeAgent:
+    def __init__(self, settings, messages):
+        self.settings = settings
+        self.messages = messages if messages is not None else []
+        self.closed = False
+
+    def __call__(self, query):
+        self.messages.append({"role": "user", "content": [{"text": query}]})
+        self.messages.append({"role": "assistant", "content": [{"text": f"answer to {query}"}]})
+        return f"answer to {query}"
+
+
+class TestAgentPool(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.built = []
+
+        def factory(settings, messages):
+            agent = FakeAgent(settings, messages)
+            self.built.append(agent)
+            return agent
+
+        def close(agent):
+            agent.closed = True
+
+        self.pool = agent_pool.AgentPool(factory, max_agents=2, ttl=60, close_fn=close)
+
+    def test_reuses_agent_across_turns(self):
+        """Test that a session's agent is built once and keeps its conversation between turns."""
+        for i in range(3):
+            self.pool.get("s1", ("llama3.2", 2))(f"question {i}")
+        self.assertEqual(len(self.built), 1)
+        self.assertEqual(len(self.built[0].messages), 6)
+        stats = self.pool.stats()
+        self.assertEqual((stats["builds"], stats["reuses"]), (1, 2))
+        self.assertEqual(stats["per_agent"][0]["turns"], 3)
+
+    def test_changed_settings_rebuild_with_conversation(self):
+        """Test that new settings build a new agent that carries the old conversation."""
+        self.pool.get("s1", ("llama3.2", 2))("hello")
+        agent = self.pool.get("s1", ("gemma3:4b", 2))
+        self.assertEqual(len(self.built), 2)
+        self.assertEqual(agent.settings, ("gemma3:4b", 2))
+        self.assertEqual(len(agent.messages), 2)
+        self.assertTrue(self.built[0].closed)
+
+    def test_evicts_least_recently_used(self):
+        """Test that the pool keeps at most max_agents, evicting the least recently used."""
+        first = self.pool.get("s1", "settings")
+        self.pool.get("s2", "settings")
+        self.pool.get("s1", "settings")
+        self.pool.get("s3", "settings")
+        self.assertEqual(set(self.pool.entries), {"s1", "s3"})
+        self.assertFalse(first.closed)
+        self.assertTrue(self.built[1].closed)
+
+    def test_idle_agents_expire(self):
+        """Test that an agent idle for longer than ttl is dropped and rebuilt on the next turn."""
+        first = self.pool.get("s1", "settings")
+        self.pool.entries["s1"]["last_used"] = time.time() - 120
+        self.assertEqual(self.pool.stats()["agents"], 0)
+        self.assertTrue(first.closed)
+        self.assertIsNot(self.pool.get("s1", "settings"), first)
+
+    def test_reports_memory_per_agent(self):
+        """Test that stats report the conversation bytes of each agent."""
+        self.pool.get("s1", "settings")("a fairly long question about the weather")
+        self.pool.get("s2", "settings")
+        stats = {agent["session_id"]: agent for agent in self.pool.stats()["per_agent"]}
+        self.assertEqual(stats["s1"]["bytes"], agent_pool.message_bytes(self.built[0]))
+        self.assertGreater(stats["s1"]["bytes"], stats["s2"]["bytes"])
+        self.assertEqual(stats["s1"]["messages"], 2)
+
+    def test_discard(self):
+        """Test that discarding a session closes its agent."""
+        agent = self.pool.get("s1", "settings")
+        self.pool.discard("s1")
+        self.assertTrue(agent.closed)
+        self.assertEqual(self.pool.stats()["agents"], 0)
+
+
+    def test_rebuild_keeps_settings_and_given_conversation(self):
+        """Test that rebuilding replaces a busy agent with a new one holding the given messages."""
+        busy = self.pool.get("s1", "settings")
+        busy("first")
+        history = list(busy.messages)
+        busy("abandoned")
+        agent = self.pool.rebuild("s1", history)
+        self.assertIsNot(agent, busy)
+        self.assertTrue(busy.closed)
+        self.assertEqual((agent.settings, agent.messages), ("settings", history))
+        self.assertIs(self.pool.get("s1", "settings"), agent)
+        self.assertIsNone(self.pool.rebuild("unknown", []))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import agent_stream
+
+
+async def replay(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def collect(make_stream):
+    return list(agent_stream.iter_events(make_stream))
+
+
+class TestLangGraphEvents(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        tool_call = SimpleNamespace(type="ai", content="", tool_calls=[{"id": "c1", "name": "add", "args": {"a": 1}}])
+        tool_result = SimpleNamespace(type="tool", content="2", tool_call_id="c1", name="add")
+        answer = SimpleNamespace(type="ai", content="It is 2.", tool_calls=[])
+        self.stream = [
+            ("updates", {"agent": {"messages": [tool_call]}}),
+            ("messages", (tool_result, {})),
+            ("updates", {"tools": {"messages": [tool_result]}}),
+            ("messages", (SimpleNamespace(type="AIMessageChunk", content="It is"), {})),
+            ("messages", (SimpleNamespace(type="AIMessageChunk", content=" 2."), {})),
+            ("updates", {"agent": {"messages": [answer]}}),
+        ]
+
+    def test_tokens_tools_and_final(self):
+        """Test that chunks become tokens, tool calls and results become tool events, and the last message is final."""
+        events = collect(lambda: agent_stream.langgraph_events(replay(self.stream)))
+        self.assertEqual([event["type"] for event in events],
+                         ["tool_start", "tool_end", "token", "token", "final"])
+        self.assertEqual(events[0]["name"], "add")
+        self.assertEqual(events[1], {"type": "tool_end", "id": "c1", "name": "add", "output": "2"})
+        self.assertEqual("".join(event["text"] for event in events if event["type"] == "token"), "It is 2.")
+        self.assertEqual(events[-1]["text"], "It is 2.")
+
+
+class TestStrandsEvents(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.stream = [
+            {"data": "Let me check. "},
+            {"current_tool_use": {"toolUseId": "t1", "name": "calculator", "input": "{\"expr"}},
+            {"message": {"role": "assistant", "content": [
+                {"text": "Let me check. "},
+                {"toolUse": {"toolUseId": "t1", "name": "calculator", "input": {"expression": "6*7"}}}]}},
+            {"message": {"role": "user", "content": [
+                {"toolResult": {"toolUseId": "t1", "status": "success", "content": [{"text": "42"}]}}]}},
+            {"data": "42"},
+            {"data": ""},
+            {"result": "42"},
+        ]
+
+    def test_tokens_tools_and_final(self):
+        """Test that text deltas, tool uses, tool results and the result map onto the common events."""
+        events = collect(lambda: agent_stream.strands_events(replay(self.stream)))
+        self.assertEqual([event["type"] for event in events], ["token", "tool_start", "tool_end", "token", "final"])
+        self.assertEqual(events[1]["input"], "{'expression': '6*7'}")
+        self.assertEqual(events[2]["name"], "calculator")
+        self.assertEqual(events[2]["output"], "42")
+        self.assertEqual(events[-1], {"type": "final", "text": "42"})
+
+
+class TestIterEvents(unittest.TestCase):
+
+    def test_items_arrive_before_the_stream_ends(self):
+        """Test that the first item is yielded as soon as it is produced, not when the stream finishes."""
+        start = time.perf_counter()
+        events = agent_stream.iter_events(lambda: replay(["first", "second", "third"], delay=0.2))
+        self.assertEqual(next(events), "first")
+        first = time.perf_counter() - start
+        self.assertEqual(list(events), ["second", "third"])
+        self.assertLess(first, 0.45)
+        self.assertGreater(time.perf_counter() - start, 0.55)
+
+    def test_errors_are_raised_to_the_consumer(self):
+        """Test that an exception in the stream is raised by the iterator after the items before it."""
+        async def failing():
+            yield "partial"
+            raise ConnectionError("ollama down")
+
+        events = agent_stream.iter_events(failing)
+        self.assertEqual(next(events), "partial")
+        with self.assertRaises(ConnectionError):
+            next(events)
+
+    def test_timer_records_first_token(self):
+        """Test that the timer reports the time to first token separately from the answer time."""
+        timer = agent_stream.StreamTimer()
+        timer.observe({"type": "tool_start", "name": "add"})
+        self.assertIsNone(timer.first_token)
+        timer.observe({"type": "token", "text": "a"})
+        timer.observe({"type": "final", "text": "a"})
+        self.assertLessEqual(timer.first_token, timer.end)
+        self.assertIn("first token", timer.summary())
+
+    def test_stopped_is_set_once_the_thread_is_done(self):
+        """Test that the stopped event tells whether a closed stream's thread has finished."""
+        stopped = threading.Event()
+        events = agent_stream.iter_events(lambda: replay(["a", "b", "c"], delay=0.05), stopped=stopped)
+        self.assertEqual(next(events), "a")
+        events.close()
+        self.assertTrue(stopped.is_set())
+
+        async def stubborn():
+            yield "a"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                # a tool that ignores cancellation for a while
+                await asyncio.sleep(0.5)
+
+        stopped = threading.Event()
+        events = agent_stream.iter_events(stubborn, join_timeout=0.05, stopped=stopped)
+        next(events)
+        events.close()
+        self.assertFalse(stopped.is_set())
+        self.assertTrue(stopped.wait(2))
+
+
+class FakeBox:
+    """Stands in for a Streamlit container: records what was written to it."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+
+class TestAnswerView(unittest.TestCase):
+
+    def test_renders_tools_and_answer(self):
+        """Test that tool events go to the status box, tokens to the answer and text before a tool call is dropped."""
+        status, container = FakeBox(), FakeBox()
+        view = agent_stream.AnswerView(status, container)
+        events = [{"type": "token", "text": "Let me check"},
+                  {"type": "tool_start", "id": "1", "name": "add", "input": "{}"},
+                  {"type": "tool_end", "id": "1", "name": "add", "output": "5"},
+                  {"type": "token", "text": "It is "}, {"type": "token", "text": "5"}]
+        self.assertEqual([view(event) for event in events], [True, False, False, True, True])
+        self.assertEqual(view.answer, "It is 5")
+        view.finish()
+        self.assertEqual(container.calls[-1], ("markdown", ("It is 5",), {}))
+        self.assertEqual(status.calls[-1][2]["state"], "complete")
+        self.assertEqual([name for name, args, kwargs in status.calls].count("write"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
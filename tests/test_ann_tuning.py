@@ -0,0 +1,77 @@
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from helpers import ann_tuning, config_handler
+
+
+class TestAnnTuning(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        rng = np.random.default_rng(3)
+        centers = rng.normal(size=(20, 16))
+        self.vectors = (centers[rng.integers(0, 20, 3000)] + rng.normal(scale=0.5, size=(3000, 16))).astype("float32")
+        self.queries = rng.normal(size=(20, 16)).astype("float32")
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_exact_top_k_matches_brute_force(self):
+        """Test the batched ground truth against a plain per-query ranking for each space."""
+        normalized = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        for space in ann_tuning.SPACES:
+            truth = ann_tuning.exact_top_k(self.vectors, self.queries, 5, space, batch_size=7)
+            for query, row in zip(self.queries, truth):
+                if space == "l2":
+                    distances = ((self.vectors - query) ** 2).sum(axis=1)
+                elif space == "cosine":
+                    distances = 1 - normalized @ (query / np.linalg.norm(query))
+                else:
+                    distances = 1 - self.vectors @ query
+                self.assertEqual(row.tolist(), np.argsort(distances, kind="stable")[:5].tolist())
+
+    def test_sweep_reports_recall_and_latency(self):
+        """Test that a larger ef_search recovers recall a sparse graph loses, against exact search."""
+        rows = ann_tuning.sweep(self.vectors, self.queries, k=10, m_values=(4,), construction_efs=(16,),
+                                search_efs=(10, 200))
+        self.assertEqual([row["search_ef"] for row in rows], [10, 200])
+        self.assertGreater(rows[1]["recall"], rows[0]["recall"])
+        self.assertGreater(rows[1]["recall"], 0.7)
+        self.assertTrue(all(row["p99_ms"] >= row["p50_ms"] > 0 for row in rows))
+
+    def test_choose(self):
+        """Test that the fastest combination reaching the target is chosen, else the best recall."""
+        rows = [{"recall": 0.99, "p99_ms": 3.0, "index_mb": 2.0}, {"recall": 0.96, "p99_ms": 1.0, "index_mb": 2.0},
+                {"recall": 0.80, "p99_ms": 0.5, "index_mb": 1.0}]
+        self.assertIs(ann_tuning.choose(rows, 0.95), rows[1])
+        self.assertIs(ann_tuning.choose(rows, 0.995), rows[0])
+
+    def test_load_vectors_reads_every_shard(self):
+        """Test that the vectors of all shard collections are read back."""
+        import chromadb
+        client = chromadb.PersistentClient(path=self.temp_dir.name)
+        for name, vectors in (("shard_a", self.vectors[:10]), ("shard_b", self.vectors[10:25])):
+            client.create_collection(name).add(ids=[f"{name}-{i}" for i in range(len(vectors))], embeddings=vectors)
+        loaded = ann_tuning.load_vectors(self.temp_dir.name)
+        self.assertEqual(loaded.shape, (25, 16))
+        self.assertEqual(ann_tuning.load_vectors(self.temp_dir.name, max_vectors=8).shape, (8, 16))
+
+    def test_write_choice(self):
+        """Test that the chosen parameters are written to [Index] and read back for collection creation."""
+        config_file = os.path.join(self.temp_dir.name, "dev.ini")
+        shutil.copy(config_handler.CONFIG_FILE_PATH, config_file)
+        ann_tuning.write_choice({"space": "cosine", "M": 32, "construction_ef": 200, "search_ef": 50}, config_file)
+        self.assertEqual(config_handler.get_hnsw_settings(config_file),
+                         {"space": "cosine", "M": 32, "construction_ef": 200, "search_ef": 50})
+        with open(config_file) as f:
+            self.assertIn("hnsw_m = 32  ; HNSW neighbours per node", f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers.answer_cache import SemanticAnswerCache, normalize
+
+
+class FakeEmbeddings:
+    """Embeds a text as its counts of the letters a, b and c."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [text.count('a') + 0.01, text.count('b'), text.count('c')]
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.embeddings = FakeEmbeddings()
+        self.index_version = "1"
+        self.cache = SemanticAnswerCache(self.embeddings,
+                                         index_version_fn=lambda: self.index_version,
+                                         similarity_threshold=0.95,
+                                         max_entries=2,
+                                         ttl=60)
+
+    def test_normalize(self):
+        """Test vector normalization to unit length."""
+        self.assertEqual(normalize([3, 4]), [0.6, 0.8])
+        self.assertEqual(normalize([0, 0]), [0, 0])
+
+    def test_lookup_miss_on_empty_cache(self):
+        """Test lookup on an empty cache."""
+        self.assertIsNone(self.cache.lookup("aaa", "llama3.2"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_lookup_hit_for_similar_question(self):
+        """Test that a similar question returns the stored answer and sources."""
+        self.cache.store("aab", "llama3.2", "answer", ["doc"])
+        result = self.cache.lookup("aaaabb", "llama3.2")
+        self.assertEqual(result["answer"], "answer")
+        self.assertEqual(result["sources"], ["doc"])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_lookup_miss_below_threshold(self):
+        """Test that a dissimilar question is a miss."""
+        self.cache.store("aaa", "llama3.2", "answer", [])
+        self.assertIsNone(self.cache.lookup("ccc", "llama3.2"))
+
+    def test_lookup_is_keyed_by_model(self):
+        """Test that answers from another model are not returned."""
+        self.cache.store("aaa", "llama3.2", "answer", [])
+        self.assertIsNone(self.cache.lookup("aaa", "gemma3:4b"))
+
+    def test_index_version_change_invalidates(self):
+        """Test that a new index version drops all cached answers."""
+        self.cache.store("aaa", "llama3.2", "answer", [])
+        self.index_version = "2"
+        self.assertIsNone(self.cache.lookup("aaa", "llama3.2"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        self.cache.store("aaa", "llama3.2", "a", [])
+        self.cache.store("bbb", "llama3.2", "b", [])
+        self.cache.lookup("aaa", "llama3.2")
+        self.cache.store("ccc", "llama3.2", "c", [])
+        self.assertIsNotNone(self.cache.lookup("aaa", "llama3.2"))
+        self.assertIsNone(self.cache.lookup("bbb", "llama3.2"))
+
+    def test_ttl_expiry(self):
+        """Test that entries expire after the ttl."""
+        with patch('helpers.answer_cache.time.time', return_value=1000):
+            self.cache.store("aaa", "llama3.2", "answer", [])
+        with patch('helpers.answer_cache.time.time', return_value=1061):
+            self.assertIsNone(self.cache.lookup("aaa", "llama3.2"))
+
+    def test_store_after_miss_reuses_embedding(self):
+        """Test that storing the question of a miss does not embed it again."""
+        self.cache.lookup("aaa", "llama3.2")
+        self.cache.store("aaa", "llama3.2", "answer", [])
+        self.assertEqual(self.embeddings.calls, 1)
+
+    def test_store_skips_empty_answer(self):
+        """Test that empty answers are not cached."""
+        self.cache.store("aaa", "llama3.2", "", [])
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
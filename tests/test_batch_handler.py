@@ -0,0 +1,106 @@
+import unittest
+import tempfile
+import json
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import batch_handler
+
+
+class TestBatchHandler(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_path = os.path.join(self.temp_dir.name, "results.jsonl")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_file(self, name, content):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def read_results(self):
+        results = []
+        with open(self.output_path) as f:
+            for line in f:
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+        return results
+
+    def test_read_questions_text(self):
+        """Test reading one question per line, skipping blank lines."""
+        path = self.write_file("questions.txt", "What is PAM?\n\nWhat is DLP?\n")
+        self.assertEqual(batch_handler.read_questions(path), ["What is PAM?", "What is DLP?"])
+
+    def test_read_questions_jsonl(self):
+        """Test reading questions from the default JSONL fields."""
+        path = self.write_file("questions.jsonl", '{"title": "First"}\n{"question": "Second", "title": "x"}\n')
+        self.assertEqual(batch_handler.read_questions(path), ["First", "Second"])
+
+    def test_read_questions_jsonl_missing_field(self):
+        """Test JSONL records without a question field."""
+        path = self.write_file("questions.jsonl", '{"body": "no question"}\n')
+        with self.assertRaises(ValueError):
+            batch_handler.read_questions(path)
+
+    def test_read_questions_missing_file(self):
+        """Test reading a file that does not exist."""
+        with self.assertRaises(FileNotFoundError):
+            batch_handler.read_questions(os.path.join(self.temp_dir.name, "missing.txt"))
+
+    def test_deduplicate(self):
+        """Test that identical questions, ignoring whitespace, are answered once."""
+        unique, duplicates = batch_handler.deduplicate(["a  b", "a b", "c", "a b "])
+        self.assertEqual(unique, ["a b", "c"])
+        self.assertEqual(duplicates, 2)
+
+    def test_run_batch_writes_results(self):
+        """Test that every unique question gets a result line with its latency."""
+        summary = batch_handler.run_batch(lambda q: (q.upper(), ["doc"]), ["a", "b", "a"], self.output_path)
+        results = {r["question"]: r for r in self.read_results()}
+        self.assertEqual(results["a"]["answer"], "A")
+        self.assertIn("latency", results["b"])
+        self.assertEqual(summary["answered"], 2)
+        self.assertEqual(summary["duplicates"], 1)
+
+    def test_run_batch_resumes(self):
+        """Test that answered questions are skipped and failed ones retried on resume."""
+        self.write_file("results.jsonl",
+                        '{"question": "a", "answer": "A", "error": null}\n'
+                        '{"question": "b", "answer": null, "error": "timeout"}\n'
+                        '{"question": "c", "ans')
+        asked = []
+
+        def answer(question):
+            asked.append(question)
+            return question.upper(), []
+
+        summary = batch_handler.run_batch(answer, ["a", "b", "c"], self.output_path)
+        self.assertEqual(sorted(asked), ["b", "c"])
+        self.assertEqual(summary["resumed"], 1)
+        self.assertEqual(len(self.read_results()), 4)
+
+    def test_run_batch_records_errors(self):
+        """Test that a failing question is recorded and counted."""
+        def answer(question):
+            raise RuntimeError("ollama is down")
+
+        summary = batch_handler.run_batch(answer, ["a"], self.output_path)
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(self.read_results()[0]["error"], "ollama is down")
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        self.assertEqual(batch_handler.percentile([], 0.5), 0.0)
+        self.assertEqual(batch_handler.percentile([3, 1, 2], 0.5), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import tempfile
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import build_checkpoint
+
+
+class TestBuildCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, build_checkpoint.CHECKPOINT_FILE)
+        self.fingerprint = {"embedding_model": "mxbai-embed-large", "split": {"chunk_size": 512}}
+        self.data_file = os.path.join(self.temp_dir.name, "a.md")
+        with open(self.data_file, "w") as f:
+            f.write("hello")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_resume_after_restart(self):
+        """Test that finished files and stored batches survive a restart."""
+        state = build_checkpoint.file_state(self.data_file)
+        checkpoint = build_checkpoint.BuildCheckpoint(self.path, self.fingerprint)
+        self.assertFalse(checkpoint.load())
+        checkpoint.record_file("/docs/done.md", [1, 2], 7)
+        checkpoint.record_batch(self.data_file, state, 3, 192)
+
+        restarted = build_checkpoint.BuildCheckpoint(self.path, self.fingerprint)
+        self.assertTrue(restarted.load())
+        self.assertTrue(restarted.is_done("/docs/done.md", [1, 2]))
+        self.assertFalse(restarted.is_done(self.data_file, state))
+        self.assertEqual(restarted.batches_done(self.data_file, state), 3)
+        self.assertEqual(restarted.sources(), ["/docs/done.md", self.data_file])
+        self.assertEqual(restarted.summary(), {"files_done": 1, "files_partial": 1, "chunks": 7, "completed": False})
+
+    def test_changed_file_starts_over(self):
+        """Test that a file modified since it was checkpointed is indexed again from its first batch."""
+        checkpoint = build_checkpoint.BuildCheckpoint(self.path, self.fingerprint)
+        checkpoint.record_file("/docs/done.md", [1, 2], 7)
+        checkpoint.record_batch(self.data_file, [1, 5], 3, 192)
+        self.assertFalse(checkpoint.is_done("/docs/done.md", [1, 3]))
+        self.assertEqual(checkpoint.batches_done(self.data_file, [2, 5]), 0)
+
+    def test_other_settings_do_not_resume(self):
+        """Test that a checkpoint written with other settings is ignored."""
+        checkpoint = build_checkpoint.BuildCheckpoint(self.path, self.fingerprint)
+        checkpoint.record_file("/docs/done.md", [1, 2], 7)
+        other = build_checkpoint.BuildCheckpoint(self.path, {**self.fingerprint, "embedding_model": "nomic-embed-text"})
+        self.assertFalse(other.load())
+        self.assertEqual(other.files, {})
+
+    def test_file_completion_clears_partial_state(self):
+        """Test that finishing a file drops its batch progress and that reset removes the checkpoint."""
+        checkpoint = build_checkpoint.BuildCheckpoint(self.path, self.fingerprint)
+        checkpoint.record_batch(self.data_file, [1, 5], 1, 64)
+        checkpoint.record_file(self.data_file, [1, 5], 100)
+        checkpoint.complete()
+        self.assertEqual(checkpoint.partial, {})
+        self.assertTrue(checkpoint.summary()["completed"])
+        checkpoint.forget(self.data_file)
+        self.assertEqual(checkpoint.sources(), [])
+        checkpoint.reset()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_corrupt_checkpoint(self):
+        """Test that an unreadable checkpoint is treated as missing."""
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        self.assertFalse(build_checkpoint.BuildCheckpoint(self.path, self.fingerprint).load())
+
+
+class TestBuildProgress(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.progress = build_checkpoint.BuildProgress(total_files=10, done_files=4)
+
+    def test_rates_and_eta(self):
+        """Test that rates count this run only and the ETA covers the files left."""
+        self.progress.start = time.perf_counter() - 2
+        self.progress.update(files=2, chunks=100)
+        stats = self.progress.stats()
+        self.assertEqual(stats["files"], 6)
+        self.assertAlmostEqual(stats["files_per_second"], 1.0, places=1)
+        self.assertAlmostEqual(stats["chunks_per_second"], 50.0, delta=1.0)
+        self.assertEqual(stats["eta_seconds"], 4)
+        self.assertIn("6/10 files", self.progress.line())
+
+    def test_unknown_eta(self):
+        """Test that the ETA is unknown before the first file finishes."""
+        self.assertIsNone(self.progress.stats()["eta_seconds"])
+        self.assertIn("ETA unknown", self.progress.line())
+
+
+if __name__ == '__main__':
+    unittest.main()
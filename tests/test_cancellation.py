@@ -0,0 +1,215 @@
+import unittest
+import asyncio
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import cancellation, agent_stream
+
+
+class SlowStream:
+    """Stands in for a model stream: yields a token every `delay` seconds and records if it was closed."""
+
+    def __init__(self, count=100, delay=0.01):
+        self.count = count
+        self.delay = delay
+        self.produced = 0
+        self.closed = False
+
+    async def __call__(self):
+        try:
+            for i in range(self.count):
+                await asyncio.sleep(self.delay)
+                self.produced += 1
+                yield f"t{i} "
+        finally:
+            self.closed = True
+
+
+class TestUntilCancelled(unittest.TestCase):
+
+    def test_runs_to_completion(self):
+        """Test that an uncancelled stream yields every item."""
+        async def run():
+            token = cancellation.CancelToken()
+            return [item async for item in cancellation.until_cancelled(SlowStream(5, 0)(), token)]
+
+        self.assertEqual(len(asyncio.run(run())), 5)
+
+    def test_cancel_closes_the_stream_mid_await(self):
+        """Test that cancelling stops the stream while it waits for its next item, not after it."""
+        stream = SlowStream(count=10, delay=0.5)
+
+        async def run():
+            token = cancellation.CancelToken()
+            items = []
+            asyncio.get_running_loop().call_later(0.7, token.cancel, "superseded")
+            start = time.perf_counter()
+            async for item in cancellation.until_cancelled(stream(), token):
+                items.append(item)
+            elapsed = time.perf_counter() - start
+            await asyncio.sleep(0.05)
+            return items, elapsed, token
+
+        items, elapsed, token = asyncio.run(run())
+        self.assertEqual(items, ["t0 "])
+        self.assertLess(elapsed, 0.9)
+        self.assertTrue(stream.closed)
+        self.assertEqual(stream.produced, 1)
+        self.assertEqual(token.reason, "superseded")
+
+    def test_errors_propagate(self):
+        """Test that an error of the stream is raised to the consumer."""
+        async def failing():
+            yield "a"
+            raise ConnectionError("ollama down")
+
+        async def run():
+            return [item async for item in cancellation.until_cancelled(failing(), cancellation.CancelToken())]
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(run())
+
+
+class TestGenerationTracker(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.tracker = cancellation.GenerationTracker()
+
+    def test_new_generation_supersedes_the_previous(self):
+        """Test that a session's second question cancels its first answer and the tokens are counted."""
+        stream = SlowStream(count=100, delay=0.01)
+
+        async def answer(session_id, results):
+            token = self.tracker.start(session_id)
+            tokens = 0
+            async for item in cancellation.until_cancelled(stream(), token):
+                tokens += 1
+            self.tracker.finish(session_id, token, tokens)
+            results.append((token.reason, tokens))
+
+        async def run():
+            results = []
+            first = asyncio.ensure_future(answer("s1", results))
+            await asyncio.sleep(0.1)
+            other = asyncio.ensure_future(answer("s2", results))
+            await asyncio.sleep(0.1)
+            # the new question of s1 cancels its first answer but not s2's
+            second = asyncio.ensure_future(answer("s1", results))
+            await asyncio.sleep(0.1)
+            self.tracker.cancel("s2", "disconnected")
+            await asyncio.gather(first, other, second)
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(sorted(reason or "" for reason, tokens in results), ["", "disconnected", "superseded"])
+        stats = self.tracker.stats()
+        self.assertEqual(stats["cancelled"], {"superseded": 1, "disconnected": 1})
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["cancelled_tokens"], sum(tokens for reason, tokens in results if reason))
+
+    def test_start_cancels_in_flight_token(self):
+        """Test that starting a generation cancels the session's previous token as superseded."""
+        async def run():
+            first = self.tracker.start("s1")
+            second = self.tracker.start("s1")
+            self.tracker.finish("s1", first, 12)
+            self.tracker.finish("s1", second, 30)
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first.reason, "superseded")
+        self.assertFalse(second.cancelled)
+        stats = self.tracker.stats()
+        self.assertEqual((stats["cancelled"], stats["cancelled_tokens"]), ({"superseded": 1}, 12))
+        self.assertEqual((stats["completed"], stats["completed_tokens"]), (1, 30))
+
+
+class Interrupted(BaseException):
+    """Stands in for the exception Streamlit raises to stop a script run."""
+
+
+class ClosableStream:
+    def __init__(self, items):
+        self.items = iter(items)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.items)
+
+    def close(self):
+        self.closed = True
+
+
+class TestRunGeneration(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.tracker = cancellation.GenerationTracker()
+        self.abandoned = []
+
+    def test_completed_generation(self):
+        """Test that a stream that runs out is recorded as completed with its token count."""
+        stream = ClosableStream(["a", "b", "", "c"])
+        tokens = cancellation.run_generation(stream, bool, self.tracker, on_abandon=lambda: self.abandoned.append(1))
+        self.assertEqual(tokens, 3)
+        self.assertEqual((self.tracker.stats()["completed"], self.tracker.stats()["completed_tokens"]), (1, 3))
+        self.assertFalse(stream.closed)
+        self.assertEqual(self.abandoned, [])
+
+    def test_interrupted_generation_is_closed_and_superseded(self):
+        """Test that an interrupted run closes the stream, undoes the turn and counts as superseded."""
+        stream = ClosableStream(["a", "b", "c"])
+
+        def handle(item):
+            if item == "c":
+                raise Interrupted()
+            return True
+
+        with self.assertRaises(Interrupted):
+            cancellation.run_generation(stream, handle, self.tracker, on_abandon=lambda: self.abandoned.append(1))
+        self.assertTrue(stream.closed)
+        self.assertEqual(self.abandoned, [1])
+        self.assertEqual(self.tracker.stats()["cancelled"], {"superseded": 1})
+        self.assertEqual(self.tracker.summary(), "1 answers cancelled, 2 tokens discarded")
+
+    def test_failed_generation_is_not_counted_as_cancelled(self):
+        """Test that an error closes the stream and undoes the turn without counting a cancellation."""
+        stream = ClosableStream(["a"])
+
+        def handle(item):
+            raise ConnectionError("ollama down")
+
+        with self.assertRaises(ConnectionError):
+            cancellation.run_generation(stream, handle, self.tracker, on_abandon=lambda: self.abandoned.append(1))
+        self.assertTrue(stream.closed)
+        self.assertEqual(self.abandoned, [1])
+        self.assertEqual(self.tracker.stats()["cancelled"], {})
+
+    def test_shared_tracker(self):
+        """Test that every caller gets the same process-wide tracker."""
+        self.assertIs(cancellation.get_tracker(), cancellation.get_tracker())
+
+
+class TestIterEventsCancellation(unittest.TestCase):
+
+    def test_closing_the_iterator_cancels_the_stream(self):
+        """Test that closing the synchronous iterator early cancels the async stream in its thread."""
+        stream = SlowStream(count=100, delay=0.05)
+        events = agent_stream.iter_events(stream)
+        self.assertEqual(next(events), "t0 ")
+        events.close()
+        self.assertTrue(stream.closed)
+        self.assertLess(stream.produced, 5)
+        self.assertFalse(any(thread.name == "agent-stream" for thread in threading.enumerate()))
+
+
+if __name__ == '__main__':
+    unittest.main()
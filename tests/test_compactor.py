@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import compactor
+
+
+class Chunk:
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class TestCompactor(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.text = ("Chroma stores the embeddings on disk. The DB_PATH setting points at the folder. "
+                     "Re-run the indexer after changing the data folder so new files are embedded.")
+        self.first = Chunk(self.text[:110], {"source": "a.md", "start_index": 0})
+        self.second = Chunk(self.text[70:], {"source": "a.md", "start_index": 70})
+
+    def test_text_overlap(self):
+        """Test that the overlap between the end of one text and the start of the next is found."""
+        self.assertEqual(compactor.text_overlap(self.first.page_content, self.second.page_content), 40)
+        self.assertEqual(compactor.text_overlap("abc" * 10, "xyz" * 10), 0)
+
+    def test_merges_overlapping_chunks(self):
+        """Test that overlapping chunks of a source become one span without the repeated text."""
+        compacted = compactor.compact_documents([self.second, self.first])
+        self.assertEqual(len(compacted), 1)
+        self.assertEqual(compacted[0].page_content, self.text)
+        self.assertEqual(compacted[0].metadata["merged_chunks"], 2)
+
+    def test_short_offset_overlap_is_not_repeated(self):
+        """Test that chunks whose offsets overlap by less than min_overlap are merged without repeating text."""
+        text = "The quick brown fox jumps over the lazy dog and keeps running far away."
+        first = Chunk(text[:30], {"source": "a.md", "start_index": 0})
+        second = Chunk(text[20:], {"source": "a.md", "start_index": 20})
+        compacted = compactor.compact_documents([first, second])
+        self.assertEqual(compacted[0].page_content, text)
+
+    def test_adjacent_chunks_are_joined_with_a_space(self):
+        """Test that chunks that follow each other without overlap are joined by a space."""
+        first = Chunk("Ollama serves models over HTTP.", {"source": "a.md", "start_index": 0})
+        second = Chunk("The default port is 11434.", {"source": "a.md", "start_index": 32})
+        compacted = compactor.compact_documents([first, second])
+        self.assertEqual(compacted[0].page_content, "Ollama serves models over HTTP. The default port is 11434.")
+
+    def test_keeps_chunks_of_other_sources(self):
+        """Test that chunks from different sources are not merged."""
+        other = Chunk("Ollama serves models over HTTP on port 11434 by default.", {"source": "b.md"})
+        compacted = compactor.compact_documents([self.first, other])
+        self.assertEqual([doc.page_content for doc in compacted], [self.first.page_content, other.page_content])
+
+    def test_drops_near_duplicates_across_sources(self):
+        """Test that a near copy of a better ranked chunk in another source is dropped."""
+        copy = Chunk(self.text.replace("disk.", "disk!"), {"source": "copy.md"})
+        original = Chunk(self.text, {"source": "a.md"})
+        compacted = compactor.compact_documents([original, copy])
+        self.assertEqual(compacted, [original])
+
+    def test_simhash_distance(self):
+        """Test that unrelated texts are far apart and identical texts have the same hash."""
+        self.assertEqual(compactor.simhash(self.text), compactor.simhash(self.text))
+        far = compactor.hamming_distance(compactor.simhash(self.text),
+                                         compactor.simhash("Completely different words about cooking pasta at home."))
+        self.assertGreater(far, 3)
+
+    def test_retrieval_order_is_kept(self):
+        """Test that merged spans keep the position of their best ranked chunk."""
+        other = Chunk("Ollama serves models over HTTP on port 11434 by default.", {"source": "b.md"})
+        compacted = compactor.compact_documents([other, self.second, self.first])
+        self.assertIs(compacted[0], other)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import condense
+
+
+class TestCondense(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.history = ["What is privileged access management?", "PAM controls admin accounts."]
+
+    def test_self_contained_questions(self):
+        """Test that full questions without back references are self-contained."""
+        self.assertTrue(condense.is_self_contained("How do I rotate the database admin password?"))
+        self.assertFalse(condense.is_self_contained("How do I rotate it?"))
+        self.assertFalse(condense.is_self_contained("And for service accounts?"))
+        self.assertFalse(condense.is_self_contained("What about Windows servers?"))
+        self.assertFalse(condense.is_self_contained("Why?"))
+
+    def test_plan_without_history(self):
+        """Test that the rewrite is skipped when there is no history, whatever the strategy."""
+        for strategy in condense.CONDENSE_STRATEGIES:
+            self.assertEqual(condense.plan("How do I rotate it?", [], strategy), "no_history")
+
+    def test_plan_per_strategy(self):
+        """Test the action chosen for follow-up and self-contained questions."""
+        follow_up = "How do I rotate it?"
+        full = "How do I rotate the database admin password?"
+        self.assertEqual(condense.plan(full, self.history, "always"), "rewrite")
+        self.assertEqual(condense.plan(full, self.history, "skip"), "self_contained")
+        self.assertEqual(condense.plan(follow_up, self.history, "skip"), "rewrite")
+        self.assertEqual(condense.plan(follow_up, self.history, "speculative"), "speculate")
+
+    def test_plan_unknown_strategy(self):
+        """Test that an unknown strategy raises ValueError."""
+        with self.assertRaises(ValueError):
+            condense.plan("question", self.history, "never")
+
+    def test_query_change(self):
+        """Test the fraction of changed words between a question and its rewrite."""
+        self.assertEqual(condense.query_change("How do I reset PAM?", "how do i reset pam"), 0.0)
+        self.assertGreater(condense.query_change("How do I rotate it?",
+                                                 "How do I rotate the PAM admin password?"), 0.5)
+
+    def test_stats(self):
+        """Test that the avoided rate counts turns that never waited on a rewrite."""
+        stats = condense.CondenseStats()
+        for outcome in ("no_history", "self_contained", "speculative_kept", "rewritten"):
+            stats.record(outcome)
+        result = stats.stats()
+        self.assertEqual(result["turns"], 4)
+        self.assertEqual(result["rewrite_calls"], 2)
+        self.assertEqual(result["rewrite_avoided_rate"], 0.5)
+        self.assertEqual(result["speculative_kept_rate"], 0.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -130,6 +130,213 @@ DATA_FOLDER = /test/data/folder
                     config_handler.get_model('test_config.ini')
                 self.assertIn("MODEL not found in the configuration file", str(context.exception))
 
+    def test_get_answer_cache_settings(self):
+        """Test answer cache settings with inline comments."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write("[Cache]\nanswer_cache_enabled = false  ; comment\nanswer_cache_similarity_threshold = 0.8\n")
+        try:
+            settings = config_handler.get_answer_cache_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertFalse(settings["enabled"])
+        self.assertEqual(settings["similarity_threshold"], 0.8)
+        self.assertEqual(settings["max_entries"], 512)
+
+    def test_get_answer_cache_settings_missing_section(self):
+        """Test answer cache defaults when the Cache section is missing."""
+        settings = config_handler.get_answer_cache_settings('missing_config.ini')
+        self.assertTrue(settings["enabled"])
+        self.assertEqual(settings["ttl"], 86400)
+
+    def test_get_docs_split_settings(self):
+        """Test chunking settings with quoted values and inline comments."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Docs]\ndocs_chunk_size = 256  ; tokens\ndocs_split_method = "Markdown"  ; method\n')
+        try:
+            settings = config_handler.get_docs_split_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings, {"chunk_size": 256, "chunk_overlap": 50, "split_method": "markdown"})
+
+    def test_get_docs_split_settings_invalid_method(self):
+        """Test an unsupported split method in the configuration."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Docs]\ndocs_split_method = semantic\n')
+        try:
+            with self.assertRaises(ValueError):
+                config_handler.get_docs_split_settings(f.name)
+        finally:
+            os.remove(f.name)
+
+    def test_get_index_settings(self):
+        """Test sharding settings, with defaults when the Index section is missing."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Index]\nshard_by = Hash  ; comment\nshard_count = 8\n')
+        try:
+            settings = config_handler.get_index_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings, {"shard_by": "hash", "shard_count": 8, "build_batch_size": 64})
+        self.assertEqual(config_handler.get_index_settings('missing_config.ini')["shard_by"], "none")
+
+    def test_get_hnsw_settings(self):
+        """Test HNSW settings, with Chroma's defaults when the keys are missing."""
+        self.assertEqual(config_handler.get_hnsw_settings('missing_config.ini'),
+                         {"space": "l2", "M": 16, "construction_ef": 100, "search_ef": 10})
+
+    def test_write_setting(self):
+        """Test that a value is replaced in place with its comment kept, and missing keys and sections are added."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Index]\nhnsw_m = 16  ; neighbours\n\n[Watcher]\nmode = polling\n')
+        try:
+            config_handler.write_setting('Index', 'hnsw_m', 32, f.name)
+            config_handler.write_setting('Index', 'hnsw_space', 'cosine', f.name)
+            config_handler.write_setting('Cache', 'enabled', 'false', f.name)
+            with open(f.name) as config_file:
+                content = config_file.read()
+        finally:
+            os.remove(f.name)
+        self.assertEqual(content, '[Index]\nhnsw_m = 32  ; neighbours\nhnsw_space = cosine\n\n[Watcher]\nmode = polling\n'
+                                  '\n[Cache]\nenabled = false\n')
+
+    def test_get_faiss_settings(self):
+        """Test FAISS settings, with defaults and a rejected index type."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[FAISS]\nindex_type = IVF_PQ  ; comment\nnprobe = 16\nmmap = false\n')
+        try:
+            settings = config_handler.get_faiss_settings(f.name)
+            with open(f.name, 'w') as config_file:
+                config_file.write('[FAISS]\nindex_type = lsh\n')
+            with self.assertRaises(ValueError):
+                config_handler.get_faiss_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings["index_type"], "ivf_pq")
+        self.assertEqual(settings["nprobe"], 16)
+        self.assertEqual(settings["ef_search"], 64)
+        self.assertFalse(settings["mmap"])
+
+    def test_get_work_queue_settings(self):
+        """Test work queue settings, with defaults when the keys are missing."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Index]\nqueue_path =  ; default\nlease_seconds = 30\n')
+        try:
+            settings = config_handler.get_work_queue_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings, {"queue_path": "", "lease_seconds": 30.0, "max_attempts": 3})
+
+    def test_get_retrieval_settings(self):
+        """Test that k and the threshold come from retriever_params and rerank settings from their keys."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Retrieval]\nretriever_params = {"k": 3, "similarity_threshold": 0.6}\n'
+                    'rerank_fetch_k = 12  ; candidates\n')
+        try:
+            settings = config_handler.get_retrieval_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings["k"], 3)
+        self.assertEqual(settings["similarity_threshold"], 0.6)
+        self.assertEqual(settings["fetch_k"], 12)
+        self.assertTrue(settings["rerank_enabled"])
+
+    def test_get_prompt_layout(self):
+        """Test the prompt layout setting and its validation."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Chain]\nprompt_layout = Prefix_Stable  ; comment\n')
+        try:
+            self.assertEqual(config_handler.get_prompt_layout(f.name), "prefix_stable")
+        finally:
+            os.remove(f.name)
+        self.assertEqual(config_handler.get_prompt_layout('missing_config.ini'), "context_first")
+
+    def test_get_warmup_settings(self):
+        """Test the warm-up settings with a comma separated model list."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Warmup]\nwarmup_models = gemma3:4b, deepseek-r1:8b  ; extra\n')
+        try:
+            settings = config_handler.get_warmup_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings, {"enabled": True, "models": ["gemma3:4b", "deepseek-r1:8b"]})
+
+    def test_get_ollama_pool_settings(self):
+        """Test backend lists and model placement parsing."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Ollama]\nollama_backends = http://a:11434, http://b:11434  ; pool\n'
+                    'ollama_model_placement = mxbai-embed-large=http://c:11434, llama3.2=http://a:11434|http://b:11434\n')
+        try:
+            settings = config_handler.get_ollama_pool_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings["backends"], ["http://a:11434", "http://b:11434"])
+        self.assertEqual(settings["placement"], {"mxbai-embed-large": ["http://c:11434"],
+                                                 "llama3.2": ["http://a:11434", "http://b:11434"]})
+
+    def test_get_ollama_pool_settings_defaults_to_api_url(self):
+        """Test that the pool falls back to ollama_api_url."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Ollama]\nollama_api_url = http://ollama:11434\n')
+        try:
+            settings = config_handler.get_ollama_pool_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings["backends"], ["http://ollama:11434"])
+
+    def test_get_condense_settings(self):
+        """Test the condense strategy setting and its validation."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Chain]\ncondense_strategy = never\n')
+        try:
+            with self.assertRaises(ValueError):
+                config_handler.get_condense_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(config_handler.get_condense_settings('missing_config.ini'),
+                         {"strategy": "always", "max_change": 0.2})
+
+    def test_get_scheduler_settings(self):
+        """Test scheduler classes, limits and their validation."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Scheduler]\nscheduler_mode = Shared  ; mode\nscheduler_weights = chat:4, bulk:1\n'
+                    'scheduler_limits = bulk:1\nscheduler_default_class = chat\n')
+        try:
+            settings = config_handler.get_scheduler_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings, {"mode": "shared", "weights": {"chat": 4.0, "bulk": 1.0},
+                                    "limits": {"bulk": 1}, "default_class": "chat"})
+        defaults = config_handler.get_scheduler_settings('missing_config.ini')
+        self.assertEqual((defaults["mode"], defaults["default_class"]), ("off", "interactive"))
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Scheduler]\nscheduler_limits = nightly:1\n')
+        try:
+            with self.assertRaises(ValueError):
+                config_handler.get_scheduler_settings(f.name)
+        finally:
+            os.remove(f.name)
+
+    def test_get_agent_pool_settings(self):
+        """Test agent pool settings with inline comments and their defaults."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Agent]\nagent_pool_max_agents = 4  ; agents\n')
+        try:
+            settings = config_handler.get_agent_pool_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings, {"max_agents": 4, "ttl": 1800})
+
+    def test_get_sandbox_settings(self):
+        """Test sandbox settings with inline comments and their defaults."""
+        with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+            f.write('[Sandbox]\nsandbox_workers = 4  ; workers\nsandbox_cpu_seconds = 0.5\n')
+        try:
+            settings = config_handler.get_sandbox_settings(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(settings, {"workers": 4, "max_jobs": 200, "cpu_seconds": 0.5, "wall_seconds": 5.0,
+                                    "memory_mb": 512, "queue_timeout": 10.0})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import tempfile
+from unittest.mock import patch
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import extractor
+
+
+class TestExtractor(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "cache")
+        self.pdf_path = os.path.join(self.temp_dir.name, "manual.pdf")
+        with open(self.pdf_path, "wb") as f:
+            f.write(b"%PDF-1.4 not really a pdf")
+        self.records = [
+            {"page_content": "page one", "metadata": {"page": 0, "total_pages": 2}},
+            {"page_content": "page two", "metadata": {"page": 1, "total_pages": 2}},
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_file_hash_changes_with_content(self):
+        """Test that the cache key follows the file content."""
+        before = extractor.file_hash(self.pdf_path)
+        with open(self.pdf_path, "ab") as f:
+            f.write(b"more")
+        self.assertNotEqual(before, extractor.file_hash(self.pdf_path))
+
+    def test_cache_round_trip(self):
+        """Test writing and reading extracted pages."""
+        extractor.write_cache(self.cache_dir, "abc", self.records)
+        self.assertEqual(extractor.read_cache(self.cache_dir, "abc"), self.records)
+        self.assertEqual([f for f in os.listdir(self.cache_dir) if f.endswith(".tmp")], [])
+
+    def test_read_cache_missing_or_corrupt(self):
+        """Test that missing and unreadable cache entries are misses."""
+        self.assertIsNone(extractor.read_cache(self.cache_dir, "abc"))
+        os.makedirs(self.cache_dir)
+        with open(extractor.cache_file(self.cache_dir, "abc"), "w") as f:
+            f.write("{not json")
+        self.assertIsNone(extractor.read_cache(self.cache_dir, "abc"))
+
+    def test_cache_is_versioned(self):
+        """Test that a new extractor version does not read old entries."""
+        extractor.write_cache(self.cache_dir, "abc", self.records)
+        with patch('helpers.extractor.EXTRACTOR_VERSION', "2"):
+            self.assertIsNone(extractor.read_cache(self.cache_dir, "abc"))
+
+    @patch('helpers.extractor.ProcessPoolExecutor')
+    def test_cached_files_are_not_parsed(self, mock_pool):
+        """Test that cached files skip extraction and get their current path as source."""
+        extractor.write_cache(self.cache_dir, extractor.file_hash(self.pdf_path), self.records)
+        results = extractor.extract_files([self.pdf_path], self.cache_dir)
+        mock_pool.assert_not_called()
+        self.assertEqual([r["page_content"] for r in results[self.pdf_path]], ["page one", "page two"])
+        self.assertEqual(results[self.pdf_path][1]["metadata"], {"page": 1, "total_pages": 2, "source": self.pdf_path})
+
+    @patch('helpers.extractor.count_pdf_pages', side_effect=ValueError("not a pdf"))
+    def test_unreadable_files_are_left_out(self, mock_count):
+        """Test that files which fail to extract are not returned or cached."""
+        results = extractor.extract_files([self.pdf_path], self.cache_dir, workers=1)
+        self.assertEqual(results, {})
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
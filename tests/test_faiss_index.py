@@ -0,0 +1,79 @@
+import unittest
+import tempfile
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import faiss
+from helpers import faiss_index
+
+
+def settings(**overrides):
+    return {"index_type": "flat", "nlist": 0, "nprobe": 8, "pq_m": 8, "pq_bits": 4, "hnsw_m": 16,
+            "ef_construction": 64, "ef_search": 32, "train_sample": 2000, "mmap": True, **overrides}
+
+
+class TestFaissIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(20, 32))
+        self.vectors = (centers[rng.integers(0, 20, 3000)] + rng.normal(scale=0.1, size=(3000, 32))).astype("float32")
+
+    def test_factory_strings(self):
+        """Test the faiss.index_factory description of each index type."""
+        self.assertEqual(faiss_index.factory_string("flat", 32, 3000, settings()), "Flat")
+        self.assertEqual(faiss_index.factory_string("hnsw", 32, 3000, settings()), "HNSW16,Flat")
+        self.assertEqual(faiss_index.factory_string("ivf_flat", 32, 3000, settings()), "IVF51,Flat")
+        self.assertEqual(faiss_index.factory_string("ivf_pq", 32, 3000, settings(nlist=32)), "IVF32,PQ8x4")
+        with self.assertRaises(ValueError):
+            faiss_index.factory_string("ivf_pq", 30, 3000, settings())
+
+    def test_nlist_stays_trainable(self):
+        """Test that the number of clusters is capped by the training vectors available."""
+        self.assertEqual(faiss_index.auto_nlist(1_000_000), 4000)
+        self.assertEqual(faiss_index.auto_nlist(100), 2)
+        self.assertEqual(faiss_index.auto_nlist(10), 1)
+        self.assertEqual(faiss_index.effective_index_type(1000, settings(index_type="ivf_pq", pq_bits=8)), "ivf_flat")
+        self.assertEqual(faiss_index.effective_index_type(1000, settings(index_type="ivf_pq")), "ivf_pq")
+        self.assertEqual(faiss_index.effective_index_type(10 ** 6, settings(index_type="ivf_pq", pq_bits=8)), "ivf_flat")
+
+    def test_trained_index_with_search_params(self):
+        """Test that IVF indexes are trained on a sample and get nprobe, and HNSW gets efSearch."""
+        index = faiss_index.new_index(self.vectors, settings(index_type="ivf_pq", train_sample=1000))
+        self.assertTrue(index.is_trained)
+        self.assertEqual(index.ntotal, 0)
+        self.assertEqual(faiss.extract_index_ivf(index).nprobe, 8)
+        hnsw = faiss_index.new_index(self.vectors, settings(index_type="hnsw"))
+        self.assertEqual(hnsw.hnsw.efSearch, 32)
+
+    def test_memory_mapped_index_searches_the_same(self):
+        """Test that a saved index read memory-mapped returns the same neighbours."""
+        index = faiss_index.new_index(self.vectors, settings(index_type="ivf_flat"))
+        index.add(self.vectors)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "index.faiss")
+            faiss.write_index(index, path)
+            loaded = faiss_index.read_index(path, settings(nprobe=4))
+            self.assertEqual(faiss.extract_index_ivf(loaded).nprobe, 4)
+            faiss.extract_index_ivf(index).nprobe = 4
+            self.assertEqual(loaded.search(self.vectors[:5], 3)[1].tolist(), index.search(self.vectors[:5], 3)[1].tolist())
+            np.testing.assert_allclose(faiss_index.stored_vectors(loaded)[:3], self.vectors[:3])
+
+    def test_benchmark_report(self):
+        """Test the recall and latency report: exact search has full recall and approximate types are close."""
+        vectors, queries = faiss_index.split_queries(self.vectors, 50)
+        self.assertEqual((len(vectors), len(queries)), (2950, 50))
+        rows = faiss_index.benchmark(vectors, queries, settings(), k=5)
+        by_type = {row["index_type"]: row for row in rows}
+        self.assertEqual(list(by_type), list(faiss_index.INDEX_TYPES))
+        self.assertEqual(by_type["flat"]["recall"], 1.0)
+        self.assertGreater(by_type["hnsw"]["recall"], 0.8)
+        self.assertLess(by_type["ivf_pq"]["size_mb"], by_type["flat"]["size_mb"])
+        self.assertIn("recall@5", faiss_index.format_report(rows, k=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
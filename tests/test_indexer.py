@@ -0,0 +1,214 @@
+import unittest
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import indexer
+
+
+class FakeEmbeddings:
+    """Embeds a text as [len(text)] and records every embed_documents call."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        if self.fail:
+            raise ConnectionError("ollama is down")
+        return [[float(len(text))] for text in texts]
+
+
+class TestQueryEmbeddingDispatcher(unittest.TestCase):
+
+    def run_concurrently(self, dispatcher, texts):
+        results = {}
+        barrier = threading.Barrier(len(texts))
+
+        def query(i, text):
+            barrier.wait()
+            try:
+                results[i] = dispatcher.embed_query(text)
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=query, args=(i, text)) for i, text in enumerate(texts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [results[i] for i in range(len(texts))]
+
+    def test_concurrent_queries_share_one_call(self):
+        """Test that queries arriving within the window are embedded in one call."""
+        embeddings = FakeEmbeddings()
+        dispatcher = indexer.QueryEmbeddingDispatcher(embeddings, batch_window=0.05)
+        results = self.run_concurrently(dispatcher, ["a", "bb", "ccc", "dddd"])
+        self.assertEqual(results, [[1.0], [2.0], [3.0], [4.0]])
+        self.assertEqual(len(embeddings.calls), 1)
+        self.assertEqual(dispatcher.stats()["batches"], 1)
+
+    def test_identical_queries_are_coalesced(self):
+        """Test that identical in-flight texts are embedded once."""
+        embeddings = FakeEmbeddings()
+        dispatcher = indexer.QueryEmbeddingDispatcher(embeddings, batch_window=0.05)
+        results = self.run_concurrently(dispatcher, ["same"] * 5)
+        self.assertEqual(results, [[4.0]] * 5)
+        self.assertEqual(embeddings.calls, [["same"]])
+        self.assertEqual(dispatcher.stats()["coalesced"], 4)
+
+    def test_max_batch_size(self):
+        """Test that large batches are split into several calls."""
+        embeddings = FakeEmbeddings()
+        dispatcher = indexer.QueryEmbeddingDispatcher(embeddings, batch_window=0.05, max_batch_size=2)
+        self.run_concurrently(dispatcher, ["a", "b", "c", "d", "e"])
+        self.assertTrue(all(len(call) <= 2 for call in embeddings.calls))
+        self.assertEqual(sorted(text for call in embeddings.calls for text in call), ["a", "b", "c", "d", "e"])
+
+    def test_errors_reach_every_caller(self):
+        """Test that a failed batch raises in every waiting caller."""
+        dispatcher = indexer.QueryEmbeddingDispatcher(FakeEmbeddings(fail=True), batch_window=0.05)
+        results = self.run_concurrently(dispatcher, ["a", "b"])
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+        self.assertEqual(dispatcher._in_flight, {})
+
+    def test_embed_documents_passes_through(self):
+        """Test that document embedding is not batched."""
+        embeddings = FakeEmbeddings()
+        dispatcher = indexer.QueryEmbeddingDispatcher(embeddings)
+        self.assertEqual(dispatcher.embed_documents(["a", "bb"]), [[1.0], [2.0]])
+        self.assertEqual(embeddings.calls, [["a", "bb"]])
+
+
+class TestIndexVersion(unittest.TestCase):
+
+    def test_bump_changes_version(self):
+        """Test the index version marker used to invalidate cached answers."""
+        with tempfile.TemporaryDirectory() as db_path:
+            self.assertEqual(indexer.get_index_version(db_path), "0")
+            version = indexer.bump_index_version(db_path)
+            self.assertEqual(indexer.get_index_version(db_path), version)
+            self.assertNotEqual(version, "0")
+
+
+class FakeStore:
+    """Stores chunk texts by id and supports the get/delete/add_documents calls of the indexer."""
+
+    def __init__(self):
+        self.chunks = {}
+        self.add_calls = 0
+        self.next_id = 0
+
+    def add_documents(self, documents):
+        self.add_calls += 1
+        ids = []
+        for document in documents:
+            chunk_id = f"id-{self.next_id}"
+            self.next_id += 1
+            self.chunks[chunk_id] = document
+            ids.append(chunk_id)
+        return ids
+
+    def get(self, where=None, include=None):
+        return {"ids": [chunk_id for chunk_id, document in self.chunks.items()
+                        if document.metadata["source"] == where["source"]]}
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            del self.chunks[chunk_id]
+
+    @property
+    def _collection(self):
+        return self
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for chunk_id, embedding, text, metadata in zip(ids, embeddings, documents, metadatas):
+            self.chunks[chunk_id] = SimpleNamespace(page_content=text, metadata=metadata, embedding=embedding)
+
+
+class TestIndexFileBatches(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.split_settings = {"chunk_size": 10, "chunk_overlap": 0, "split_method": "fixed"}
+        self.chunks = [SimpleNamespace(page_content=f"chunk {i}", metadata={"source": "/docs/a.md"}) for i in range(5)]
+        self.patches = [patch.object(indexer, "PERSISTENT_DIRECTORY", self.temp_dir.name),
+                        patch.object(indexer, "load_file", return_value=[]),
+                        patch.object(indexer.splitter, "split_documents", return_value=self.chunks)]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+        self.temp_dir.cleanup()
+
+    def test_batches_are_reported(self):
+        """Test that chunks are stored in batches and every batch is reported."""
+        store, batches = FakeStore(), []
+        ids = indexer.index_file(store, "/docs/a.md", self.split_settings, batch_size=2,
+                                 on_batch=lambda done, chunks: batches.append((done, chunks)))
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(store.add_calls, 3)
+        self.assertEqual(batches, [(1, 2), (2, 4), (3, 5)])
+
+    def test_resume_skips_stored_batches(self):
+        """Test that a resumed file keeps its stored batches and only adds the rest."""
+        store = FakeStore()
+        store.add_documents(self.chunks[:2])
+        ids = indexer.index_file(store, "/docs/a.md", self.split_settings, batch_size=2, start_batch=1)
+        self.assertEqual(len(ids), 3)
+        self.assertEqual([document.page_content for document in store.chunks.values()],
+                         [f"chunk {i}" for i in range(5)])
+
+    def test_reindex_replaces_chunks(self):
+        """Test that indexing from the first batch replaces the file's old chunks."""
+        store = FakeStore()
+        store.add_documents(self.chunks[:2])
+        indexer.index_file(store, "/docs/a.md", self.split_settings)
+        self.assertEqual(len(store.chunks), 5)
+
+
+class TestMergeResults(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(indexer, "PERSISTENT_DIRECTORY", self.temp_dir.name)
+        self.patcher.start()
+        self.queue = indexer.work_queue.WorkQueue(os.path.join(self.temp_dir.name, indexer.WORK_QUEUE_FILE))
+
+    def tearDown(self):
+        self.queue.close()
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    def embed(self, path, texts):
+        self.assertEqual(self.queue.claim("w1"), path)
+        self.queue.complete("w1", path, {"texts": texts, "vectors": [[1.0]] * len(texts),
+                                         "metadatas": [{"source": path}] * len(texts)})
+
+    def test_merge_replaces_and_deletes(self):
+        """Test that merged files replace their old chunks with the workers' vectors and removed files are dropped."""
+        store = FakeStore()
+        store.add_documents([SimpleNamespace(page_content="old", metadata={"source": "/docs/a.md"}),
+                             SimpleNamespace(page_content="gone", metadata={"source": "/docs/b.md"})])
+        self.queue.enqueue({"/docs/a.md": [1, 1], "/docs/b.md": [1, 2]})
+        self.queue.enqueue({"/docs/a.md": [2, 1]})
+        self.embed("/docs/a.md", ["new 1", "new 2"])
+        self.assertEqual(indexer.merge_results(store, self.queue), (1, 2, 1))
+        self.assertEqual(sorted(document.page_content for document in store.chunks.values()), ["new 1", "new 2"])
+        self.assertEqual(self.queue.counts()["merged"], 2)
+        self.assertEqual(indexer.merge_results(store, self.queue), (0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
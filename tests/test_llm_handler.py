@@ -4,7 +4,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from helpers import llm_handler
+from helpers import llm_handler, ollama_pool
 
 
 class TestLLMHandler(unittest.TestCase):
@@ -56,7 +56,7 @@ class TestLLMHandler(unittest.TestCase):
         
         result = llm_handler.setup_agent("ollama", "llama3.2")
         
-        mock_init_chat_model.assert_called_once_with("ollama:llama3.2")
+        mock_init_chat_model.assert_called_once_with("ollama:llama3.2", base_url=ollama_pool.get_base_url())
         mock_create_react_agent.assert_called_once_with(
             model=mock_model, 
             tools=mock_tools, 
@@ -64,12 +64,15 @@ class TestLLMHandler(unittest.TestCase):
         )
         self.assertEqual(result, mock_agent)
 
+    @patch('helpers.llm_handler.with_prefix_tracking')
+    @patch('helpers.llm_handler.with_context_compaction')
     @patch('helpers.llm_handler.create_retrieval_chain')
     @patch('helpers.llm_handler.create_stuff_documents_chain')
     @patch('helpers.llm_handler.ChatPromptTemplate')
     @patch('helpers.llm_handler.ChatOllama')
     def test_setup_chain(self, mock_chat_ollama, mock_prompt_template, 
-                        mock_create_stuff_chain, mock_create_retrieval_chain):
+                        mock_create_stuff_chain, mock_create_retrieval_chain, mock_compaction,
+                        mock_prefix_tracking):
         """Test chain setup."""
         mock_llm = MagicMock()
         mock_chat_ollama.return_value = mock_llm
@@ -84,6 +87,7 @@ class TestLLMHandler(unittest.TestCase):
         
         mock_chat_ollama.assert_called_once_with(
             model=self.test_model,
+            base_url=ollama_pool.get_base_url(),
             temperature=0.8,
             num_predict=256,
             keep_alive=-1,
@@ -91,30 +95,32 @@ class TestLLMHandler(unittest.TestCase):
             max_tokens=8192,
             return_source_documents=True
         )
-        mock_create_stuff_chain.assert_called_once_with(mock_llm, mock_prompt)
-        mock_create_retrieval_chain.assert_called_once_with(self.test_retriever, mock_qa_chain)
+        mock_prefix_tracking.assert_called_once_with(mock_llm, self.test_model)
+        mock_create_stuff_chain.assert_called_once_with(mock_prefix_tracking.return_value, mock_prompt)
+        mock_compaction.assert_called_once_with(self.test_retriever)
+        mock_create_retrieval_chain.assert_called_once_with(mock_compaction.return_value, mock_qa_chain)
         self.assertEqual(result, mock_rag_chain)
 
-    @patch('helpers.llm_handler.create_retrieval_chain')
+    @patch('helpers.llm_handler.RunnablePassthrough')
+    @patch('helpers.llm_handler.with_prefix_tracking')
+    @patch('helpers.llm_handler.with_context_compaction')
+    @patch('helpers.llm_handler.setup_condense_step')
     @patch('helpers.llm_handler.create_stuff_documents_chain')
-    @patch('helpers.llm_handler.create_history_aware_retriever')
     @patch('helpers.llm_handler.ChatPromptTemplate')
     @patch('helpers.llm_handler.ChatOllama')
     def test_setup_chain_chatbot(self, mock_chat_ollama, mock_prompt_template,
-                                mock_create_history_retriever, mock_create_stuff_chain,
-                                mock_create_retrieval_chain):
+                                mock_create_stuff_chain, mock_setup_condense_step,
+                                mock_compaction, mock_prefix_tracking, mock_passthrough):
         """Test chatbot chain setup."""
         mock_llm = MagicMock()
         mock_chat_ollama.return_value = mock_llm
         mock_contextualize_prompt = MagicMock()
         mock_qa_prompt = MagicMock()
         mock_prompt_template.from_messages.side_effect = [mock_contextualize_prompt, mock_qa_prompt]
-        mock_history_retriever = MagicMock()
-        mock_create_history_retriever.return_value = mock_history_retriever
+        mock_condense_step = MagicMock()
+        mock_setup_condense_step.return_value = mock_condense_step
         mock_qa_chain = MagicMock()
         mock_create_stuff_chain.return_value = mock_qa_chain
-        mock_rag_chain = MagicMock()
-        mock_create_retrieval_chain.return_value = mock_rag_chain
         
         result = llm_handler.setup_chain_chatbot(self.test_model, self.test_retriever)
         
@@ -122,15 +128,17 @@ class TestLLMHandler(unittest.TestCase):
             model=self.test_model,
             temperature=0.8,
             num_predict=256,
-            keep_alive=-1
+            keep_alive=-1,
+            base_url=ollama_pool.get_base_url()
         )
         self.assertEqual(mock_prompt_template.from_messages.call_count, 2)
-        mock_create_history_retriever.assert_called_once_with(
-            mock_llm, self.test_retriever, mock_contextualize_prompt
+        mock_setup_condense_step.assert_called_once_with(
+            mock_llm, mock_compaction.return_value, mock_contextualize_prompt
         )
-        mock_create_stuff_chain.assert_called_once_with(mock_llm, mock_qa_prompt)
-        mock_create_retrieval_chain.assert_called_once_with(mock_history_retriever, mock_qa_chain)
-        self.assertEqual(result, mock_rag_chain)
+        mock_create_stuff_chain.assert_called_once_with(mock_prefix_tracking.return_value, mock_qa_prompt)
+        mock_passthrough.assign.assert_called_once_with(answer=mock_qa_chain)
+        mock_condense_step.__or__.assert_called_once_with(mock_passthrough.assign.return_value)
+        self.assertEqual(result, mock_condense_step.__or__.return_value)
 
     @patch('helpers.llm_handler.ChatOllama')
     def test_setup_chain_custom_context_size(self, mock_chat_ollama):
@@ -146,6 +154,7 @@ class TestLLMHandler(unittest.TestCase):
             
             mock_chat_ollama.assert_called_once_with(
                 model=self.test_model,
+                base_url=ollama_pool.get_base_url(),
                 temperature=0.8,
                 num_predict=256,
                 keep_alive=-1,
@@ -154,6 +163,51 @@ class TestLLMHandler(unittest.TestCase):
                 return_source_documents=True
             )
 
+    @patch('helpers.llm_handler.speculation_pool')
+    @patch('helpers.llm_handler.condense.plan', return_value="speculate")
+    @patch('helpers.config_handler.get_condense_settings',
+           return_value={"strategy": "speculative", "max_change": 0.2})
+    def test_condense_cancels_speculation_when_rewrite_fails(self, mock_settings, mock_plan, mock_pool):
+        """Test that a failing rewrite cancels the speculative retrieval instead of leaving it queued."""
+        mock_prompt = MagicMock()
+        rewrite_chain = mock_prompt.__or__.return_value.__or__.return_value
+        rewrite_chain.invoke.side_effect = RuntimeError("model unavailable")
+        step = llm_handler.setup_condense_step(MagicMock(), self.test_retriever, mock_prompt)
+
+        with self.assertRaisesRegex(RuntimeError, "model unavailable"):
+            step.invoke({"input": "and his team?", "history": ["Who is Bob?"]})
+        mock_pool.submit.assert_called_once()
+        mock_pool.submit.return_value.cancel.assert_called_once_with()
+
+    def test_cached_chain_stores_only_completed_answers(self):
+        """Test that an answer stream closed part-way is not written to the answer cache."""
+        from langchain_core.runnables import RunnableLambda
+
+        def answer(inputs):
+            yield "alpha"
+            yield " beta"
+            yield " gamma"
+
+        answer_cache = MagicMock()
+        answer_cache.lookup.return_value = None
+        retriever = RunnableLambda(lambda question: self.test_docs)
+        chain = llm_handler.setup_cached_chain(self.test_model, MagicMock(), retriever, MagicMock(),
+                                               RunnableLambda(answer), answer_cache)
+        inputs = {"input": "What is alpha?", "history": []}
+
+        stream = chain.stream(inputs)
+        answers = 0
+        for chunk in stream:
+            answers += "answer" in chunk
+            if answers == 2:
+                break
+        stream.close()
+        answer_cache.store.assert_not_called()
+
+        streamed = "".join(chunk.get("answer", "") for chunk in chain.stream(inputs))
+        self.assertEqual(streamed, "alpha beta gamma")
+        answer_cache.store.assert_called_once_with("What is alpha?", self.test_model, "alpha beta gamma",
+                                                   self.test_docs)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,207 @@
+import unittest
+import json
+import time
+import socket
+import threading
+import http.client
+import sys
+import os
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import ollama_pool, scheduler
+
+
+class StandInOllama(BaseHTTPRequestHandler):
+    """A minimal stand-in for an Ollama server: lists its models and streams generations."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps({"models": [{"name": name} for name in self.server.models]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.hits.append(request["model"])
+        self.server.paths.append(self.path)
+        if self.server.status != 200:
+            self.send_response(self.server.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in ("Hello", " from", f" {self.server.name}"):
+            line = json.dumps({"response": token}).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_stand_in(name, models, status=200):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInOllama)
+    server.daemon_threads = True
+    server.name, server.models, server.status, server.hits, server.paths = name, models, status, [], []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def url_of(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def unused_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def generate(proxy, model, path="/api/generate"):
+    connection = http.client.HTTPConnection("127.0.0.1", proxy.server_address[1], timeout=5)
+    connection.request("POST", path, body=json.dumps({"model": model, "prompt": "hi"}),
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response.status, [json.loads(line).get("response") for line in body.splitlines() if line]
+
+
+class TestBackendPool(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def stand_in(self, name, models, status=200):
+        server = start_stand_in(name, models, status)
+        self.servers.append(server)
+        return server
+
+    def test_least_outstanding_routing(self):
+        """Test that concurrent requests are spread over the backends."""
+        pool = ollama_pool.BackendPool(["http://a:1", "http://b:1"], max_concurrency=2)
+        first = pool.acquire("llama3.2")
+        second = pool.acquire("llama3.2")
+        self.assertNotEqual(first, second)
+        pool.release(first)
+        self.assertIs(pool.acquire("llama3.2"), first)
+
+    def test_concurrency_cap(self):
+        """Test that a request waits, then gives up, when every backend is at its cap."""
+        pool = ollama_pool.BackendPool(["http://a:1", "http://b:1"], max_concurrency=1)
+        pool.acquire()
+        pool.acquire()
+        self.assertIsNone(pool.acquire(timeout=0.05))
+
+    def test_waiting_request_gets_released_slot(self):
+        """Test that a queued request proceeds when a slot is released."""
+        pool = ollama_pool.BackendPool(["http://a:1"], max_concurrency=1)
+        backend = pool.acquire()
+        threading.Timer(0.05, pool.release, args=(backend,)).start()
+        self.assertIs(pool.acquire(timeout=2), backend)
+
+    def test_model_aware_placement_from_health_checks(self):
+        """Test that requests go to the backends that have their model pulled."""
+        chat = self.stand_in("chat", ["llama3.2:latest"])
+        embed = self.stand_in("embed", ["mxbai-embed-large:latest"])
+        pool = ollama_pool.BackendPool([url_of(chat), url_of(embed)])
+        pool.check_all()
+        self.assertEqual(pool.acquire("mxbai-embed-large").url, url_of(embed))
+        self.assertEqual(pool.acquire("llama3.2").url, url_of(chat))
+        self.assertEqual(pool.acquire("llama3.2").url, url_of(chat))
+
+    def test_pinned_placement(self):
+        """Test that placement pins a model to its backends."""
+        pool = ollama_pool.BackendPool(["http://a:1", "http://b:1"], placement={"llama3.2": ["http://b:1/"]})
+        for _ in range(2):
+            self.assertEqual(pool.acquire("llama3.2:latest").url, "http://b:1")
+
+    def test_health_check_marks_backend_down_and_up(self):
+        """Test that health checks track backends going down and recovering."""
+        server = self.stand_in("one", ["llama3.2:latest"])
+        pool = ollama_pool.BackendPool([url_of(server), unused_url()])
+        pool.check_all()
+        self.assertEqual([backend.healthy for backend in pool.backends], [True, False])
+        pool.release(pool.acquire(), failed=True)
+        self.assertFalse(pool.backends[0].healthy)
+        pool.check_all()
+        self.assertTrue(pool.backends[0].healthy)
+
+    def test_proxy_streams_and_fails_over(self):
+        """Test that the proxy streams a response and skips a backend that is down."""
+        live = self.stand_in("live", ["llama3.2:latest"])
+        pool = ollama_pool.BackendPool([unused_url(), url_of(live)], max_concurrency=1)
+        proxy = ollama_pool.serve(pool)
+        self.servers.append(proxy)
+        for _ in range(2):
+            status, tokens = generate(proxy, "llama3.2")
+            self.assertEqual(status, 200)
+            self.assertEqual(tokens, ["Hello", " from", " live"])
+        self.assertEqual(live.hits, ["llama3.2", "llama3.2"])
+        self.assertFalse(pool.backends[0].healthy)
+        # the proxy releases the slot just after the last chunk is sent
+        deadline = time.monotonic() + 2
+        while any(backend.outstanding for backend in pool.backends) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([backend.outstanding for backend in pool.backends], [0, 0])
+
+    def test_proxy_fails_over_on_busy_backend(self):
+        """Test that a 503 from one backend is retried on another."""
+        busy = self.stand_in("busy", ["llama3.2:latest"], status=503)
+        live = self.stand_in("live", ["llama3.2:latest"])
+        pool = ollama_pool.BackendPool([url_of(busy), url_of(live)])
+        proxy = ollama_pool.serve(pool)
+        self.servers.append(proxy)
+        self.assertEqual(generate(proxy, "llama3.2"), (200, ["Hello", " from", " live"]))
+
+    def test_proxy_without_backend_returns_503(self):
+        """Test that the proxy answers 503 when no backend can take the request."""
+        pool = ollama_pool.BackendPool([unused_url()])
+        proxy = ollama_pool.serve(pool)
+        self.servers.append(proxy)
+        status, _ = generate(proxy, "llama3.2")
+        self.assertEqual(status, 503)
+
+    def test_proxy_schedules_by_class_prefix(self):
+        """Test that the /p/<class> prefix picks the priority class and is stripped before forwarding."""
+        live = self.stand_in("live", ["llama3.2:latest"])
+        sched = scheduler.PriorityScheduler(2, {"interactive": 8, "indexing": 1}, limits={"indexing": 1})
+        pool = ollama_pool.BackendPool([url_of(live)], max_concurrency=2, scheduler=sched)
+        proxy = ollama_pool.serve(pool)
+        self.servers.append(proxy)
+        self.assertEqual(generate(proxy, "llama3.2", "/p/indexing/api/generate"), (200, ["Hello", " from", " live"]))
+        self.assertEqual(generate(proxy, "llama3.2")[0], 200)
+        self.assertEqual(live.paths, ["/api/generate", "/api/generate"])
+        deadline = time.monotonic() + 2
+        while sum(sched.active.values()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        classes = pool.stats()["scheduler"]["classes"]
+        self.assertEqual((classes["indexing"]["requests"], classes["interactive"]["requests"]), (1, 1))
+        self.assertEqual(classes["indexing"]["active"], 0)
+
+    def test_setup_scheduler_capacity(self):
+        """Test that the scheduler gets every backend slot and the configured classes."""
+        settings = {"backends": ["http://a:1", "http://b:1/"], "placement": {"llama3.2": ["http://b:1"]},
+                    "max_concurrency": 4}
+        sched = ollama_pool.setup_scheduler(settings, {"weights": {"interactive": 8, "batch": 2},
+                                                       "limits": {"batch": 2}, "default_class": "interactive"})
+        self.assertEqual(sched.capacity, 8)
+        self.assertEqual(sched.limits, {"interactive": 8, "batch": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers.prompt_prefix import PrefixReuseTracker
+
+
+class TestPrefixReuseTracker(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.tracker = PrefixReuseTracker(history_size=4)
+        self.system = "System: answer from the context.\n"
+
+    def test_first_prompt_reuses_nothing(self):
+        """Test that the first prompt has no reusable prefix."""
+        self.tracker.observe(self.system + "Human: hello")
+        self.assertEqual(self.tracker.stats()["reused_tokens"], 0)
+
+    def test_append_only_history_is_reused(self):
+        """Test that a prompt extending the previous prompt's history reuses its prefix."""
+        history = "Human: what is a?\nAI: a is the first letter of the alphabet.\n"
+        turn_two = self.system + history + "Human: Context: doc b\nQuestion: and b?"
+        turn_three = self.system + history + "Human: and b?\nAI: b is the second.\nHuman: Context: doc c\nQuestion: c?"
+        self.tracker.observe(turn_two)
+        self.tracker.observe(turn_three)
+        stats = self.tracker.stats()
+        self.assertEqual(stats["prompts"], 2)
+        self.assertGreater(stats["last_reuse_rate"], 0.5)
+
+    def test_context_first_layout_reuses_less(self):
+        """Test that putting the per-turn context first breaks the shared prefix."""
+        stable = PrefixReuseTracker()
+        stable.observe("System.\nHistory: q1 a1\nContext: doc one\nQuestion: q2")
+        stable.observe("System.\nHistory: q1 a1 q2 a2\nContext: doc two\nQuestion: q3")
+        context_first = PrefixReuseTracker()
+        context_first.observe("System.\nContext: doc one\nHistory: q1 a1\nQuestion: q2")
+        context_first.observe("System.\nContext: doc two\nHistory: q1 a1 q2 a2\nQuestion: q3")
+        self.assertGreater(stable.stats()["reused_tokens"], context_first.stats()["reused_tokens"])
+
+    def test_observe_returns_prompt(self):
+        """Test that observe passes the prompt through unchanged."""
+        self.assertEqual(self.tracker.observe("prompt"), "prompt")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import asyncio
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers.request_gate import RequestGate, ServiceBusy
+
+
+class TestRequestGate(unittest.IsolatedAsyncioTestCase):
+
+    async def test_limits_concurrency(self):
+        """Test that no more than max_concurrency requests run at once."""
+        gate = RequestGate(max_concurrency=2, max_queue=10)
+        peak = 0
+
+        async def request(session_id):
+            nonlocal peak
+            async with gate.slot(session_id):
+                peak = max(peak, gate.active)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request(f"s{i}") for i in range(6)))
+        self.assertEqual(peak, 2)
+        self.assertEqual(gate.stats()["active"], 0)
+        self.assertEqual(gate.stats()["waiting"], 0)
+
+    async def test_session_requests_run_in_order(self):
+        """Test that requests of one session run one at a time in arrival order."""
+        gate = RequestGate(max_concurrency=4, max_queue=10)
+        order = []
+
+        async def request(turn, delay):
+            async with gate.slot("session"):
+                order.append(("start", turn))
+                await asyncio.sleep(delay)
+                order.append(("end", turn))
+
+        await asyncio.gather(request(1, 0.02), request(2, 0.0), request(3, 0.0))
+        self.assertEqual(order, [("start", 1), ("end", 1), ("start", 2), ("end", 2), ("start", 3), ("end", 3)])
+
+    async def test_rejects_when_queue_is_full(self):
+        """Test backpressure once max_queue requests are waiting."""
+        gate = RequestGate(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def request(session_id):
+            async with gate.slot(session_id):
+                await release.wait()
+
+        running = asyncio.create_task(request("a"))
+        queued = asyncio.create_task(request("b"))
+        await asyncio.sleep(0)
+        self.assertTrue(gate.is_full())
+        with self.assertRaises(ServiceBusy):
+            async with gate.slot("c"):
+                pass
+        self.assertEqual(gate.stats()["rejected"], 1)
+        release.set()
+        await asyncio.gather(running, queued)
+
+    async def test_cancelled_waiter_frees_queue(self):
+        """Test that a request cancelled while queued, e.g. on disconnect, leaves the queue."""
+        gate = RequestGate(max_concurrency=1, max_queue=5)
+        release = asyncio.Event()
+
+        async def request(session_id):
+            async with gate.slot(session_id):
+                await release.wait()
+
+        running = asyncio.create_task(request("a"))
+        queued = asyncio.create_task(request("b"))
+        await asyncio.sleep(0)
+        self.assertEqual(gate.waiting, 1)
+        queued.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await queued
+        self.assertEqual(gate.waiting, 0)
+        release.set()
+        await running
+        self.assertEqual(gate._session_locks, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import reranker
+
+
+class Chunk:
+    def __init__(self, page_content):
+        self.page_content = page_content
+        self.metadata = {}
+
+
+class TestRerank(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.query = "How do I configure the chroma database path?"
+
+    def test_lexical_overlap(self):
+        """Test that overlap is the fraction of query terms found in the text."""
+        terms = reranker.query_terms("chroma database path")
+        self.assertEqual(reranker.lexical_overlap(terms, "The Chroma path is set in dev.ini"), 2 / 3)
+        self.assertEqual(reranker.lexical_overlap(set(), "anything"), 0.0)
+
+    def test_lexical_overlap_promotes_matching_chunk(self):
+        """Test that a chunk sharing the query terms outranks a slightly closer vector match."""
+        matching = Chunk("Set the chroma database path with DB_PATH.")
+        unrelated = Chunk("Ollama runs models locally.")
+        kept = reranker.rerank(self.query, [(unrelated, 0.80), (matching, 0.75)], k=1)
+        self.assertIs(kept[0][0], matching)
+
+    def test_threshold_cuts_weak_chunks(self):
+        """Test that chunks scoring under the threshold are dropped."""
+        candidates = [(Chunk(f"chunk {i}"), score) for i, score in enumerate([0.9, 0.85, 0.3])]
+        kept = reranker.rerank(self.query, candidates, k=5, similarity_threshold=0.5, lexical_weight=0.0)
+        self.assertEqual([score for _, score in kept], [0.9, 0.85])
+
+    def test_threshold_applies_to_vector_relevance(self):
+        """Test that close chunks without query words pass a threshold tuned for raw relevance."""
+        candidates = [(Chunk("Ollama runs models locally."), 0.9), (Chunk("Models are served by Ollama."), 0.88),
+                      (Chunk("Unrelated."), 0.6)]
+        kept = reranker.rerank(self.query, candidates, k=5, similarity_threshold=0.7)
+        self.assertEqual(len(kept), 2)
+        # the blended score is what gets reported
+        self.assertAlmostEqual(kept[0][1], 0.63)
+
+    def test_threshold_skips_only_the_weak_chunk(self):
+        """Test that a weak chunk lifted by lexical overlap is skipped without cutting the ones after it."""
+        best, weak, close = (Chunk("Ollama runs models locally."), Chunk(self.query),
+                             Chunk("Models are served by Ollama."))
+        kept = reranker.rerank(self.query, [(best, 0.95), (weak, 0.5), (close, 0.9)], k=5,
+                               similarity_threshold=0.7)
+        self.assertEqual([document for document, _ in kept], [best, close])
+
+    def test_score_gap_cuts_tail(self):
+        """Test that results stop at a large drop in score."""
+        candidates = [(Chunk(f"chunk {i}"), score) for i, score in enumerate([0.9, 0.88, 0.6, 0.59])]
+        kept = reranker.rerank(self.query, candidates, k=5, score_gap=0.1, lexical_weight=0.0)
+        self.assertEqual(len(kept), 2)
+
+    def test_context_budget(self):
+        """Test that chunks are kept only while they fit the token budget."""
+        candidates = [(Chunk("word " * 40), 0.9 - i * 0.01) for i in range(5)]
+        kept = reranker.rerank(self.query, candidates, k=5, context_budget=100, lexical_weight=0.0)
+        self.assertEqual(len(kept), 2)
+
+    def test_min_k_keeps_best_chunk(self):
+        """Test that the best chunk is kept even when it misses every cut-off."""
+        kept = reranker.rerank(self.query, [(Chunk("word " * 500), 0.1)], k=5, similarity_threshold=0.5,
+                               context_budget=10, lexical_weight=0.0)
+        self.assertEqual(len(kept), 1)
+
+    def test_no_candidates(self):
+        """Test reranking an empty candidate list."""
+        self.assertEqual(reranker.rerank(self.query, []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
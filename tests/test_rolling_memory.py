@@ -0,0 +1,106 @@
+import unittest
+import threading
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import rolling_memory
+from helpers.splitter import count_tokens
+
+
+def joining_summarizer(summary, turns):
+    return " ".join([summary] + [human for human, ai in turns]).strip()
+
+
+class TestRollingSummaryMemory(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.memory = rolling_memory.RollingSummaryMemory(joining_summarizer, max_tokens=200, keep_turns=2)
+
+    def tearDown(self):
+        self.memory.close()
+
+    def test_recent_turns_verbatim_older_summarized(self):
+        """Test that the last keep_turns turns stay verbatim and older ones end up in the summary."""
+        for i in range(5):
+            self.memory.add_turn(f"question{i}", f"answer{i}")
+        self.memory.wait()
+        history = self.memory.history_text()
+        self.assertIn("User: question3\nAssistant: answer3", history)
+        self.assertIn("User: question4\nAssistant: answer4", history)
+        self.assertNotIn("answer2", history)
+        self.assertEqual(self.memory.summary, "question0 question1 question2")
+        self.assertEqual(self.memory.stats()["unsummarized"], 0)
+
+    def test_history_stays_under_the_cap(self):
+        """Test that the prompt history never exceeds max_tokens however long the conversation gets."""
+        self.memory.summary_tokens = 50
+        for i in range(200):
+            self.memory.add_turn(f"question {i} " + "word " * 30, f"answer {i} " + "word " * 30)
+            self.assertLessEqual(count_tokens(self.memory.history_text()), 200)
+        self.memory.wait()
+        self.assertLessEqual(count_tokens(self.memory.summary), 50)
+        self.assertIn("answer 199", self.memory.history_text())
+
+    def test_summary_runs_off_the_request_path(self):
+        """Test that add_turn and history_text return while a slow summary is still running."""
+        release = threading.Event()
+
+        def slow_summarizer(summary, turns):
+            release.wait(5)
+            return "summary"
+
+        self.memory.summarize = slow_summarizer
+        for i in range(4):
+            self.memory.add_turn(f"question{i}", f"answer{i}")
+        # the turns waiting for the summary are still shown verbatim
+        self.assertIn("question0", self.memory.history_text())
+        self.assertEqual(self.memory.stats()["folds"], 0)
+        release.set()
+        self.memory.wait()
+        self.assertTrue(self.memory.history_text().startswith("Summary of the earlier conversation: summary"))
+        self.assertNotIn("question0", self.memory.history_text())
+
+    def test_failed_summary_keeps_the_turns(self):
+        """Test that a failing summarizer leaves the turns unsummarized and a later turn retries them."""
+        def failing_summarizer(summary, turns):
+            raise ConnectionError("ollama down")
+
+        self.memory.summarize = failing_summarizer
+        for i in range(3):
+            self.memory.add_turn(f"question{i}", f"answer{i}")
+        self.memory.wait()
+        self.assertEqual(self.memory.stats()["unsummarized"], 1)
+        self.memory.summarize = joining_summarizer
+        self.memory.add_turn("question3", "answer3")
+        self.memory.wait()
+        self.assertEqual(self.memory.summary, "question0 question1")
+
+    def test_oversized_turn_is_truncated(self):
+        """Test that a single turn longer than the cap is cut to its end."""
+        self.memory.add_turn("start " + "word " * 500, "the end")
+        history = self.memory.history_text()
+        self.assertLessEqual(count_tokens(history), 200)
+        self.assertTrue(history.endswith("the end"))
+
+    def test_llm_summarizer_builds_prompt(self):
+        """Test that llm_summarizer sends the summary and turns and returns the reply content."""
+        class FakeReply:
+            content = "  new summary \n"
+
+        class FakeLLM:
+            def invoke(self, prompt):
+                self.prompt = prompt
+                return FakeReply()
+
+        llm = FakeLLM()
+        summarize = rolling_memory.llm_summarizer(llm, max_words=50)
+        self.assertEqual(summarize("old summary", [("hi", "hello")]), "new summary")
+        self.assertIn("old summary", llm.prompt)
+        self.assertIn("User: hi\nAssistant: hello", llm.prompt)
+        self.assertIn("at most 50 words", llm.prompt)
+
+
+if __name__ == '__main__':
+    unittest.main()
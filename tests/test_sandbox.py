@@ -0,0 +1,179 @@
+import unittest
+import tempfile
+import threading
+import time
+import sys
+import os
+from unittest import mock
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import sandbox
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestSandboxPool(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.pool = sandbox.SandboxPool(workers=2, max_jobs=3, cpu_seconds=1, wall_seconds=3, memory_mb=256,
+                                        queue_timeout=5)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_math_and_python_jobs(self):
+        """Test that expressions are evaluated and printed output is returned."""
+        self.assertEqual(self.pool.run("math", "2 + 3 * 4"), "14")
+        self.assertEqual(self.pool.run("python", "print(sum(range(10)))"), "45\n")
+
+    def test_errors_come_back_as_sandbox_errors(self):
+        """Test that a failing job raises SandboxError and the worker stays in the pool."""
+        with self.assertRaisesRegex(sandbox.SandboxError, "ZeroDivisionError"):
+            self.pool.run("math", "1 / 0")
+        with self.assertRaisesRegex(sandbox.SandboxError, "Invalid characters"):
+            self.pool.run("math", "__import__('os')")
+        self.assertEqual(self.pool.stats()["errors"], 2)
+        self.assertEqual(self.pool.stats()["killed"], 0)
+
+    def test_runaway_expression_is_killed_without_stalling_others(self):
+        """Test that a huge exponent is stopped by the CPU limit while other jobs keep running."""
+        result = {}
+
+        def runaway():
+            try:
+                self.pool.run("math", "9**9**9**9")
+            except sandbox.SandboxError as e:
+                result["error"] = str(e)
+
+        thread = threading.Thread(target=runaway)
+        thread.start()
+        time.sleep(0.2)
+        start = time.perf_counter()
+        for _ in range(5):
+            self.assertEqual(self.pool.run("math", "6 * 7"), "42")
+        self.assertLess(time.perf_counter() - start, 0.5)
+        thread.join()
+        self.assertIn("CPU limit", result["error"])
+        # only the job was killed; its worker keeps serving
+        wait_until(lambda: self.pool.stats()["idle"] == 2)
+        self.assertEqual(self.pool.stats()["workers"], 2)
+
+    def test_job_cannot_lift_its_cpu_limit(self):
+        """Test that a job raising its own soft CPU limit is still stopped at the hard limit."""
+        code = ("import resource\n"
+                "soft, hard = resource.getrlimit(resource.RLIMIT_CPU)\n"
+                "resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))\n"
+                "while True:\n    pass\n")
+        start = time.perf_counter()
+        with self.assertRaisesRegex(sandbox.SandboxError, "CPU limit"):
+            self.pool.run("python", code)
+        self.assertLess(time.perf_counter() - start, 2.9)
+        self.assertEqual(self.pool.stats()["killed"], 1)
+
+    def test_jobs_get_no_app_environment_or_state(self):
+        """Test that jobs see none of the app's environment, run in an empty folder and share no state."""
+        os.environ["SANDBOX_TEST_SECRET"] = "hunter2"
+        try:
+            pool = sandbox.SandboxPool(workers=1)
+            try:
+                output = pool.run("python", "import os\nprint(sorted(os.environ), os.listdir('.'), os.getcwd())")
+                self.assertNotIn("SANDBOX_TEST_SECRET", output)
+                self.assertNotIn(os.getcwd(), output)
+                self.assertIn("[]", output)
+                pool.run("python", "leaked = 1\nopen('note.txt', 'w').write('x')")
+                self.assertIn("NameError", str(self.catch(pool, "print(leaked)")))
+                self.assertEqual(pool.run("python", "import os\nprint(os.listdir('.'))"), "[]\n")
+            finally:
+                pool.close()
+        finally:
+            del os.environ["SANDBOX_TEST_SECRET"]
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc to find the result pipe")
+    def test_job_cannot_send_a_pickle(self):
+        """Test that a job writing a crafted pickle to its result pipe gets an error and runs nothing."""
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        marker = os.path.join(folder.name, "pwned")
+        code = ("import os, pickle\n"
+                "class Payload:\n"
+                f"    def __reduce__(self): return (os.mkdir, ({marker!r},))\n"
+                "data = pickle.dumps(Payload())\n"
+                "for fd in os.listdir('/proc/self/fd'):\n"
+                "    try:\n"
+                "        if int(fd) > 2: os.write(int(fd), data)\n"
+                "    except OSError:\n"
+                "        pass\n"
+                "os._exit(0)\n")
+        with self.assertRaisesRegex(sandbox.SandboxError, "invalid result"):
+            self.pool.run("python", code)
+        self.assertFalse(os.path.exists(marker))
+        self.assertEqual(self.pool.run("math", "1 + 1"), "2")
+
+    def test_results_are_plain_data(self):
+        """Test that only a JSON [status, text] pair decodes as a result."""
+        self.assertEqual(sandbox.decode_result(sandbox.encode_result("ok", "42")), ("ok", "42"))
+        for data in (b"\x80\x04K\x01.", b'["ok"]', b'["run", "x"]', b'["ok", 1]', b'{"ok": "x"}'):
+            with self.assertRaises(ValueError):
+                sandbox.decode_result(data)
+
+    def test_tool_helpers_return_text(self):
+        """Test that run_math and run_python answer through the pool and turn errors into text."""
+        with mock.patch.object(sandbox, "get_pool", return_value=self.pool):
+            self.assertEqual(sandbox.run_math("6 * 7"), "The result of 6 * 7 is 42")
+            self.assertIn("Invalid characters", sandbox.run_math("__import__('os')"))
+            self.assertEqual(sandbox.run_python("print('hi')"), "hi\n")
+            self.assertEqual(sandbox.run_python("x = 1"), "(no output)")
+            self.assertTrue(sandbox.run_python("1 / 0").startswith("Error running code: ZeroDivisionError"))
+
+    def catch(self, pool, code):
+        try:
+            return pool.run("python", code)
+        except sandbox.SandboxError as e:
+            return e
+
+    def test_wall_time_limit(self):
+        """Test that a job that waits instead of computing is killed at the wall-time limit."""
+        start = time.perf_counter()
+        with self.assertRaisesRegex(sandbox.SandboxError, "time limit"):
+            self.pool.run("python", "import time\ntime.sleep(30)")
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(self.pool.stats()["timeouts"], 1)
+
+    def test_memory_limit(self):
+        """Test that an allocation above the memory limit fails and the worker keeps serving."""
+        with self.assertRaisesRegex(sandbox.SandboxError, "memory"):
+            self.pool.run("python", "x = bytearray(1024 ** 3)")
+        self.assertEqual(self.pool.run("math", "1 + 1"), "2")
+
+    def test_workers_are_recycled(self):
+        """Test that a worker is replaced after max_jobs jobs."""
+        for _ in range(6):
+            self.pool.run("python", "import os\nprint(os.getpid())")
+        wait_until(lambda: self.pool.stats()["idle"] == 2)
+        stats = self.pool.stats()
+        self.assertEqual(stats["recycled"], 2)
+        self.assertEqual(stats["workers"], 2)
+
+    def test_busy_pool_times_out(self):
+        """Test that a job waiting for a free worker gives up after the queue timeout."""
+        pool = sandbox.SandboxPool(workers=1, wall_seconds=2, queue_timeout=0.1)
+        try:
+            thread = threading.Thread(target=lambda: self.assertRaises(
+                sandbox.SandboxError, pool.run, "python", "import time\ntime.sleep(10)"))
+            thread.start()
+            time.sleep(0.2)
+            with self.assertRaisesRegex(sandbox.SandboxError, "busy"):
+                pool.run("math", "1 + 1")
+            thread.join()
+            self.assertEqual(pool.stats()["busy"], 1)
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
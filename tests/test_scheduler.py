@@ -0,0 +1,123 @@
+import unittest
+import time
+import threading
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import scheduler
+
+WEIGHTS = {"interactive": 8, "batch": 2, "indexing": 1}
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+
+
+class TestPriorityScheduler(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.order = []
+        self.lock = threading.Lock()
+
+    def queue_behind(self, sched, classes):
+        """Queues one request per class, in this order, behind a slot that is held; returns the threads."""
+        threads = []
+        for priority_class in classes:
+            def run(priority_class=priority_class):
+                ticket = sched.acquire(priority_class, timeout=5)
+                with self.lock:
+                    self.order.append(priority_class)
+                sched.release(ticket)
+
+            waiting = len(sched.waiting)
+            thread = threading.Thread(target=run)
+            thread.start()
+            wait_until(lambda: len(sched.waiting) > waiting)
+            threads.append(thread)
+        return threads
+
+    def test_interactive_goes_before_queued_background_work(self):
+        """Test that an interactive request queued after background requests is served first."""
+        sched = scheduler.PriorityScheduler(1, WEIGHTS)
+        held = sched.acquire("indexing")
+        threads = self.queue_behind(sched, ["indexing", "indexing", "batch", "interactive"])
+        sched.release(held)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.order[0], "interactive")
+        self.assertEqual(self.order[1], "batch")
+
+    def test_backlogged_classes_share_by_weight(self):
+        """Test that two backlogged classes get slots in proportion to their weights."""
+        sched = scheduler.PriorityScheduler(1, WEIGHTS)
+        held = sched.acquire("batch")
+        threads = self.queue_behind(sched, ["indexing"] * 6 + ["batch"] * 12)
+        sched.release(held)
+        for thread in threads:
+            thread.join()
+        # weight 2 against 1: two batch requests for each indexing one, interleaved
+        self.assertEqual(self.order[:9].count("batch"), 6)
+        self.assertEqual(self.order[:9].count("indexing"), 3)
+
+    def test_class_limits_and_timeouts(self):
+        """Test that a class never holds more than its limit of the slots and that waits time out."""
+        sched = scheduler.PriorityScheduler(4, WEIGHTS, limits={"indexing": 2})
+        tickets = [sched.acquire("indexing", timeout=0.05) for _ in range(3)]
+        self.assertIsNone(tickets[2])
+        # the slots left over are still free for other classes
+        interactive = sched.acquire("interactive", timeout=0.05)
+        self.assertIsNotNone(interactive)
+        stats = sched.stats()["classes"]
+        self.assertEqual(stats["indexing"]["active"], 2)
+        self.assertEqual(stats["indexing"]["timeouts"], 1)
+        self.assertEqual(stats["interactive"]["requests"], 1)
+
+    def test_unknown_class_uses_default(self):
+        """Test that requests of an unknown class are counted under the default class."""
+        sched = scheduler.PriorityScheduler(2, WEIGHTS)
+        sched.release(sched.acquire("nightly"))
+        self.assertEqual(sched.stats()["classes"]["interactive"]["requests"], 1)
+
+    def test_interactive_queue_time_stays_flat_under_background_load(self):
+        """Test that interactive requests barely wait while background classes saturate their share."""
+        sched = scheduler.PriorityScheduler(3, WEIGHTS, limits={"batch": 1, "indexing": 1})
+        stop = threading.Event()
+
+        def background(priority_class):
+            while not stop.is_set():
+                ticket = sched.acquire(priority_class, timeout=5)
+                time.sleep(0.01)
+                sched.release(ticket)
+
+        workers = [threading.Thread(target=background, args=(name,)) for name in ["batch", "indexing"] * 4]
+        for worker in workers:
+            worker.start()
+        for _ in range(30):
+            ticket = sched.acquire("interactive", timeout=5)
+            time.sleep(0.005)
+            sched.release(ticket)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        stats = sched.stats()["classes"]
+        self.assertLess(stats["interactive"]["queue_ms_p95"], 5.0)
+        # the background classes queued behind each other but still got their slots
+        self.assertGreater(stats["batch"]["requests"], 10)
+        self.assertGreater(stats["indexing"]["queue_ms_p95"], stats["interactive"]["queue_ms_p95"])
+
+
+class TestSplitClass(unittest.TestCase):
+
+    def test_split_class(self):
+        """Test that the class prefix is taken off the path and unknown classes fall back to the default."""
+        self.assertEqual(scheduler.split_class("/p/batch/api/chat", WEIGHTS, "interactive"), ("batch", "/api/chat"))
+        self.assertEqual(scheduler.split_class("/p/other/api/chat", WEIGHTS, "interactive"), ("interactive", "/api/chat"))
+        self.assertEqual(scheduler.split_class("/api/embed", WEIGHTS, "interactive"), ("interactive", "/api/embed"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import sharding
+
+
+class TestShardKey(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.data_folder = os.path.join("data", "docs")
+
+    def test_folder_key_is_top_level_folder(self):
+        """Test that files are sharded by their top-level folder under the data folder."""
+        path = os.path.join(self.data_folder, "guides", "setup", "install.md")
+        self.assertEqual(sharding.shard_key(path, self.data_folder, "folder"), "guides")
+
+    def test_folder_key_for_files_in_data_folder(self):
+        """Test that files directly in the data folder share the root shard."""
+        path = os.path.join(self.data_folder, "readme.md")
+        self.assertEqual(sharding.shard_key(path, self.data_folder, "folder"), "root")
+
+    def test_type_key_is_extension(self):
+        """Test that files are sharded by their lower-cased extension."""
+        path = os.path.join(self.data_folder, "report.PDF")
+        self.assertEqual(sharding.shard_key(path, self.data_folder, "type"), "pdf")
+
+    def test_hash_key_is_stable_and_in_range(self):
+        """Test that hash shards are stable across calls and within shard_count."""
+        keys = set()
+        for i in range(50):
+            path = os.path.join(self.data_folder, f"file_{i}.md")
+            key = sharding.shard_key(path, self.data_folder, "hash", shard_count=3)
+            self.assertEqual(key, sharding.shard_key(path, self.data_folder, "hash", shard_count=3))
+            keys.add(key)
+        self.assertEqual(keys, {"0", "1", "2"})
+
+    def test_unknown_key_raises(self):
+        """Test that an unknown shard key raises ValueError."""
+        with self.assertRaises(ValueError):
+            sharding.shard_key("a.md", self.data_folder, "size")
+
+
+class TestCollectionName(unittest.TestCase):
+
+    def test_invalid_characters_are_replaced(self):
+        """Test that shard keys become valid Chroma collection names."""
+        self.assertEqual(sharding.collection_name("my docs!"), "shard_my_docs")
+
+    def test_long_keys_are_truncated(self):
+        """Test that collection names stay within 63 characters."""
+        self.assertLessEqual(len(sharding.collection_name("x" * 100)), 63)
+
+
+class TestMergeTopK(unittest.TestCase):
+
+    def test_merges_by_distance(self):
+        """Test that the overall k closest results are returned in order."""
+        results = [
+            [("a1", 0.1), ("a2", 0.5)],
+            [("b1", 0.2), ("b2", 0.3)],
+            [],
+        ]
+        merged = sharding.merge_top_k(results, 3)
+        self.assertEqual([doc for doc, _ in merged], ["a1", "b1", "b2"])
+
+    def test_fewer_results_than_k(self):
+        """Test that all results are returned when there are fewer than k."""
+        self.assertEqual(len(sharding.merge_top_k([[("a", 0.1)]], 4)), 1)
+
+
+
+class TestRelevanceScore(unittest.TestCase):
+
+    def test_relevance_per_space(self):
+        """Test that distances turn into relevance like langchain's Chroma does for each hnsw:space."""
+        self.assertAlmostEqual(sharding.relevance_score(0.2, "cosine"), 0.8)
+        self.assertAlmostEqual(sharding.relevance_score(0.0, "l2"), 1.0)
+        self.assertAlmostEqual(sharding.relevance_score(2 ** 0.5, "l2"), 0.0)
+        self.assertAlmostEqual(sharding.relevance_score(-0.7, "ip"), 0.7)
+        with self.assertRaises(ValueError):
+            sharding.relevance_score(0.1, "manhattan")
+
+if __name__ == '__main__':
+    unittest.main()
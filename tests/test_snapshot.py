@@ -0,0 +1,127 @@
+import unittest
+import tempfile
+import fcntl
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import snapshot
+
+
+def batches(records, size=2):
+    for start in range(0, len(records), size):
+        chunk = records[start:start + size]
+        yield ([r[0] for r in chunk], [r[1] for r in chunk], [r[2] for r in chunk], [r[3] for r in chunk])
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "index.ragsnap")
+        self.records = [(f"id-{i}", [i * 0.5, -i * 0.25, 1.0], f"chunk number {i} " * 20,
+                         {"source": f"/docs/{i % 2}.md", "chunk_index": i}) for i in range(5)]
+        self.shard = [("id-x", [0.125, 0.5, -2.0], "other shard", {"source": "/docs/x.pdf", "page": 3})]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, **kwargs):
+        collections = [("shard_md", {"hnsw:space": "l2"}, batches(self.records)), ("shard_pdf", None, batches(self.shard))]
+        return snapshot.write_snapshot(self.path, collections, metadata={"embedding_model": "test"}, **kwargs)
+
+    def test_round_trip(self):
+        """Test that vectors, text, metadata and the manifest survive a round trip."""
+        header = self.write()
+        self.assertEqual(header["count"], 6)
+        with snapshot.SnapshotReader(self.path) as reader:
+            self.assertEqual(reader.header["embedding_model"], "test")
+            self.assertEqual(reader.dimension, 3)
+            exported = []
+            for name, collection_metadata, collection_batches in reader.collections(batch_size=4):
+                for ids, embeddings, documents, metadatas in collection_batches:
+                    exported.extend((name, *record) for record in zip(ids, embeddings, documents, metadatas))
+        expected = [("shard_md", r[0], r[1], r[2], r[3]) for r in self.records]
+        expected += [("shard_pdf", r[0], r[1], r[2], r[3]) for r in self.shard]
+        self.assertEqual(exported, expected)
+        self.assertEqual(header["collections"][0]["metadata"], {"hnsw:space": "l2"})
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_float16_and_compression_shrink_the_file(self):
+        """Test that float16 vectors and compressed text make a smaller file with close vectors."""
+        self.write(compress=False)
+        plain_size = os.path.getsize(self.path)
+        self.write(dtype="float16")
+        self.assertLess(os.path.getsize(self.path), plain_size)
+        with snapshot.SnapshotReader(self.path) as reader:
+            for index, record in enumerate(self.records):
+                for value, expected in zip(reader.vector(index), record[1]):
+                    self.assertAlmostEqual(value, expected, places=2)
+
+    def test_vectors_are_aligned(self):
+        """Test that the vector section starts on an aligned offset, so it can be memory-mapped as an array."""
+        header = self.write()
+        self.assertEqual(header["sections"]["vectors"]["offset"] % snapshot.ALIGNMENT, 0)
+
+    def test_corruption_is_detected(self):
+        """Test that a flipped byte in a section fails the checksum."""
+        header = self.write()
+        with open(self.path, "r+b") as f:
+            f.seek(header["sections"]["vectors"]["offset"] + 5)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        with self.assertRaises(ValueError):
+            snapshot.SnapshotReader(self.path)
+
+    def test_not_a_snapshot(self):
+        """Test that other files are rejected."""
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * 128)
+        with self.assertRaises(ValueError):
+            snapshot.SnapshotReader(self.path)
+
+    def test_inconsistent_dimensions(self):
+        """Test that vectors of different dimensions are refused."""
+        self.records[1] = ("id-1", [1.0], "short", {})
+        with self.assertRaises(ValueError):
+            self.write()
+
+
+class TestIndexLock(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.lock_path = os.path.join(self.temp_dir.name, snapshot.INDEX_LOCK_FILE)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def try_lock(self, mode):
+        with open(self.lock_path, "a") as other:
+            try:
+                fcntl.flock(other, mode | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            fcntl.flock(other, fcntl.LOCK_UN)
+            return True
+
+    def test_exclusive_lock_blocks_others(self):
+        """Test that a writer's lock blocks a snapshot export, and is re-entrant in the same thread."""
+        with snapshot.index_lock(self.temp_dir.name):
+            with snapshot.index_lock(self.temp_dir.name):
+                self.assertFalse(self.try_lock(fcntl.LOCK_SH))
+            self.assertFalse(self.try_lock(fcntl.LOCK_SH))
+        self.assertTrue(self.try_lock(fcntl.LOCK_EX))
+
+    def test_shared_lock_allows_readers(self):
+        """Test that exports share the lock but keep writers out."""
+        with snapshot.index_lock(self.temp_dir.name, shared=True):
+            self.assertTrue(self.try_lock(fcntl.LOCK_SH))
+            self.assertFalse(self.try_lock(fcntl.LOCK_EX))
+
+
+if __name__ == '__main__':
+    unittest.main()
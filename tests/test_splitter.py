@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import splitter
+
+
+class Document:
+    """Minimal stand-in with the page_content/metadata interface of langchain documents."""
+
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class TestSplitter(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.markdown = (
+            "# Access\nIntro text.\n\n"
+            "## Privileged Access\nVault every admin password. Rotate them daily.\n\n"
+            "## Reviews\nReview access every quarter.\n\n"
+            "# Logging\nKeep logs for a year."
+        )
+
+    def test_count_tokens(self):
+        """Test the word and punctuation token estimate."""
+        self.assertEqual(splitter.count_tokens("Hello, world!"), 4)
+        self.assertEqual(splitter.count_tokens("  "), 0)
+
+    def test_chunks_respect_chunk_size(self):
+        """Test that no chunk is longer than chunk_size tokens in any mode."""
+        text = " ".join(f"Sentence number {i} is here." for i in range(50))
+        for method in splitter.SPLIT_METHODS:
+            chunks = splitter.split_text(text, chunk_size=20, chunk_overlap=5, method=method)
+            self.assertTrue(chunks)
+            for content, _, _ in chunks:
+                self.assertLessEqual(splitter.count_tokens(content), 20, method)
+
+    def test_sentence_overlap(self):
+        """Test that consecutive chunks share whole sentences up to the overlap."""
+        text = "One two. Three four. Five six. Seven eight."
+        chunks = [c[0] for c in splitter.split_text(text, chunk_size=6, chunk_overlap=3, method="sentence")]
+        self.assertEqual(chunks, ["One two. Three four.", "Three four. Five six.", "Five six. Seven eight."])
+
+    def test_paragraph_mode(self):
+        """Test that paragraphs are kept whole when they fit."""
+        text = "First paragraph.\n\nSecond paragraph.\n\nThird paragraph."
+        chunks = [c[0] for c in splitter.split_text(text, chunk_size=6, chunk_overlap=0, method="paragraph")]
+        self.assertEqual(chunks, ["First paragraph.\n\nSecond paragraph.", "Third paragraph."])
+
+    def test_fixed_mode(self):
+        """Test fixed token windows with overlap."""
+        chunks = [c[0] for c in splitter.split_text("a b c d e f g", chunk_size=3, chunk_overlap=1, method="fixed")]
+        self.assertEqual(chunks, ["a b c", "c d e", "e f g"])
+
+    def test_markdown_headings(self):
+        """Test that headings start chunks and are recorded as a path."""
+        chunks = splitter.split_text(self.markdown, chunk_size=50, chunk_overlap=0, method="markdown")
+        self.assertEqual([c[2] for c in chunks],
+                         ["Access", "Access > Privileged Access", "Access > Reviews", "Logging"])
+        self.assertTrue(chunks[1][0].startswith("## Privileged Access"))
+
+    def test_start_index(self):
+        """Test that chunks record their offset in the document."""
+        for content, start, _ in splitter.split_text(self.markdown, 10, 2, "sentence"):
+            self.assertEqual(self.markdown[start:start + len(content)], content)
+
+    def test_unknown_method(self):
+        """Test an unsupported split method."""
+        with self.assertRaises(ValueError):
+            splitter.split_text("text", method="semantic")
+
+    def test_split_documents_metadata(self):
+        """Test that chunks keep page metadata and add heading and index."""
+        docs = [Document(self.markdown, {"source": "a.md", "page": 3})]
+        chunks = splitter.split_documents(docs, chunk_size=50, chunk_overlap=0, method="markdown")
+        self.assertIsInstance(chunks[0], Document)
+        self.assertEqual(chunks[1].metadata["page"], 3)
+        self.assertEqual(chunks[1].metadata["heading"], "Access > Privileged Access")
+        self.assertEqual([c.metadata["chunk_index"] for c in chunks], [0, 1, 2, 3])
+        self.assertNotIn("chunk_index", docs[0].metadata)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import warmup
+
+
+class FakeRetriever:
+    def __init__(self, error=None):
+        self.queries = []
+        self.error = error
+
+    def invoke(self, query):
+        self.queries.append(query)
+        if self.error:
+            raise self.error
+        return []
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.loaded = []
+        self.original_preload = warmup.preload_chat_model
+        warmup.preload_chat_model = lambda model, url: (time.sleep(0.1), self.loaded.append(model))
+
+    def tearDown(self):
+        warmup.preload_chat_model = self.original_preload
+
+    def test_runs_all_steps(self):
+        """Test that every chat model is loaded once and the retriever is probed."""
+        retriever = FakeRetriever()
+        warm_up = warmup.WarmUp(["llama3.2", "gemma3:4b", "llama3.2"], retriever)
+        self.assertTrue(warm_up.run())
+        self.assertEqual(sorted(self.loaded), ["gemma3:4b", "llama3.2"])
+        self.assertEqual(retriever.queries, [warmup.PROBE_QUERY])
+        self.assertEqual(warm_up.stats()["state"], "ready")
+
+    def test_steps_run_concurrently(self):
+        """Test that the steps overlap instead of running one after another."""
+        warm_up = warmup.WarmUp(["a", "b", "c"])
+        start = time.perf_counter()
+        warm_up.run()
+        self.assertLess(time.perf_counter() - start, 0.25)
+
+    def test_failed_step_is_reported(self):
+        """Test that a failing step marks the warm-up failed but still sets ready."""
+        warm_up = warmup.WarmUp(["llama3.2"], FakeRetriever(error=RuntimeError("index missing")))
+        self.assertFalse(warm_up.run())
+        self.assertTrue(warm_up.ready.is_set())
+        self.assertEqual(warm_up.report["retriever_probe"]["error"], "index missing")
+        self.assertTrue(warm_up.report["chat_model:llama3.2"]["ok"])
+        self.assertEqual(warm_up.stats()["state"], "failed")
+
+    def test_not_ready_until_done(self):
+        """Test that readiness is only exposed after the background warm-up completes."""
+        warm_up = warmup.WarmUp(["llama3.2"])
+        thread = warm_up.start()
+        self.assertEqual(warm_up.stats()["state"], "warming_up")
+        thread.join()
+        self.assertEqual(warm_up.stats()["state"], "ready")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import tempfile
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import watcher
+
+
+class TestIndexWatcher(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.temp_dir.name, "data")
+        os.makedirs(self.data_dir)
+        self.state_file = os.path.join(self.temp_dir.name, "watch_state.json")
+        self.indexed = []
+        self.removed = []
+        self.changes = 0
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_watcher(self, index_fn=None):
+        def on_change():
+            self.changes += 1
+        return watcher.IndexWatcher(self.data_dir, [".md", ".txt"],
+                                    index_fn=index_fn or self.indexed.append,
+                                    remove_fn=self.removed.append,
+                                    state_file=self.state_file,
+                                    debounce=2, on_change=on_change)
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.data_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_snapshot_filters_extensions(self):
+        """Test that only supported files are watched."""
+        path = self.write("a.md", "hello")
+        self.write("b.png", "image")
+        self.assertEqual(list(watcher.snapshot(self.data_dir, (".md",))), [path])
+
+    def test_diff_snapshots(self):
+        """Test detection of added, modified and removed files."""
+        changed, removed = watcher.diff_snapshots({"a": [1, 1], "b": [1, 1]}, {"a": [2, 1], "c": [1, 1]})
+        self.assertEqual(sorted(changed), ["a", "c"])
+        self.assertEqual(removed, ["b"])
+
+    def test_changes_are_debounced(self):
+        """Test that a new file is indexed once it has been quiet for the debounce time."""
+        path = self.write("a.md", "hello")
+        index_watcher = self.make_watcher()
+        self.assertFalse(index_watcher.poll_once(now=100))
+        self.assertEqual(self.indexed, [])
+        self.assertTrue(index_watcher.poll_once(now=103))
+        self.assertEqual(self.indexed, [path])
+        self.assertEqual(self.changes, 1)
+        self.assertEqual(index_watcher.metrics["last_lag_seconds"], 3)
+
+    def test_file_still_being_written_waits(self):
+        """Test that a file that keeps changing is indexed once, after it settles."""
+        path = self.write("a.md", "v1", mtime=1000)
+        index_watcher = self.make_watcher()
+        index_watcher.poll_once(now=100)
+        self.write("a.md", "v2 longer", mtime=1001)
+        index_watcher.poll_once(now=101.5)
+        index_watcher.poll_once(now=102.5)
+        self.assertEqual(self.indexed, [])
+        index_watcher.poll_once(now=104)
+        self.assertEqual(self.indexed, [path])
+        self.assertEqual(index_watcher.metrics["last_lag_seconds"], 4)
+
+    def test_removed_and_renamed_files(self):
+        """Test that removed files are dropped and renamed files are re-indexed under the new name."""
+        path = self.write("a.md", "hello")
+        index_watcher = self.make_watcher()
+        index_watcher.poll_once(now=100)
+        index_watcher.poll_once(now=103)
+        new_path = os.path.join(self.data_dir, "b.md")
+        os.rename(path, new_path)
+        index_watcher.poll_once(now=110)
+        index_watcher.poll_once(now=113)
+        self.assertEqual(self.removed, [path])
+        self.assertEqual(self.indexed, [path, new_path])
+
+    def test_state_survives_restart(self):
+        """Test that a restarted watcher only processes files changed while it was down."""
+        self.write("a.md", "hello", mtime=1000)
+        index_watcher = self.make_watcher()
+        index_watcher.poll_once(now=100)
+        index_watcher.poll_once(now=103)
+        new_path = self.write("b.md", "new")
+        restarted = self.make_watcher()
+        restarted.poll_once(now=200)
+        restarted.poll_once(now=203)
+        self.assertEqual(self.indexed[1:], [new_path])
+
+    def test_failed_files_are_retried(self):
+        """Test that a file whose indexing failed is picked up again."""
+        path = self.write("a.md", "hello")
+        calls = []
+
+        def flaky_index(file_path):
+            calls.append(file_path)
+            if len(calls) == 1:
+                raise ConnectionError("ollama is down")
+
+        index_watcher = self.make_watcher(index_fn=flaky_index)
+        index_watcher.poll_once(now=100)
+        index_watcher.poll_once(now=103)
+        self.assertEqual(index_watcher.metrics["failed_files"], 1)
+        index_watcher.poll_once(now=110)
+        index_watcher.poll_once(now=113)
+        self.assertEqual(calls, [path, path])
+        self.assertEqual(index_watcher.metrics["indexed_files"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+import unittest
+import tempfile
+import threading
+import multiprocessing
+import json
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import work_queue
+
+EMBED_LATENCY = 0.1
+
+
+class StandInEmbeddingHandler(BaseHTTPRequestHandler):
+    """
+    Answers Ollama /api/embed requests after a fixed delay, like a model busy for EMBED_LATENCY
+    seconds, and records the most requests it had in flight at once.
+    """
+
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = StandInEmbeddingHandler
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        time.sleep(EMBED_LATENCY)
+        with cls.lock:
+            cls.in_flight -= 1
+        response = json.dumps({"embeddings": [[float(len(text)), 1.0] for text in body["input"]]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def embed_with_stand_in(url, path):
+    with open(path, "r") as f:
+        texts = f.read().split("\n")
+    request = urllib.request.Request(f"{url}/api/embed", data=json.dumps({"model": "test", "input": texts}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        vectors = json.loads(response.read())["embeddings"]
+    return {"texts": texts, "metadatas": [{"source": path}] * len(texts), "vectors": vectors}
+
+
+def worker_process(queue_path, worker, url, ready):
+    queue = work_queue.WorkQueue(queue_path, lease_seconds=30)
+    ready.wait()
+    work_queue.run_worker(queue, worker, lambda path: embed_with_stand_in(url, path), poll_interval=0.05)
+    queue.close()
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queue = work_queue.WorkQueue(os.path.join(self.temp_dir.name, "queue.sqlite3"),
+                                          lease_seconds=30, max_attempts=2)
+
+    def tearDown(self):
+        self.queue.close()
+        self.temp_dir.cleanup()
+
+    def test_claims_are_exclusive(self):
+        """Test that two workers never lease the same file."""
+        self.queue.enqueue({"/docs/a.md": [1, 1], "/docs/b.md": [1, 2]})
+        first, second = self.queue.claim("w1"), self.queue.claim("w2")
+        self.assertEqual({first, second}, {"/docs/a.md", "/docs/b.md"})
+        self.assertIsNone(self.queue.claim("w3"))
+        self.assertEqual(self.queue.counts()["leased"], 2)
+
+    def test_expired_lease_is_reclaimed(self):
+        """Test that a dead worker's file goes to another worker and the late result is refused."""
+        self.queue.enqueue({"/docs/a.md": [1, 1]})
+        self.queue.lease_seconds = -1
+        self.assertEqual(self.queue.claim("dead"), "/docs/a.md")
+        self.queue.lease_seconds = 30
+        self.assertEqual(self.queue.claim("alive"), "/docs/a.md")
+        self.assertFalse(self.queue.heartbeat("dead", "/docs/a.md"))
+        self.assertFalse(self.queue.complete("dead", "/docs/a.md", {"texts": []}))
+        self.assertTrue(self.queue.complete("alive", "/docs/a.md", {"texts": ["x"]}))
+        self.assertEqual(self.queue.results(), [("/docs/a.md", "index", {"texts": ["x"]})])
+
+    def test_retries_then_fails(self):
+        """Test that a failing file is retried up to max_attempts and then parked as failed."""
+        self.queue.enqueue({"/docs/a.md": [1, 1]})
+        for attempt in range(2):
+            self.assertEqual(self.queue.claim("w1"), "/docs/a.md")
+            self.assertTrue(self.queue.fail("w1", "/docs/a.md", ValueError("bad pdf")))
+        self.assertIsNone(self.queue.claim("w1"))
+        self.assertEqual(self.queue.failures(), {"/docs/a.md": "bad pdf"})
+        self.assertFalse(self.queue.has_open_tasks())
+        # the next run tries failed files again
+        self.assertEqual(self.queue.enqueue({"/docs/a.md": [1, 1]}), 1)
+
+    def test_enqueue_is_incremental(self):
+        """Test that unchanged merged files are skipped, changed ones requeued and removed ones deleted."""
+        self.queue.enqueue({"/docs/a.md": [1, 1], "/docs/b.md": [1, 2]})
+        for _ in range(2):
+            path = self.queue.claim("w1")
+            self.queue.complete("w1", path, {"texts": []})
+            self.queue.mark_merged(path)
+        self.assertEqual(self.queue.enqueue({"/docs/a.md": [1, 1], "/docs/b.md": [2, 2], "/docs/c.md": [1, 3]}), 2)
+        self.assertEqual(self.queue.enqueue({"/docs/a.md": [1, 1], "/docs/c.md": [1, 3]}), 0)
+        self.assertEqual(self.queue.results(), [("/docs/b.md", "delete", None)])
+        self.queue.mark_merged("/docs/b.md")
+        self.assertEqual(self.queue.enqueue({"/docs/a.md": [1, 1], "/docs/c.md": [1, 3]}), 0)
+        self.assertEqual(self.queue.results(), [])
+
+    def test_run_worker_drains_the_queue(self):
+        """Test that a worker processes every file, recording failures, and stops when the queue is empty."""
+        self.queue.enqueue({f"/docs/{i}.md": [1, i] for i in range(4)})
+
+        def process(path):
+            if path == "/docs/2.md":
+                raise ValueError("unreadable")
+            return {"texts": [path]}
+
+        self.assertEqual(work_queue.run_worker(self.queue, "w1", process, poll_interval=0.01), 3)
+        self.assertEqual(self.queue.counts()["embedded"], 3)
+        self.assertEqual(list(self.queue.failures()), ["/docs/2.md"])
+
+
+class TestWorkerScaling(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInEmbeddingHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.files = {}
+        for i in range(16):
+            path = os.path.join(self.temp_dir.name, f"doc{i}.md")
+            with open(path, "w") as f:
+                f.write(f"first chunk of {i}\nsecond chunk of {i}")
+            self.files[path] = [1, i]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def run_workers(self, count):
+        queue_path = os.path.join(self.temp_dir.name, f"queue{count}.sqlite3")
+        queue = work_queue.WorkQueue(queue_path)
+        queue.enqueue(self.files)
+        context = multiprocessing.get_context("spawn")
+        # start the work together, once every process is up
+        ready = context.Barrier(count + 1)
+        processes = [context.Process(target=worker_process, args=(queue_path, f"w{i}", self.url, ready))
+                     for i in range(count)]
+        StandInEmbeddingHandler.peak = 0
+        for process in processes:
+            process.start()
+        ready.wait()
+        for process in processes:
+            process.join()
+        counts = queue.counts()
+        results = queue.results(limit=100)
+        queue.close()
+        return StandInEmbeddingHandler.peak, counts, results
+
+    def test_workers_embed_in_parallel(self):
+        """Test that every file is embedded exactly once and the workers' requests overlap."""
+        one_worker, counts, results = self.run_workers(1)
+        self.assertEqual(counts["embedded"], 16)
+        self.assertEqual(one_worker, 1)
+        four_workers, counts, results = self.run_workers(4)
+        self.assertEqual(counts["embedded"], 16)
+        self.assertEqual(sorted(path for path, op, result in results), sorted(self.files))
+        self.assertEqual(results[0][2]["vectors"][0][1], 1.0)
+        # workers hold separate leases, so their embedding calls run at the same time
+        self.assertGreaterEqual(four_workers, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()